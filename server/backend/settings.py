@@ -48,6 +48,8 @@ INSTALLED_APPS = [
     'events',
     'users',
     'location',
+    'jobs',
+    'benchmarks',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -108,6 +110,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'users.middleware.JWTCookieMiddleware',
+    'events.middleware.NPlusOneGuardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -192,6 +195,36 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Logging
+# https://docs.djangoproject.com/en/5.1/topics/logging/
+# Set LOCATION_LOG_LEVEL=DEBUG to see (sampled) upstream payloads
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'location': {
+            'handlers': ['console'],
+            'level': os.getenv('LOCATION_LOG_LEVEL', 'INFO'),
+        },
+        'events': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+# Flag requests that run the same query THRESHOLD or more times (an N+1);
+# on in development, RAISE turns the warning into an error (used by the tests)
+N_PLUS_ONE_GUARD = {
+    'ENABLED': DEBUG,
+    'THRESHOLD': 5,
+    'RAISE': False,
+}
+
 # Refers back to the Users model (acts as an association between both models)
 AUTH_USER_MODEL = "users.User"
 
@@ -247,3 +280,16 @@ CSRF_COOKIE_NAME = 'csrftoken'  # Default name, included for clarity
 
 # API Keys
 RAPIDAPI_KEY = os.getenv('RAPIDAPI_KEY', '37fee07720msh40f36f83c438a85p14f0e4jsncb74da8d4371')
+
+# Location service overrides; defaults and their descriptions live in location/conf.py
+LOCATION_SERVICE = {
+    'UPSTREAM_BASE_URL': os.getenv('LOCATION_UPSTREAM_BASE_URL'),
+    'UPSTREAM_CASSETTE_MODE': os.getenv('LOCATION_CASSETTE_MODE') or None,
+    'UPSTREAM_CASSETTE_DIR': os.getenv('LOCATION_CASSETTE_DIR', str(BASE_DIR / 'upstream_cassettes')),
+    'UPSTREAM_REPLAY_LATENCY': float(os.getenv('LOCATION_REPLAY_LATENCY', '0')),
+    'IP_GEO_TABLE_PATH': os.getenv('LOCATION_IP_TABLE_PATH'),
+    'IP_GEO_TRUSTED_PROXIES': int(os.getenv('LOCATION_TRUSTED_PROXIES', '0')),
+}
+
+# Background job queue (jobs app), run with `manage.py runworker`. Add overrides
+# here as JOBS = {...}; defaults live in jobs/conf.py
@@ -0,0 +1,118 @@
+import os
+import platform
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment
+from django.utils import timezone
+
+from benchmarks.runner import SCENARIOS, compare, load_baseline, run_scenario, save_results
+from benchmarks.seed import bench_context
+from location.stub_upstream import StubUpstream
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the main API endpoints against the seeded benchmark data "
+        "(see seed_benchmark) and a local stub upstream, and compare with a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                            help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+        parser.add_argument('--concurrency', type=int, default=4, help="Concurrent clients per scenario")
+        parser.add_argument('--requests', type=int, default=50, help="Measured requests per client")
+        parser.add_argument('--warmup', type=int, default=2, help="Unmeasured requests per client first")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--upstream-delay', type=float, default=0.05,
+                            help="Seconds the stub upstream waits before answering")
+        parser.add_argument('--cassette', metavar='DIR',
+                            help="Replay recorded upstream responses from DIR instead of using the stub")
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results file")
+        parser.add_argument('--save-baseline', action='store_true', help="Write these results as the baseline")
+        parser.add_argument('--output', help="Also write the results to this JSON file")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed latency increase over the baseline, as a fraction")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit with an error when a regression is found")
+
+    def handle(self, *args, **options):
+        unknown = set(options['scenarios']) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+        scenarios = [SCENARIOS[name] for name in options['scenarios'] or SCENARIOS]
+
+        context = bench_context()
+        if not context['users'] or not context['event_ids']:
+            raise CommandError("No benchmark data; run `manage.py seed_benchmark` first")
+
+        # The test client's host and in-memory email backend
+        setup_test_environment()
+        results = {}
+        with ExitStack() as stack:
+            location_service = dict(settings.LOCATION_SERVICE, PREFETCH_ENABLED=False)
+            if options['cassette']:
+                location_service.update(UPSTREAM_CASSETTE_MODE='replay', UPSTREAM_CASSETTE_DIR=options['cassette'])
+            else:
+                stub = stack.enter_context(StubUpstream(delay=options['upstream_delay']))
+                location_service.update(UPSTREAM_BASE_URL=stub.url, UPSTREAM_CASSETTE_MODE=None)
+            stack.enter_context(override_settings(LOCATION_SERVICE=location_service))
+
+            for scenario in scenarios:
+                results[scenario.name] = run_scenario(
+                    scenario, context,
+                    concurrency=options['concurrency'],
+                    requests=options['requests'],
+                    warmup=options['warmup'],
+                    random_seed=options['seed'],
+                )
+                self._write_row(scenario.name, results[scenario.name])
+
+        meta = {
+            'date': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'upstream': 'cassette' if options['cassette'] else f"stub ({options['upstream_delay']}s)",
+            'events': len(context['event_ids']),
+        }
+        if options['output']:
+            save_results(options['output'], results, meta)
+        if options['save_baseline']:
+            save_results(options['baseline'], results, meta)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+            return
+        self._compare(results, options)
+
+    def _write_row(self, name, result):
+        errors = sum(result['errors'].values())
+        self.stdout.write(
+            f"{name:<20} {result['requests']:>6} req  {result['throughput_rps']:>8} req/s  "
+            f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+            f"queries {result['queries_mean']:>6} (max {result['queries_max']})"
+            + (self.style.ERROR(f"  {errors} errors {result['errors']}") if errors else "")
+        )
+
+    def _compare(self, results, options):
+        try:
+            baseline = load_baseline(options['baseline'])
+        except FileNotFoundError:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --save-baseline to create one")
+            return
+        mismatched = [name for name in results if name in baseline
+                      and baseline[name].get('concurrency') != results[name]['concurrency']]
+        if mismatched:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline was recorded at a different concurrency for: {', '.join(mismatched)}"
+            ))
+        regressions = compare(results, baseline, options['tolerance'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+            return
+        for name, metric, before, after, change in regressions:
+            self.stdout.write(self.style.WARNING(f"{name}: {metric} {before} -> {after} ({change:+.0%})"))
+        if options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} regression(s) against the baseline")
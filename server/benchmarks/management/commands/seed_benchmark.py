@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import flush, seed
+
+
+class Command(BaseCommand):
+    help = "Seed (or with --flush, remove) the benchmark dataset used by run_benchmark."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--events', type=int, default=1000)
+        parser.add_argument('--providers', type=int, default=400)
+        parser.add_argument('--max-links', type=int, default=4, help="Most providers linked to one event")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed; same seed, same dataset")
+        parser.add_argument('--flush', action='store_true', help="Only delete the benchmark dataset")
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {flush()} benchmark rows"))
+            return
+        counts = seed(
+            users=options['users'],
+            events=options['events'],
+            providers=options['providers'],
+            max_links=options['max_links'],
+            random_seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded " + ", ".join(f"{count} {name}" for name, count in counts.items())
+        ))
@@ -0,0 +1,182 @@
+"""
+In-process load generator for the API.
+
+Each worker thread owns a django.test.Client, so requests run through the
+full middleware/DRF stack without a network hop, and SQL queries can be
+counted per request on the worker's own connection. Upstream calls go to
+a StubUpstream (or a replay cassette), never to RapidAPI.
+"""
+import json
+import math
+import random
+import threading
+import time
+
+from django.db import connection, connections
+from django.test import Client
+
+from .seed import BENCH_PASSWORD
+
+
+class Scenario:
+    """
+    One endpoint to drive. `build(rng, context, user)` returns the request
+    kwargs (path, and data for POSTs) for the next call.
+    """
+
+    def __init__(self, name, method, build, authenticated=True):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.authenticated = authenticated
+
+
+def _location_body(rng, context):
+    return {
+        'event_category': rng.choice(context['categories']),
+        'event_location': {'description': rng.choice(context['cities'])},
+    }
+
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in (
+        Scenario('events-all', 'get', lambda rng, context, user: {'path': '/api/events/all/'}),
+        Scenario('events-mine', 'get', lambda rng, context, user: {'path': '/api/events/my-events/'}),
+        Scenario('event-detail', 'get', lambda rng, context, user: {
+            'path': f"/api/events/{rng.choice(context['event_ids'])}/",
+        }),
+        Scenario('location-providers', 'post', lambda rng, context, user: {
+            'path': '/api/location/providers/', 'data': _location_body(rng, context),
+        }),
+        Scenario('login', 'post', lambda rng, context, user: {
+            'path': '/api/auth/login/', 'data': {'email': user.email, 'password': BENCH_PASSWORD},
+        }, authenticated=False),
+    )
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _send(client, scenario, rng, context, user):
+    kwargs = scenario.build(rng, context, user)
+    if scenario.method == 'post':
+        return client.post(kwargs['path'], kwargs.get('data', {}), content_type='application/json')
+    return client.get(kwargs['path'])
+
+
+def _worker(scenario, context, requests, warmup, random_seed, samples, errors, lock):
+    rng = random.Random(random_seed)
+    user = rng.choice(context['users'])
+    client = Client()
+    if scenario.authenticated:
+        client.force_login(user)
+    try:
+        for _ in range(warmup):
+            _send(client, scenario, rng, context, user)
+        for _ in range(requests):
+            counter = QueryCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                response = _send(client, scenario, rng, context, user)
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append((elapsed, counter.count))
+                if response.status_code >= 400:
+                    errors[response.status_code] = errors.get(response.status_code, 0) + 1
+    finally:
+        connections.close_all()
+
+
+def run_scenario(scenario, context, concurrency=4, requests=50, warmup=2, random_seed=42):
+    """
+    Drive one scenario with `concurrency` threads of `requests` calls each.
+    Returns throughput, latency percentiles (ms) and queries per request.
+    """
+    samples, errors, lock = [], {}, threading.Lock()
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(scenario, context, requests, warmup, random_seed + i, samples, errors, lock),
+            name=f'bench-{scenario.name}-{i}',
+        )
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+
+    latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+    queries = [count for _, count in samples]
+    return {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / wall_time, 1) if wall_time else None,
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+# Metrics compared against the baseline; higher is worse for all of them
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean')
+
+# Extra queries per request (on average) tolerated before flagging a regression;
+# cache hits vary a little with thread interleaving
+QUERY_SLACK = 0.5
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compare results with a baseline of the same shape. Returns a list of
+    (scenario, metric, baseline, current, change) for every metric that got
+    worse by more than `tolerance` (a fraction). Query counts only get
+    QUERY_SLACK: a new query per request is a regression however fast it is.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), current.get(metric)
+            if before is None or after is None:
+                continue
+            allowed = before + QUERY_SLACK if metric == 'queries_mean' else before * (1 + tolerance)
+            if after > allowed:
+                change = (after - before) / before if before else math.inf
+                regressions.append((name, metric, before, after, change))
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def save_results(path, results, meta):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
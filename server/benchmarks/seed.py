@@ -0,0 +1,148 @@
+"""
+A reproducible benchmark dataset: organizers, events across the approved
+categories, a provider catalogue around a handful of cities, and the
+EventProvider links between them.
+
+Everything created here is recognisable (BENCH_EMAIL_DOMAIN users and
+'bench-' providers), so flush() removes it without touching real data.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from events.models import Category, Event, EventProvider, Provider
+from location.local_index import type_to_tag
+
+BENCH_EMAIL_DOMAIN = 'bench.plannery.test'
+BENCH_PASSWORD = 'bench-password'
+PLACE_TYPES = ['event_venue', 'restaurant', 'catering_service', 'store', 'bar']
+BENCH_PROVIDER_PREFIX = 'bench-'
+
+CITIES = {
+    'Paris, France': (48.8566, 2.3522),
+    'Berlin, Germany': (52.5200, 13.4050),
+    'Madrid, Spain': (40.4168, -3.7038),
+    'Rome, Italy': (41.9028, 12.4964),
+    'London, UK': (51.5074, -0.1278),
+    'New York, NY, USA': (40.7128, -74.0060),
+    'Casablanca, Morocco': (33.5731, -7.5898),
+    'Amsterdam, Netherlands': (52.3676, 4.9041),
+}
+
+# Created (approved) when the database has no approved categories yet
+FALLBACK_CATEGORIES = ('Music', 'Food & Drink', 'Business', 'Sports', 'Arts', 'Community')
+
+BATCH_SIZE = 500
+
+
+def bench_users():
+    return get_user_model().objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}')
+
+
+def _categories():
+    categories = list(Category.objects.filter(is_approved=True).order_by('id'))
+    if not categories:
+        categories = [
+            Category.objects.get_or_create(name=name, defaults={'is_approved': True})[0]
+            for name in FALLBACK_CATEGORIES
+        ]
+    return categories
+
+
+def flush():
+    """
+    Delete the benchmark dataset. Returns the number of rows deleted.
+    """
+    with transaction.atomic():
+        deleted = bench_users().delete()[0]  # Cascades to their events and links
+        deleted += Provider.objects.filter(external_id__startswith=BENCH_PROVIDER_PREFIX).delete()[0]
+    return deleted
+
+
+@transaction.atomic
+def seed(users=50, events=1000, providers=400, max_links=4, random_seed=42):
+    """
+    Replace the benchmark dataset with a freshly generated one; the same
+    arguments always produce the same rows. Returns a dict of row counts.
+    """
+    flush()
+    rng = random.Random(random_seed)
+    User = get_user_model()
+    # Hashing once keeps seeding fast while logins still pay the real hasher cost
+    password = make_password(BENCH_PASSWORD)
+    organizers = User.objects.bulk_create([
+        User(username=f'bench{i}', email=f'bench{i}@{BENCH_EMAIL_DOMAIN}', password=password)
+        for i in range(users)
+    ], batch_size=BATCH_SIZE)
+
+    cities = list(CITIES.items())
+    catalogue = []
+    for i in range(providers):
+        city, (lat, lng) = cities[i % len(cities)]
+        provider = Provider(
+            name=f'Bench Provider {i}',
+            api_source=Provider.APISource.RAPIDAPI,
+            external_id=f'{BENCH_PROVIDER_PREFIX}{i}',
+            address=f'{i} Benchmark Street, {city}',
+            phone=f'+1 555-{i:04d}',
+            website=f'https://provider-{i}.example.com',
+            rating=round(rng.uniform(2.5, 5), 1),
+            review_count=rng.randint(0, 2000),
+            coordinates={'lat': lat + rng.uniform(-0.05, 0.05), 'lng': lng + rng.uniform(-0.05, 0.05)},
+            description='Seeded benchmark provider',
+            tags=[type_to_tag(t) for t in rng.sample(PLACE_TYPES, 2)],
+            provider_type='event_venue',
+        )
+        provider.sync_location_fields()  # bulk_create bypasses save()
+        catalogue.append(provider)
+    catalogue = Provider.objects.bulk_create(catalogue, batch_size=BATCH_SIZE)
+
+    categories = _categories()
+    now = timezone.now()
+    seeded_events = Event.objects.bulk_create([
+        Event(
+            title=f'Bench Event {i}',
+            category=rng.choice(categories),
+            organizer=rng.choice(organizers),
+            budget=rng.randrange(500, 50000, 100),
+            start_date=now + timedelta(days=rng.randint(1, 365), minutes=rng.randint(0, 1439)),
+            location={'description': rng.choice(cities)[0]},
+            expected_attendance=rng.randint(10, 500),
+        )
+        for i in range(events)
+    ], batch_size=BATCH_SIZE)
+
+    links = []
+    for event in seeded_events:
+        for provider in rng.sample(catalogue, min(rng.randint(0, max_links), len(catalogue))):
+            links.append(EventProvider(
+                event=event,
+                provider=provider,
+                selected_by=event.organizer,
+                status=rng.choice(['contacted', 'pending', 'confirmed', 'canceled']),
+            ))
+    EventProvider.objects.bulk_create(links, batch_size=BATCH_SIZE)
+
+    return {
+        'users': len(organizers),
+        'providers': len(catalogue),
+        'events': len(seeded_events),
+        'event_providers': len(links),
+    }
+
+
+def bench_context():
+    """
+    What the scenarios need to build requests against the seeded data.
+    """
+    users = list(bench_users().order_by('username'))
+    return {
+        'users': users,
+        'event_ids': list(Event.objects.filter(organizer__in=users).values_list('id', flat=True)),
+        'categories': [category.name for category in _categories()],
+        'cities': list(CITIES),
+    }
@@ -3,7 +3,7 @@ from .models import Event, Category, Provider, Checklist
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'is_approved')
+    list_display = ('name', 'is_approved', 'place_types')
     list_filter = ('is_approved',)
     search_fields = ('name',)
 
@@ -0,0 +1,68 @@
+"""
+Conditional GET for the event endpoints.
+
+Validators come from one query over just the events a request renders (one
+event, or the rows of the requested list page), grouped per event: its
+updated_at, category and organizer names and, when providers are rendered,
+the count and max(updated_at) of its EventProvider links and linked
+providers. Event ids and link counts catch deletions and names catch
+renames, none of which leave a timestamp behind; so the ETag is the precise
+validator and Last-Modified only moves on inserts and updates.
+"""
+import hashlib
+import json
+from datetime import datetime
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def event_validators(queryset, include_providers=False, variant=''):
+    """
+    Return (etag, last_modified, count) for the events in `queryset`, which
+    should be bounded to what the response renders.
+    `variant` separates representations of the same rows (query string, user).
+    """
+    rows = queryset.order_by('pk').values_list('pk', 'updated_at', 'category__name', 'organizer__username')
+    if include_providers:
+        rows = rows.annotate(
+            links_updated=Max('providers__updated_at'),
+            links=Count('providers', distinct=True),
+            providers_updated=Max('providers__provider__updated_at'),
+        )
+    rows = list(rows)
+
+    timestamps = [value for row in rows for value in row if isinstance(value, datetime)]
+    last_modified = int(max(timestamps).timestamp()) if timestamps else None
+    payload = json.dumps([variant, rows], default=str)
+    etag = '"%s"' % hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    return etag, last_modified, len(rows)
+
+
+class ConditionalGetMixin:
+    """
+    Adds a strong ETag and Last-Modified to event reads, and answers a
+    matching If-None-Match / If-Modified-Since with 304 before the events
+    are loaded or serialized.
+    """
+
+    def conditional_response(self, request, queryset, render, include_providers=False, require_rows=False):
+        """
+        Return 304 if the client's copy is current, else `render()`. With
+        require_rows, an empty queryset (a missing event) is left to render().
+        """
+        variant = f'{request.get_full_path()}|{request.user.pk}'
+        etag, last_modified, count = event_validators(queryset, include_providers, variant)
+        response = None
+        if count or not require_rows:
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Responses depend on the user; let clients keep them but always revalidate
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,78 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'THRESHOLD': 5,
+    'RAISE': False,
+}
+
+
+def guard_setting(name):
+    return getattr(settings, 'N_PLUS_ONE_GUARD', {}).get(name, DEFAULTS[name])
+
+
+class NPlusOneError(AssertionError):
+    """
+    The same query ran THRESHOLD or more times in one request.
+    """
+
+
+class QueryPatternCounter:
+    """
+    Database execute wrapper that counts queries by SQL text. The text still
+    has its placeholders, so a query run once per row of a list (an N+1)
+    shows up as one pattern with a high count.
+    """
+
+    def __init__(self):
+        self.patterns = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.patterns[sql] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def total(self):
+        return sum(self.patterns.values())
+
+    def repeated(self, threshold):
+        return [(sql, count) for sql, count in self.patterns.most_common() if count >= threshold]
+
+
+class NPlusOneGuardMiddleware:
+    """
+    Flags requests that repeat a query THRESHOLD or more times, usually a
+    serializer reading a relation the view did not select_related or
+    prefetch (see EventSerializer.setup_eager_loading). Logs a warning, or
+    raises NPlusOneError with RAISE (for tests). On when N_PLUS_ONE_GUARD['ENABLED'].
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not guard_setting('ENABLED'):
+            return self.get_response(request)
+
+        counter = QueryPatternCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        repeated = counter.repeated(guard_setting('THRESHOLD'))
+        if repeated:
+            sql, count = repeated[0]
+            message = (
+                f"Possible N+1 in {request.method} {request.path}: {len(repeated)} quer"
+                f"{'y' if len(repeated) == 1 else 'ies'} repeated, worst ran {count} times "
+                f"({counter.total} queries in total): {sql[:300]}"
+            )
+            if guard_setting('RAISE'):
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
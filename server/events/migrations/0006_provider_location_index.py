@@ -0,0 +1,74 @@
+# Generated by Django 5.2 on 2026-10-18 13:58
+
+from django.db import migrations, models
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(lat, lng, precision):
+    # Frozen copy of location.geo.geohash_encode, so this migration keeps
+    # producing the same cells whatever happens to the live helper
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits = bits << 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def backfill_location_fields(apps, schema_editor):
+    Provider = apps.get_model('events', 'Provider')
+    for provider in Provider.objects.all().iterator():
+        coordinates = provider.coordinates or {}
+        try:
+            latitude = float(coordinates.get('lat'))
+            longitude = float(coordinates.get('lng'))
+        except (TypeError, ValueError):
+            continue
+        Provider.objects.filter(pk=provider.pk).update(
+            latitude=latitude,
+            longitude=longitude,
+            geo_cell=geohash_encode(latitude, longitude, 5)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_provider_address_provider_coordinates_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provider',
+            name='geo_cell',
+            field=models.CharField(blank=True, db_index=True, max_length=5),
+        ),
+        migrations.AddField(
+            model_name='provider',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='provider',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_location_fields, migrations.RunPython.noop),
+    ]
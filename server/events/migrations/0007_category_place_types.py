@@ -0,0 +1,52 @@
+from django.db import migrations, models
+
+
+# The mapping previously hard-coded in location/providers.py
+CATEGORY_PLACE_TYPES = {
+    'Music': ['performing_arts_theater', 'concert_hall', 'electronics_store', 'karaoke'],
+    'Food & Drink': ['restaurant', 'cafe', 'catering_service', 'bakery', 'meal_delivery', 'meal_takeaway', 'supermarket', 'bar', 'fine_dining_restaurant', 'buffet_restaurant', 'liquor_store'],
+    'Business': ['corporate_office', 'convention_center', 'event_venue', 'banquet_hall', 'insurance_agency', 'lawyer', 'consultant', 'accounting', 'catering_service'],
+    'Sports': ['sports_complex', 'stadium', 'arena', 'athletic_field', 'fitness_center', 'gym', 'sports_club', 'sporting_goods_store', 'sports_activity_location'],
+    'Education': ['school', 'university', 'library', 'book_store', 'museum', 'cultural_center'],
+    'Arts': ['art_gallery', 'art_studio', 'museum', 'cultural_center', 'performing_arts_theater'],
+    'Technology': ['electronics_store', 'cell_phone_store', 'internet_cafe'],
+    'Health': ['pharmacy', 'drugstore', 'hospital', 'doctor', 'wellness_center', 'fitness_center'],
+    'Travel': ['travel_agency', 'tourist_information_center', 'airport', 'hotel', 'lodging', 'tourist_attraction'],
+    'Fashion': ['clothing_store', 'shoe_store', 'jewelry_store', 'beauty_salon', 'makeup_artist', 'hair_salon'],
+    'Film & Media': ['movie_theater', 'movie_rental', 'electronics_store', 'video_arcade'],
+    'Gaming': ['video_arcade', 'electronics_store', 'store'],
+    'Community': ['community_center', 'cultural_center', 'event_venue', 'convention_center'],
+    'Charity': ['community_center', 'event_venue', 'banquet_hall'],
+    'Religious': ['church', 'synagogue', 'mosque', 'hindu_temple', 'florist', 'catering_service'],
+    'Politics': ['government_office', 'city_hall', 'event_venue', 'banquet_hall', 'community_center'],
+    'Science': ['museum', 'university', 'school', 'electronics_store', 'book_store'],
+    'Family': ['amusement_center', 'park', 'playground', 'restaurant', 'zoo', 'movie_theater', 'aquarium'],
+    'Pets': ['pet_store', 'veterinary_care', 'park', 'dog_park'],
+    'Outdoors': ['park', 'hiking_area', 'sporting_goods_store', 'bicycle_store', 'camping_cabin', 'garden', 'national_park', 'state_park'],
+    'Nightlife': ['bar', 'night_club', 'karaoke', 'restaurant', 'liquor_store', 'comedy_club'],
+    'Performing Arts': ['performing_arts_theater', 'concert_hall', 'dance_hall', 'cultural_center', 'event_venue'],
+    'Culture': ['museum', 'art_gallery', 'cultural_center', 'historical_landmark', 'performing_arts_theater', 'book_store'],
+    'Holiday': ['event_venue', 'banquet_hall', 'gift_shop', 'florist', 'restaurant', 'hotel'],
+}
+
+
+def add_place_types(apps, schema_editor):
+    Category = apps.get_model('events', 'Category')
+    for name, place_types in CATEGORY_PLACE_TYPES.items():
+        Category.objects.filter(name=name, place_types=[]).update(place_types=place_types)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_provider_location_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='place_types',
+            field=models.JSONField(blank=True, default=list, help_text='Google Places types searched for providers of events in this category'),
+        ),
+        migrations.RunPython(add_place_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+# Fields that change upstream over time; the merged row takes them from the newest duplicate
+REFRESHED_FIELDS = ('rating', 'review_count', 'phone')
+
+# Display text that older rows stored as their phone; not a real value
+NO_PHONE = 'No phone number available'
+
+
+def _has_value(value):
+    return bool(value) and value != NO_PHONE
+
+
+def merge_duplicate_providers(apps, schema_editor):
+    Provider = apps.get_model('events', 'Provider')
+    EventProvider = apps.get_model('events', 'EventProvider')
+    groups = (
+        Provider.objects
+        .exclude(external_id='')
+        .values('api_source', 'external_id')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for group in list(groups):
+        rows = list(
+            Provider.objects
+            .filter(api_source=group['api_source'], external_id=group['external_id'])
+            .order_by('id')
+        )
+        keep, duplicates = rows[0], rows[1:]
+        duplicate_ids = [row.id for row in duplicates]
+
+        # Repoint links to the kept row; an event linked to several copies keeps one link
+        linked_events = set(EventProvider.objects.filter(provider=keep).values_list('event_id', flat=True))
+        for link in EventProvider.objects.filter(provider_id__in=duplicate_ids).order_by('id'):
+            if link.event_id in linked_events:
+                link.delete()
+            else:
+                EventProvider.objects.filter(pk=link.pk).update(provider=keep)
+                linked_events.add(link.event_id)
+
+        # Newest value that is actually set, per field
+        refreshed = {}
+        for field in REFRESHED_FIELDS:
+            values = [getattr(row, field) for row in reversed(rows) if _has_value(getattr(row, field))]
+            if values:
+                refreshed[field] = values[0]
+        if keep.phone == NO_PHONE and 'phone' not in refreshed:
+            refreshed['phone'] = ''
+        Provider.objects.filter(pk=keep.pk).update(**refreshed)
+        Provider.objects.filter(pk__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_category_place_types'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_providers, migrations.RunPython.noop),
+    ]
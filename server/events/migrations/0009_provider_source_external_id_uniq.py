@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_merge_duplicate_providers'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='provider',
+            constraint=models.UniqueConstraint(condition=models.Q(('external_id', ''), _negated=True), fields=('api_source', 'external_id'), name='provider_source_external_id_uniq'),
+        ),
+    ]
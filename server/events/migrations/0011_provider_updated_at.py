@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 14:24
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_event_provider_updated_at(apps, schema_editor):
+    EventProvider = apps.get_model('events', 'EventProvider')
+    EventProvider.objects.filter(updated_at__isnull=True).update(updated_at=F('selected_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_event_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventprovider',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='provider',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.RunPython(backfill_event_provider_updated_at, migrations.RunPython.noop),
+    ]
@@ -2,10 +2,19 @@ from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+from location.geo import geohash_encode
+
+# Geohash precision of Provider.geo_cell (~4.9km x 4.9km cells)
+GEO_CELL_PRECISION = 5
+
 
 class Category(models.Model):
     name  = models.CharField(max_length=50, unique=True )
     is_approved= models.BooleanField(default=False)
+    place_types = models.JSONField(
+        default=list, blank=True,
+        help_text='Google Places types searched for providers of events in this category'
+    )
 
     def __str__(self):
         return f"{self.name} , ({self.is_approved})"
@@ -29,6 +38,38 @@ class Provider(models.Model):
     description = models.TextField(blank=True)
     tags = models.JSONField(default=list, blank=True)
     provider_type = models.CharField(max_length=100, blank=True)
+    # Copies of `coordinates`, kept in sync on save, for local spatial search (by geo_cell)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geo_cell = models.CharField(max_length=GEO_CELL_PRECISION, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True)
+
+    class Meta:
+        constraints = [
+            # One row per upstream place; manually entered providers have no external_id
+            models.UniqueConstraint(
+                fields=['api_source', 'external_id'],
+                condition=~models.Q(external_id=''),
+                name='provider_source_external_id_uniq',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.sync_location_fields()
+        if kwargs.get('update_fields') is not None and 'coordinates' in kwargs['update_fields']:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'latitude', 'longitude', 'geo_cell'}
+        super().save(*args, **kwargs)
+
+    def sync_location_fields(self):
+        coordinates = self.coordinates or {}
+        try:
+            self.latitude = float(coordinates.get('lat'))
+            self.longitude = float(coordinates.get('lng'))
+        except (TypeError, ValueError):
+            self.latitude = self.longitude = None
+            self.geo_cell = ''
+            return
+        self.geo_cell = geohash_encode(self.latitude, self.longitude, GEO_CELL_PRECISION)
     
     def __str__(self):
         return f"{self.name} ({self.api_source})"
@@ -44,6 +85,13 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
 
+    class Meta:
+        # Keyset pagination of the event lists (events/pagination.py)
+        indexes = [
+            models.Index(fields=['-start_date', '-id'], name='event_start_date_id_idx'),
+            models.Index(fields=['organizer', '-start_date', '-id'], name='event_organizer_start_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -71,6 +119,7 @@ class EventProvider(models.Model):
         default='pending'
     )
     price_quote = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True)
     
     class Meta:
         unique_together = ['event', 'provider']
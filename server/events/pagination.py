@@ -0,0 +1,92 @@
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class EventCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (start_date, id), newest first.
+
+    DRF's CursorPagination keys on the first ordering field only and skips
+    ties with an OFFSET; here the cursor carries both start_date and id, so
+    every page is a single index range scan (see the Event indexes) however
+    deep the client pages. Cursors stay opaque: base64 of the position.
+    """
+    ordering = ('-start_date', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def page_window(self, queryset, request):
+        """
+        The unevaluated rows paginate_queryset reads for this request: the
+        keyset range after (or before) the cursor, one row past the page to
+        tell whether there is more. None when pagination is off.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+
+        if reverse:
+            queryset = queryset.order_by('start_date', 'id')
+        else:
+            queryset = queryset.order_by('-start_date', '-id')
+
+        if self.cursor and self.cursor.position:
+            start_date, pk = self._parse_position(self.cursor.position)
+            # The plain start_date bound lets the database range-scan the
+            # (start_date, id) index; the OR settles ties on id
+            if reverse:
+                queryset = queryset.filter(
+                    Q(start_date__gt=start_date) | Q(start_date=start_date, id__gt=pk),
+                    start_date__gte=start_date,
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(start_date__lt=start_date) | Q(start_date=start_date, id__lt=pk),
+                    start_date__lte=start_date,
+                )
+        return queryset[:self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        window = self.page_window(queryset, request)
+        if window is None:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        reverse = self.cursor.reverse if self.cursor else False
+        results = list(window)
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = self.cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def _position(self, event):
+        return f'{event.start_date.isoformat()}|{event.pk}'
+
+    def _parse_position(self, position):
+        try:
+            start_date, pk = position.rsplit('|', 1)
+            return datetime.fromisoformat(start_date), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._position(self.page[0])))
@@ -1,7 +1,50 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Event, Category, Checklist, Provider, EventProvider
 
 
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets for reads. The view passes `fields` (the top-level
+    fields to render, None for all) and `expand` (which of
+    `expandable_fields` to include) in the context, from
+    ?fields=id,title&expand=providers. Expandable fields are left out unless
+    expanded. Without those context entries, e.g. when nested or used
+    directly, the serializer renders in full.
+
+    `field_columns` maps serializer fields to the model columns behind them
+    (default: the field of the same name), so setup_eager_loading() can load
+    only what will be rendered.
+    """
+    expandable_fields = ()
+    field_columns = {}
+    required_columns = ('id',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        context = kwargs.get('context') or {}
+        if 'expand' in context:
+            selected = self.selected_fields(context.get('fields'), context['expand'])
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, fields=None, expand=None):
+        selected = set(cls.Meta.fields)
+        if expand is not None:
+            selected -= set(cls.expandable_fields) - set(expand)
+        if fields is not None:
+            selected &= set(fields) | set(cls.expandable_fields)
+        return selected
+
+    @classmethod
+    def columns_for(cls, selected):
+        columns = set(cls.required_columns)
+        for name in selected:
+            columns.update(cls.field_columns.get(name, (name,)))
+        return sorted(columns)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -18,8 +61,10 @@ class ProviderSerializer(serializers.ModelSerializer):
         ]
 
 
-class EventProviderSerializer(serializers.ModelSerializer):
+class EventProviderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     provider_details = ProviderSerializer(source='provider', read_only=True)
+    expandable_fields = ('provider_details',)
+    field_columns = {'provider_details': ('provider',)}
     
     class Meta:
         model = EventProvider
@@ -30,6 +75,16 @@ class EventProviderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['selected_by', 'selected_at']
 
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=None):
+        selected = cls.selected_fields(fields, expand)
+        if 'provider_details' in selected:
+            # provider_details reads the provider of every row
+            queryset = queryset.select_related('provider')
+        if fields is not None:
+            queryset = queryset.only(*cls.columns_for(selected))
+        return queryset
+
 
 class ChecklistSerializer(serializers.ModelSerializer):
     class Meta:
@@ -37,10 +92,18 @@ class ChecklistSerializer(serializers.ModelSerializer):
         fields = ['id', 'tasks']
 
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     organizer_name = serializers.CharField(source='organizer.username', read_only=True)
     providers = EventProviderSerializer(many=True, read_only=True)
+    expandable_fields = ('providers',)
+    field_columns = {
+        'category_name': ('category__name',),
+        'organizer_name': ('organizer__username',),
+        'providers': (),
+    }
+    # start_date is the pagination key
+    required_columns = ('id', 'start_date')
     
     class Meta:
         model = Event
@@ -51,6 +114,28 @@ class EventSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'providers'
         ]
         read_only_fields = ['organizer']
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=None):
+        """
+        Load everything the selected fields read, so a page of events costs a
+        fixed number of queries: category and organizer are joined in, and
+        providers (with their provider) come in one prefetch query. Fields
+        that are not selected are not loaded at all.
+        """
+        selected = cls.selected_fields(fields, expand)
+        if 'category_name' in selected:
+            queryset = queryset.select_related('category')
+        if 'organizer_name' in selected:
+            queryset = queryset.select_related('organizer')
+        if 'providers' in selected:
+            queryset = queryset.prefetch_related(Prefetch(
+                'providers',
+                queryset=EventProviderSerializer.setup_eager_loading(EventProvider.objects.order_by('id'))
+            ))
+        if fields is not None:
+            queryset = queryset.only(*cls.columns_for(selected))
+        return queryset
         
     def validate_budget(self, value):
         if value < 0:
@@ -1,3 +1,444 @@
-from django.test import TestCase
+from base64 import b64encode
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .middleware import NPlusOneError, NPlusOneGuardMiddleware
+from .models import Category, Event, EventProvider, Provider
+from .views import upsert_provider
+
+# Event detail: the ETag/Last-Modified validators, the event joined to its
+# category and organizer, then its EventProviders joined to their providers
+# (auth is forced, so no session queries)
+EVENT_DETAIL_QUERIES = 3
+
+# Event list page with ?expand=providers: the page's validators, the events
+# (joined to category and organizer), then their providers
+EVENT_LIST_QUERIES = 3
+
+# A 304 only runs the validators query
+NOT_MODIFIED_QUERIES = 1
+
+# API tests fail on any query repeated per row
+N_PLUS_ONE_GUARD = {'ENABLED': True, 'THRESHOLD': 5, 'RAISE': True}
+
+
+def create_event(organizer, category, providers=0, **fields):
+    event = Event.objects.create(
+        title=fields.pop('title', 'Event'),
+        category=category,
+        organizer=organizer,
+        budget=1000,
+        start_date=fields.pop('start_date', timezone.now() + timedelta(days=30)),
+        location={'description': 'Paris, France'},
+        **fields
+    )
+    for i in range(providers):
+        provider = Provider.objects.create(
+            name=f'Provider {i}', api_source=Provider.APISource.RAPIDAPI, external_id=f'place-{event.pk}-{i}',
+            phone='' if i % 2 else '+1 555-0100', rating=4.0,
+        )
+        EventProvider.objects.create(event=event, provider=provider, selected_by=organizer)
+    return event
+
+
+@override_settings(N_PLUS_ONE_GUARD=N_PLUS_ONE_GUARD)
+class EventDetailQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='organizer', email='organizer@example.com', password='pw'
+        )
+        cls.category = Category.objects.create(name='Detail Test', is_approved=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _event_with_providers(self, count):
+        return create_event(self.user, self.category, providers=count, title=f'Event with {count} providers')
+
+    def test_query_count_does_not_grow_with_providers(self):
+        for count in (0, 1, 10):
+            event = self._event_with_providers(count)
+            with self.subTest(providers=count), self.assertNumQueries(EVENT_DETAIL_QUERIES):
+                response = self.client.get(f'/api/events/{event.pk}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['service_providers']), count)
+            self.assertEqual(len(response.data['providers']), count)
+
+    def test_service_providers_shape(self):
+        event = self._event_with_providers(2)
+        response = self.client.get(f'/api/events/{event.pk}/')
+        first, second = response.data['service_providers']
+        self.assertEqual(first['name'], 'Provider 0')
+        self.assertEqual(first['phone_number'], '+1 555-0100')
+        self.assertEqual(second['phone_number'], 'No phone number available')
+        self.assertEqual(second['status'], 'pending')
+        self.assertEqual(response.data['category_name'], 'Detail Test')
+        self.assertEqual(response.data['organizer_name'], 'organizer')
+
+    def test_lean_drops_duplicate_providers_list(self):
+        event = self._event_with_providers(3)
+        with self.assertNumQueries(EVENT_DETAIL_QUERIES):
+            response = self.client.get(f'/api/events/{event.pk}/', {'lean': 'true'})
+        self.assertNotIn('providers', response.data)
+        self.assertEqual(len(response.data['service_providers']), 3)
+
+
+@override_settings(N_PLUS_ONE_GUARD=N_PLUS_ONE_GUARD)
+class EventCursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='pager', email='pager@example.com', password='pw'
+        )
+        category = Category.objects.create(name='Pagination Test', is_approved=True)
+        start = timezone.now() + timedelta(days=1)
+        # Groups of three events share a start_date, so pages split ties on id
+        Event.objects.bulk_create([
+            Event(title=f'Event {i}', category=category, organizer=cls.user, budget=100,
+                  start_date=start + timedelta(hours=i // 3))
+            for i in range(12)
+        ])
+        cls.expected = list(Event.objects.order_by('-start_date', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_forward_and_back_without_gaps(self):
+        url, seen, pages = '/api/events/my-events/?page_size=5', [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            seen += [event['id'] for event in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        back = self.client.get(pages[-1]['previous'])
+        self.assertEqual([event['id'] for event in back.data['results']], self.expected[5:10])
+
+    def test_malformed_cursor_is_not_found(self):
+        cursor = b64encode(b'p=not-a-position').decode('ascii')
+        response = self.client.get('/api/events/all/', {'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(N_PLUS_ONE_GUARD=N_PLUS_ONE_GUARD)
+class EventListQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='lister', email='lister@example.com', password='pw'
+        )
+        cls.other = get_user_model().objects.create_user(
+            username='other', email='other@example.com', password='pw'
+        )
+        cls.category = Category.objects.create(name='List Test', is_approved=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_query_count_does_not_grow_with_events(self):
+        for batch in range(3):
+            for organizer in (self.user, self.other):
+                create_event(organizer, self.category, providers=3, title=f'Event {batch}')
+            for url in ('/api/events/all/', '/api/events/my-events/'):
+                with self.subTest(url=url, batch=batch), self.assertNumQueries(EVENT_LIST_QUERIES):
+                    response = self.client.get(url, {'expand': 'providers'})
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+        event = response.data['results'][0]
+        self.assertEqual(event['category_name'], 'List Test')
+        self.assertEqual(event['organizer_name'], 'lister')
+        self.assertEqual(len(event['providers']), 3)
+        self.assertEqual(event['providers'][0]['provider_details']['name'], 'Provider 0')
+
+    def test_event_providers_list_joins_providers(self):
+        event = create_event(self.user, self.category, providers=6)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/events/{event.pk}/providers/', {'expand': 'provider_details'})
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(response.data[0]['provider_details']['name'], 'Provider 0')
+
+
+@override_settings(N_PLUS_ONE_GUARD=N_PLUS_ONE_GUARD)
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='sparse', email='sparse@example.com', password='pw'
+        )
+        cls.category = Category.objects.create(name='Sparse Test', is_approved=True)
+        cls.event = create_event(cls.user, cls.category, providers=2, title='Sparse event')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_lists_leave_out_nested_providers_by_default(self):
+        with self.assertNumQueries(EVENT_LIST_QUERIES - 1):
+            response = self.client.get('/api/events/all/')
+        event = response.data['results'][0]
+        self.assertNotIn('providers', event)
+        self.assertEqual(event['category_name'], 'Sparse Test')
+
+    def test_fields_prune_response_and_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/my-events/', {'fields': 'id,title,unknown'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+        self.assertEqual(len(queries), 2)  # Validators, then the page
+        sql = queries[1]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"budget"', sql)
+        self.assertIn('"start_date"', sql)  # Still needed for the next cursor
+
+    def test_fields_with_expand(self):
+        with self.assertNumQueries(EVENT_LIST_QUERIES):
+            response = self.client.get('/api/events/all/', {'fields': 'title,organizer_name', 'expand': 'providers'})
+        event = response.data['results'][0]
+        self.assertEqual(set(event), {'title', 'organizer_name', 'providers'})
+        self.assertEqual(event['providers'][0]['provider_details']['name'], 'Provider 0')
+
+    def test_event_providers_leave_out_provider_details_by_default(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/events/{self.event.pk}/providers/')
+        self.assertNotIn('provider_details', response.data[0])
+        self.assertNotIn('JOIN', queries[0]['sql'])
+
+    def test_detail_fields(self):
+        response = self.client.get(f'/api/events/{self.event.pk}/', {'fields': 'id,title', 'lean': 'true'})
+        self.assertEqual(set(response.data), {'id', 'title', 'service_providers'})
+        self.assertEqual(len(response.data['service_providers']), 2)
+
+    def test_writes_ignore_field_selection(self):
+        response = self.client.patch(
+            f'/api/events/{self.event.pk}/?fields=id', {'title': 'Renamed'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'Renamed')
+
+
+class NPlusOneGuardTests(TestCase):
+    def _view(self, lookups):
+        def view(request):
+            for _ in range(lookups):
+                list(Category.objects.filter(name='X'))
+        return view
+
+    @override_settings(N_PLUS_ONE_GUARD=N_PLUS_ONE_GUARD)
+    def test_repeated_query_raises(self):
+        request = RequestFactory().get('/api/events/all/')
+        NPlusOneGuardMiddleware(self._view(4))(request)
+        with self.assertRaisesMessage(NPlusOneError, 'worst ran 5 times'):
+            NPlusOneGuardMiddleware(self._view(5))(request)
+
+    @override_settings(N_PLUS_ONE_GUARD=dict(N_PLUS_ONE_GUARD, RAISE=False))
+    def test_repeated_query_logs_without_raise(self):
+        request = RequestFactory().get('/api/events/all/')
+        with self.assertLogs('events.middleware', 'WARNING'):
+            NPlusOneGuardMiddleware(self._view(6))(request)
+
+
+@override_settings(N_PLUS_ONE_GUARD=N_PLUS_ONE_GUARD)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='poller', email='poller@example.com', password='pw'
+        )
+        cls.category = Category.objects.create(name='Conditional Test', is_approved=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.event = create_event(self.user, self.category, providers=2)
+        self.detail_url = f'/api/events/{self.event.pk}/'
+
+    def _revalidate(self, url, response, **params):
+        with self.assertNumQueries(NOT_MODIFIED_QUERIES):
+            return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        again = self._revalidate(self.detail_url, response)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+        self.assertEqual(again.content, b'')
+
+        since = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def test_detail_changes_invalidate(self):
+        changes = (
+            lambda: Event.objects.get(pk=self.event.pk).save(),
+            lambda: EventProvider.objects.filter(event=self.event).first().save(),
+            lambda: EventProvider.objects.filter(event=self.event).first().delete(),
+            lambda: upsert_provider({'place_id': f'place-{self.event.pk}-1', 'rating': 2.0}),
+        )
+        for change in changes:
+            response = self.client.get(self.detail_url)
+            change()
+            again = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(again.status_code, 200)
+            self.assertNotEqual(again['ETag'], response['ETag'])
+
+    def test_list_not_modified_until_an_event_changes(self):
+        response = self.client.get('/api/events/my-events/')
+        self.assertEqual(self._revalidate('/api/events/my-events/', response).status_code, 304)
+
+        create_event(self.user, self.category, title='Another')
+        self.assertEqual(
+            self.client.get('/api/events/my-events/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200
+        )
+
+    def test_list_validators_cover_only_the_requested_page(self):
+        older = create_event(self.user, self.category, title='Older', start_date=timezone.now() + timedelta(days=5))
+        for i in range(3):
+            create_event(self.user, self.category, title=f'Newer {i}', start_date=timezone.now() + timedelta(days=60 + i))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/all/', {'page_size': 2})
+        self.assertIn('LIMIT 3', queries[0]['sql'])
+
+        # Changes beyond the page leave its ETag alone
+        older.save()
+        self.assertEqual(self._revalidate('/api/events/all/', response, page_size=2).status_code, 304)
+        Event.objects.filter(title='Newer 2').get().save()
+        again = self.client.get('/api/events/all/', {'page_size': 2}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+
+        # A later page is validated by its own rows
+        following = self.client.get(again.data['next'])
+        self.assertEqual([event['title'] for event in following.data['results']], ['Newer 0', 'Event'])
+        self.assertEqual(self.client.get(again.data['next'], HTTP_IF_NONE_MATCH=following['ETag']).status_code, 304)
+
+    def test_renames_invalidate(self):
+        for url in ('/api/events/my-events/', self.detail_url):
+            for rename in (
+                lambda: Category.objects.filter(pk=self.category.pk).update(name=f'Renamed {url}'),
+                lambda: get_user_model().objects.filter(pk=self.user.pk).update(username=f'renamed-{len(url)}'),
+            ):
+                response = self.client.get(url)
+                rename()
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(again.status_code, 200)
+
+    def test_representations_have_their_own_etags(self):
+        full = self.client.get('/api/events/all/')
+        expanded = self.client.get('/api/events/all/', {'expand': 'providers'})
+        self.assertNotEqual(full['ETag'], expanded['ETag'])
+        self.assertEqual(self._revalidate('/api/events/all/', expanded, expand='providers').status_code, 304)
+        self.assertEqual(
+            self.client.get('/api/events/all/', HTTP_IF_NONE_MATCH=expanded['ETag']).status_code, 200
+        )
+
+    def test_missing_event_is_not_found(self):
+        response = self.client.get('/api/events/0/', HTTP_IF_NONE_MATCH='"anything"')
+        self.assertEqual(response.status_code, 404)
+
+
+class UpsertProviderTests(TestCase):
+    place = {
+        'place_id': 'place-1', 'name': 'Hall', 'address': '1 Main St', 'phone_number': '+1 555-0100',
+        'rating': 4.5, 'user_rating_count': 10, 'coordinates': {'lat': 48.85, 'lng': 2.35},
+    }
+
+    def test_creates_provider(self):
+        provider, created = upsert_provider(self.place)
+        self.assertTrue(created)
+        self.assertEqual(
+            (provider.external_id, provider.name, provider.phone, provider.rating),
+            ('place-1', 'Hall', '+1 555-0100', 4.5),
+        )
+
+    def test_refreshes_existing_provider(self):
+        first, _ = upsert_provider(self.place)
+        provider, created = upsert_provider(dict(
+            self.place, name='Renamed', phone_number='+1 555-0199', rating=3.9, user_rating_count=12,
+        ))
+        self.assertFalse(created)
+        self.assertEqual(provider.pk, first.pk)
+        provider.refresh_from_db()
+        self.assertEqual((provider.phone, provider.rating, provider.review_count), ('+1 555-0199', 3.9, 12))
+        self.assertEqual(provider.name, 'Hall')
+        self.assertEqual(Provider.objects.count(), 1)
+
+    def test_missing_phone_keeps_stored_one(self):
+        upsert_provider(self.place)
+        for phone in ('No phone number available', '', None):
+            with self.subTest(phone=phone):
+                provider, _ = upsert_provider(dict(self.place, phone_number=phone))
+                provider.refresh_from_db()
+                self.assertEqual(provider.phone, '+1 555-0100')
+
+    def test_placeholder_is_not_stored(self):
+        provider, _ = upsert_provider(dict(self.place, phone_number='No phone number available'))
+        self.assertEqual(provider.phone, '')
+
+
+class MergeDuplicateProvidersMigrationTests(TransactionTestCase):
+    migrate_from = [('events', '0007_category_place_types')]
+    migrate_to = [('events', '0008_merge_duplicate_providers')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        self.apps = executor.loader.project_state(self.migrate_from).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_are_merged_into_the_oldest_row(self):
+        User = self.apps.get_model('users', 'User')
+        Category = self.apps.get_model('events', 'Category')
+        Event = self.apps.get_model('events', 'Event')
+        Provider = self.apps.get_model('events', 'Provider')
+        EventProvider = self.apps.get_model('events', 'EventProvider')
+
+        user = User.objects.create(username='organizer', email='organizer@example.com')
+        category = Category.objects.create(name='Merge Test')
+        events = [
+            Event.objects.create(
+                title=f'Event {i}', category=category, organizer=user, budget=1000,
+                start_date=timezone.now(), location={},
+            )
+            for i in range(2)
+        ]
+        place = {'name': 'Hall', 'api_source': 'RAPIDAPI', 'external_id': 'place-1'}
+        keep = Provider.objects.create(phone='+1 555-0100', rating=4.0, review_count=5, **place)
+        middle = Provider.objects.create(phone='+1 555-0199', rating=4.2, review_count=8, **place)
+        newest = Provider.objects.create(phone='No phone number available', rating=4.4, review_count=9, **place)
+        other = Provider.objects.create(name='Other', api_source='RAPIDAPI', external_id='place-2')
+        EventProvider.objects.create(event=events[0], provider=keep, selected_by=user)
+        EventProvider.objects.create(event=events[0], provider=newest, selected_by=user)
+        EventProvider.objects.create(event=events[1], provider=middle, selected_by=user)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        Provider = apps.get_model('events', 'Provider')
+        EventProvider = apps.get_model('events', 'EventProvider')
+
+        self.assertEqual(set(Provider.objects.values_list('pk', flat=True)), {keep.pk, other.pk})
+        merged = Provider.objects.get(pk=keep.pk)
+        # Newest rating and count; the placeholder phone does not replace a real one
+        self.assertEqual((merged.rating, merged.review_count, merged.phone), (4.4, 9, '+1 555-0199'))
+        self.assertEqual(
+            sorted(EventProvider.objects.values_list('event_id', 'provider_id')),
+            sorted([(events[0].pk, keep.pk), (events[1].pk, keep.pk)]),
+        )
@@ -1,12 +1,58 @@
+from django.db import transaction
 from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status, generics
+from location.prefetch import prefetch_event_providers
+from location.providers import NO_PHONE
+from .conditional import ConditionalGetMixin
 from .models import Event, Category, Provider, EventProvider
+from .pagination import EventCursorPagination
 from .serializers import EventSerializer, CategorySerializer, ProviderSerializer, EventProviderSerializer
 
 
+def parse_field_list(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class EagerLoadingMixin:
+    """
+    Applies the serializer's setup_eager_loading() to the view's queryset, so
+    the related rows its nested fields read are fetched up front.
+
+    On reads, ?fields= and ?expand= (see SparseFieldsMixin) prune both the
+    serializer and the queryset; nested data is only included when expanded.
+    """
+    default_expand = ()
+
+    def get_sparse_fields(self):
+        """
+        (fields, expand) for this request, or (None, None) to render in full.
+        """
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None, None
+        expand = parse_field_list(self.request.query_params.get('expand')) or set()
+        return parse_field_list(self.request.query_params.get('fields')), expand | set(self.default_expand)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields, expand = self.get_sparse_fields()
+        if expand is not None:
+            context.update(fields=fields, expand=expand)
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            fields, expand = self.get_sparse_fields()
+            queryset = serializer_class.setup_eager_loading(queryset, fields=fields, expand=expand)
+        return queryset
+
+
 class CategoryListView(generics.ListAPIView):
     """
     API view to list all available event categories.
@@ -25,80 +71,123 @@ class EventCreateView(generics.CreateAPIView):
     
     def perform_create(self, serializer):
         # Set the current user as the organizer
-        serializer.save(organizer=self.request.user)
+        event = serializer.save(organizer=self.request.user)
+        # Warm the provider caches for the recommendations screen that usually follows
+        transaction.on_commit(lambda: prefetch_event_providers(event))
+
+
+class EventListMixin(ConditionalGetMixin, EagerLoadingMixin):
+    """
+    Conditional GET for the event lists. The validators cover only the
+    requested cursor page, so a poll costs one bounded query however many
+    events there are; providers count towards them only when expanded.
+    """
+
+    def list(self, request, *args, **kwargs):
+        _, expand = self.get_sparse_fields()
+        queryset = self.filter_queryset(self.get_queryset())
+        window = self.paginator.page_window(queryset, request) if self.paginator is not None else None
+        if window is not None:
+            queryset = queryset.filter(pk__in=window.values('pk'))
+        return self.conditional_response(
+            request,
+            queryset,
+            lambda: super(EventListMixin, self).list(request, *args, **kwargs),
+            include_providers='providers' in expand,
+        )
 
 
-class UserEventsListView(generics.ListAPIView):
+class UserEventsListView(EventListMixin, generics.ListAPIView):
     """
-    API view to list user's events.
+    API view to list user's events, newest first, a cursor page at a time.
     """
+    queryset = Event.objects.order_by('-start_date')
     serializer_class = EventSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = EventCursorPagination
     
     def get_queryset(self):
         # Filter events by the current user
-        return Event.objects.filter(organizer=self.request.user).order_by('-start_date')
+        return super().get_queryset().filter(organizer=self.request.user)
 
 
-class AllEventsListView(generics.ListAPIView):
+class AllEventsListView(EventListMixin, generics.ListAPIView):
     """
-    API view to list all events.
+    API view to list all events, newest first, a cursor page at a time.
     """
     queryset = Event.objects.all().order_by('-start_date')
     serializer_class = EventSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = EventCursorPagination
+
 
+def service_provider_data(event_provider):
+    provider = event_provider.provider
+    return {
+        'id': provider.id,
+        'name': provider.name,
+        'address': provider.address,
+        'rating': provider.rating,
+        'user_rating_count': provider.review_count,
+        'description': provider.description,
+        'tags': provider.tags,
+        'phone_number': provider.phone or NO_PHONE,
+        'website': provider.website or 'No website available',
+        'status': event_provider.status,
+        'coordinates': provider.coordinates,
+        'distance': None  # Distance not available in stored data
+    }
 
-class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
+
+class EventDetailView(ConditionalGetMixin, EagerLoadingMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, and delete a specific event.
+
+    A GET costs a fixed number of queries however many providers the event
+    has: the event with its category and organizer, then its EventProviders
+    with their providers. Providers are always expanded here, since
+    `service_providers` is built from them; `?lean=true` leaves out the
+    nested `providers` list, which repeats what `service_providers` carries.
+    GETs carry an ETag and Last-Modified (events/conditional.py).
     """
+    queryset = Event.objects.all()
     serializer_class = EventSerializer
     permission_classes = [IsAuthenticated]
     lookup_url_kwarg = 'event_id'
+    default_expand = ('providers',)
     
     def get_queryset(self):
+        queryset = super().get_queryset()
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
             # For modification operations, only allow access to user's own events
-            return Event.objects.filter(organizer=self.request.user)
+            return queryset.filter(organizer=self.request.user)
         # For read operations, allow access to all events
-        return Event.objects.all()
+        return queryset
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if 'expand' in context and self.request.query_params.get('lean', '').lower() in ('1', 'true', 'yes'):
+            context['expand'] = context['expand'] - {'providers'}
+        return context
     
     def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request,
+            self.get_queryset().filter(pk=kwargs[self.lookup_url_kwarg]),
+            lambda: self.render_event(request),
+            include_providers=True,
+            require_rows=True,
+        )
+    
+    def render_event(self, request):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
-        
-        # Get service providers for this event
-        event_providers = EventProvider.objects.filter(event=instance)
-        providers_data = []
-        
-        for event_provider in event_providers:
-            provider = event_provider.provider
-            print(f"Backend provider: {provider.name}")
-            print(f"  phone: {provider.phone}")
-            print(f"  website: {provider.website}")
-            
-            provider_data = {
-                'id': provider.id,
-                'name': provider.name,
-                'address': provider.address,
-                'rating': provider.rating,
-                'user_rating_count': provider.review_count,
-                'description': provider.description,
-                'tags': provider.tags,
-                'phone_number': provider.phone or 'No phone number available',
-                'website': provider.website or 'No website available',
-                'status': event_provider.status,
-                'coordinates': provider.coordinates,
-                'distance': None  # Distance not available in stored data
-            }
-            print(f"  formatted phone_number: {provider_data['phone_number']}")
-            print(f"  formatted website: {provider_data['website']}")
-            providers_data.append(provider_data)
-            
-        # Add providers to the response
         response_data = serializer.data
-        response_data['service_providers'] = providers_data
+        
+        # Service providers in the shape the provider search endpoints return
+        response_data['service_providers'] = [
+            service_provider_data(event_provider) for event_provider in instance.providers.all()
+        ]
         
         return Response(response_data)
     
@@ -113,16 +202,17 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
             return Response({'error': f'Failed to delete event: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class EventProvidersView(generics.ListCreateAPIView):
+class EventProvidersView(EagerLoadingMixin, generics.ListCreateAPIView):
     """
     API view to list and add providers to an event.
     """
+    queryset = EventProvider.objects.all()
     serializer_class = EventProviderSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         event_id = self.kwargs.get('event_id')
-        return EventProvider.objects.filter(event_id=event_id)
+        return super().get_queryset().filter(event_id=event_id)
     
     def perform_create(self, serializer):
         event_id = self.kwargs.get('event_id')
@@ -153,11 +243,58 @@ class EventProvidersView(generics.ListCreateAPIView):
             return super().create(request, *args, **kwargs)
 
 
+# Provider fields refreshed from the API payload when the place is already stored,
+# keyed by the payload name
+REFRESHED_PROVIDER_FIELDS = {
+    'rating': 'rating',
+    'user_rating_count': 'review_count',
+    'phone_number': 'phone',
+}
+
+
+def upsert_provider(provider_data, api_source=Provider.APISource.RAPIDAPI):
+    """
+    Get or create the Provider for an API place, keyed on (api_source, place_id),
+    refreshing its rating, review count and phone. Returns (provider, created).
+    Places without an id cannot be matched and always get a new row.
+    """
+    phone = provider_data.get('phone_number') or ''
+    fields = {
+        'name': provider_data.get('name', 'Unknown Provider'),
+        'address': provider_data.get('address', ''),
+        'phone': '' if phone == NO_PHONE else phone,
+        'website': provider_data.get('website', ''),
+        'rating': provider_data.get('rating', 0.0),
+        'review_count': provider_data.get('user_rating_count', 0),
+        'coordinates': provider_data.get('coordinates', {}),
+        'description': provider_data.get('description', ''),
+        'tags': provider_data.get('tags', []),
+        'provider_type': provider_data.get('provider_type', ''),
+    }
+    external_id = provider_data.get('place_id', '')
+    if not external_id:
+        return Provider.objects.create(api_source=api_source, external_id='', **fields), True
+
+    # A missing value (or the no-phone placeholder) keeps what is stored
+    refreshed = {
+        field: fields[field]
+        for key, field in REFRESHED_PROVIDER_FIELDS.items()
+        if provider_data.get(key) not in (None, '') and fields[field] != ''
+    }
+    return Provider.objects.update_or_create(
+        api_source=api_source,
+        external_id=external_id,
+        defaults=refreshed,
+        create_defaults=fields
+    )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_provider_from_api(request):
     """
-    Create a provider from API data and link it to an event.
+    Link a provider from API data to an event, reusing the stored provider
+    for the same place.
     """
     event_id = request.data.get('event_id')
     provider_data = request.data.get('provider_data')
@@ -178,32 +315,17 @@ def create_provider_from_api(request):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        # Extract provider data
-        provider = Provider.objects.create(
-            name=provider_data.get('name', 'Unknown Provider'),
-            api_source='RAPIDAPI',
-            external_id=provider_data.get('place_id', ''),
-            address=provider_data.get('address', ''),
-            phone=provider_data.get('phone_number', ''),
-            website=provider_data.get('website', ''),
-            rating=provider_data.get('rating', 0.0),
-            review_count=provider_data.get('user_rating_count', 0),
-            coordinates=provider_data.get('coordinates', {}),
-            description=provider_data.get('description', ''),
-            tags=provider_data.get('tags', []),
-            provider_type=provider_data.get('provider_type', '')
-        )
-        
-        # Link to event
-        event_provider = EventProvider.objects.create(
-            event=event,
-            provider=provider,
-            selected_by=request.user,
-            status='pending'
-        )
+        with transaction.atomic():
+            provider, _ = upsert_provider(provider_data)
+            # Selecting the same provider twice returns the existing link
+            event_provider, linked = EventProvider.objects.get_or_create(
+                event=event,
+                provider=provider,
+                defaults={'selected_by': request.user, 'status': 'pending'}
+            )
         
         serializer = EventProviderSerializer(event_provider)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if linked else status.HTTP_200_OK)
         
     except Event.DoesNotExist:
         return Response(
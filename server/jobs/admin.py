@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'queue', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'queue')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('created_at', 'locked_by', 'locked_at', 'finished_at')
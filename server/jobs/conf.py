@@ -0,0 +1,21 @@
+from datetime import timedelta
+from django.conf import settings
+
+
+DEFAULTS = {
+    'POLL_INTERVAL': 1.0,  # Seconds an idle worker thread waits before polling again
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF': 10,  # Seconds before the first retry; doubles on each attempt
+    'LOCK_TIMEOUT': timedelta(minutes=10),  # Running jobs older than this are reclaimed
+    'KEEP_SUCCEEDED': timedelta(days=1),
+}
+
+
+def job_setting(name):
+    """
+    Read a value from settings.JOBS, falling back to DEFAULTS.
+    """
+    overrides = getattr(settings, 'JOBS', {})
+    if name in overrides:
+        return overrides[name]
+    return DEFAULTS[name]
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.conf import job_setting
+from jobs.queue import claim_jobs, discover_tasks, purge_finished, run_job
+
+PURGE_INTERVAL = 300  # Seconds between purges of old succeeded jobs
+
+
+def _work(stop, queues, poll_interval, burst):
+    """
+    One worker thread: claim a job, run it, repeat; sleep when nothing is due.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            jobs = claim_jobs(worker_id, queues)
+            if not jobs:
+                if burst:
+                    return
+                stop.wait(poll_interval)
+                continue
+            for job in jobs:
+                run_job(job)
+    finally:
+        connections.close_all()
+
+
+def _run_threads(threads, queues, poll_interval, burst):
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+
+    workers = [
+        threading.Thread(target=_work, args=(stop, queues, poll_interval, burst), name=f'worker-{i}')
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+
+    last_purge = 0
+    while any(worker.is_alive() for worker in workers):
+        if time.monotonic() - last_purge > PURGE_INTERVAL:
+            purge_finished()
+            close_old_connections()
+            last_purge = time.monotonic()
+        for worker in workers:
+            worker.join(timeout=poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Run background job workers (jobs.queue) against the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Worker processes")
+        parser.add_argument('--threads', type=int, default=4, help="Worker threads per process")
+        parser.add_argument('--queue', action='append', dest='queues',
+                            help="Queue to consume; may be repeated (default: 'default')")
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help="Seconds to sleep when no job is due (JOBS['POLL_INTERVAL'])")
+        parser.add_argument('--burst', action='store_true',
+                            help="Exit once no job is due instead of polling")
+
+    def handle(self, *args, **options):
+        discover_tasks()
+        queues = tuple(options['queues'] or ['default'])
+        poll_interval = options['poll_interval'] or job_setting('POLL_INTERVAL')
+        run_args = (options['threads'], queues, poll_interval, options['burst'])
+
+        self.stdout.write(
+            f"Starting {options['processes']} process(es) x {options['threads']} thread(s) "
+            f"on queue(s) {', '.join(queues)}"
+        )
+        if options['processes'] <= 1:
+            _run_threads(*run_args)
+            return
+
+        # Children must not share the parent's database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_run_threads, args=run_args, name=f'runworker-{i}')
+            for i in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes])
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            # Children got the SIGINT too; give them time to finish their current jobs
+            for process in processes:
+                process.join()
@@ -0,0 +1,176 @@
+"""
+A small database-backed job queue; PostgreSQL is the only moving part.
+
+Declare work with @task and queue it from a view:
+
+    @task(max_attempts=5)
+    def send_digest(user_id):
+        ...
+
+    send_digest.delay(user.id)                          # as soon as possible
+    send_digest.enqueue(args=[user.id], delay=3600)     # in an hour
+
+Workers (`manage.py runworker`) claim due jobs with SELECT ... FOR UPDATE
+SKIP LOCKED, so any number of them can poll the same table without handing
+a job out twice. Failed jobs are retried with exponential backoff until
+max_attempts; jobs whose worker died are reclaimed after LOCK_TIMEOUT.
+Arguments must be JSON-serializable.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .conf import job_setting
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class Task:
+    def __init__(self, fn, name=None, queue='default', max_attempts=None):
+        self.fn = fn
+        self.name = name or f"{fn.__module__}.{fn.__name__}"
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.__doc__ = fn.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.fn(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.enqueue(args=args, kwargs=kwargs)
+
+    def enqueue(self, args=(), kwargs=None, run_at=None, delay=None, unique=False):
+        return enqueue(
+            self.name, args=args, kwargs=kwargs, queue=self.queue, run_at=run_at, delay=delay,
+            max_attempts=self.max_attempts, unique=unique,
+        )
+
+
+def task(fn=None, **options):
+    """
+    Register a function as a job; usable as @task or @task(queue=..., max_attempts=...).
+    """
+    def register(fn):
+        registered = Task(fn, **options)
+        registry[registered.name] = registered
+        return registered
+    return register(fn) if fn is not None else register
+
+
+def enqueue(name, args=(), kwargs=None, queue='default', run_at=None, delay=None,
+            max_attempts=None, unique=False):
+    """
+    Queue a job for task `name`. `run_at` (datetime) or `delay` (seconds or
+    timedelta) schedules it for later. With unique=True, an identical job
+    that is still queued or running is returned instead of adding another.
+    """
+    if run_at is None:
+        run_at = timezone.now()
+        if delay is not None:
+            run_at += delay if isinstance(delay, timedelta) else timedelta(seconds=delay)
+    fields = {'name': name, 'args': list(args), 'kwargs': kwargs or {}, 'queue': queue}
+    if unique:
+        existing = Job.objects.filter(
+            status__in=[Job.Status.QUEUED, Job.Status.RUNNING], **fields
+        ).first()
+        if existing is not None:
+            return existing
+    return Job.objects.create(
+        run_at=run_at,
+        max_attempts=max_attempts or job_setting('MAX_ATTEMPTS'),
+        **fields
+    )
+
+
+def discover_tasks():
+    # Import every installed app's tasks module so its @task functions register
+    autodiscover_modules('tasks')
+
+
+def claim_jobs(worker_id, queues=('default',), limit=1):
+    """
+    Lock and mark as running up to `limit` due jobs. Also picks up running
+    jobs whose lock is older than LOCK_TIMEOUT (their worker died).
+    """
+    now = timezone.now()
+    stale = now - job_setting('LOCK_TIMEOUT')
+    with transaction.atomic():
+        jobs = list(
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(queue__in=queues)
+            .filter(
+                Q(status=Job.Status.QUEUED, run_at__lte=now) |
+                Q(status=Job.Status.RUNNING, locked_at__lt=stale)
+            )
+            .order_by('run_at', 'id')[:limit]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.Status.RUNNING,
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+            )
+    for job in jobs:
+        job.status = Job.Status.RUNNING
+        job.locked_by = worker_id
+        job.locked_at = now
+        job.attempts += 1
+    return jobs
+
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome. Returns True on success.
+    """
+    if job.attempts > job.max_attempts:
+        # Reclaimed after its worker died on the last attempt
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.FAILED, last_error='Worker lost while running the job',
+            finished_at=timezone.now(),
+        )
+        return False
+    try:
+        registered = registry.get(job.name)
+        if registered is None:
+            raise LookupError(f"No task registered as {job.name!r}")
+        registered.fn(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            backoff = job_setting('RETRY_BACKOFF') * (2 ** (job.attempts - 1))
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.Status.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=backoff),
+                last_error=error,
+                locked_by='',
+                locked_at=None,
+            )
+            logger.warning("Job %s (%s) failed, attempt %d of %d; retrying in %ss",
+                           job.pk, job.name, job.attempts, job.max_attempts, backoff)
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.Status.FAILED, last_error=error, finished_at=timezone.now(),
+            )
+            logger.error("Job %s (%s) failed permanently:\n%s", job.pk, job.name, error)
+        return False
+
+    Job.objects.filter(pk=job.pk).update(status=Job.Status.SUCCEEDED, finished_at=timezone.now())
+    return True
+
+
+def purge_finished():
+    """
+    Delete succeeded jobs older than KEEP_SUCCEEDED. Failed jobs are kept for inspection.
+    """
+    cutoff = timezone.now() - job_setting('KEEP_SUCCEEDED')
+    return Job.objects.filter(status=Job.Status.SUCCEEDED, finished_at__lt=cutoff).delete()[0]
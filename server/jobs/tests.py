@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_jobs, enqueue, purge_finished, registry, run_job, task
+
+calls = []
+
+
+@task(name='jobs.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='jobs.tests.explode')
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(JOBS={'RETRY_BACKOFF': 10, 'LOCK_TIMEOUT': timedelta(minutes=10)})
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_registry(self):
+        self.assertIs(registry['jobs.tests.record'], record)
+        job = record.delay('hello')
+        self.assertEqual((job.name, job.args, job.status), ('jobs.tests.record', ['hello'], Job.Status.QUEUED))
+
+    def test_claimed_jobs_are_not_handed_out_twice(self):
+        first, second = record.delay(1), record.delay(2)
+        claimed_a = claim_jobs('worker-a')
+        claimed_b = claim_jobs('worker-b')
+        self.assertEqual([job.pk for job in claimed_a], [first.pk])
+        self.assertEqual([job.pk for job in claimed_b], [second.pk])
+        self.assertEqual(claim_jobs('worker-c', limit=10), [])
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.locked_by, first.attempts), (Job.Status.RUNNING, 'worker-a', 1))
+
+    def test_future_and_other_queue_jobs_are_not_claimed(self):
+        record.enqueue(args=[1], delay=60)
+        enqueue('jobs.tests.record', args=[2], queue='emails')
+        self.assertEqual(claim_jobs('worker'), [])
+        self.assertEqual(len(claim_jobs('worker', queues=('emails',))), 1)
+
+    def test_success(self):
+        record.delay('done')
+        job, = claim_jobs('worker')
+        self.assertTrue(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(calls, ['done'])
+
+    def test_failure_is_retried_with_backoff(self):
+        explode.enqueue()
+        job, = claim_jobs('worker')
+        before = timezone.now()
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.Status.QUEUED, 1, ''))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+
+        # Second attempt backs off twice as long
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        job, = claim_jobs('worker')
+        before = timezone.now()
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=20))
+        self.assertLess(job.run_at, before + timedelta(seconds=30))
+
+    def test_fails_after_max_attempts(self):
+        job = explode.enqueue()
+        with self.assertLogs('jobs.queue', 'WARNING') as logs:
+            for _ in range(job.max_attempts):
+                Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+                claimed, = claim_jobs('worker')
+                run_job(claimed)
+        self.assertIn('failed permanently', logs.output[-1])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, job.max_attempts))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(claim_jobs('worker'), [])
+
+    def test_unknown_task_fails(self):
+        enqueue('jobs.tests.missing', max_attempts=1)
+        job, = claim_jobs('worker')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertIn('LookupError', job.last_error)
+
+    def test_stale_lock_is_reclaimed(self):
+        job = record.delay('again')
+        claim_jobs('dead-worker')
+        self.assertEqual(claim_jobs('worker'), [])
+
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=11))
+        reclaimed, = claim_jobs('worker')
+        self.assertEqual((reclaimed.pk, reclaimed.locked_by, reclaimed.attempts), (job.pk, 'worker', 2))
+        self.assertTrue(run_job(reclaimed))
+
+    def test_lost_worker_on_last_attempt_fails_job(self):
+        job = record.enqueue(args=['late'])
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.RUNNING, attempts=job.max_attempts,
+            locked_by='dead-worker', locked_at=timezone.now() - timedelta(minutes=11),
+        )
+        reclaimed, = claim_jobs('worker')
+        self.assertFalse(run_job(reclaimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.last_error, 'Worker lost while running the job')
+        self.assertEqual(calls, [])
+
+    def test_unique_returns_pending_job(self):
+        first = record.enqueue(args=[1], unique=True)
+        self.assertEqual(record.enqueue(args=[1], unique=True).pk, first.pk)
+        self.assertNotEqual(record.enqueue(args=[2], unique=True).pk, first.pk)
+
+    def test_purge_finished_keeps_recent_and_failed(self):
+        old = timezone.now() - timedelta(days=2)
+        Job.objects.create(name='a', status=Job.Status.SUCCEEDED, finished_at=old)
+        Job.objects.create(name='b', status=Job.Status.FAILED, finished_at=old)
+        Job.objects.create(name='c', status=Job.Status.SUCCEEDED, finished_at=timezone.now())
+        self.assertEqual(purge_finished(), 1)
+        self.assertEqual(sorted(Job.objects.values_list('name', flat=True)), ['b', 'c'])
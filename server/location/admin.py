@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import GeocodeCacheEntry
 
-# Register your models here.
+@admin.register(GeocodeCacheEntry)
+class GeocodeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('address', 'formatted_address', 'is_fallback', 'hit_count', 'expires_at')
+    list_filter = ('is_fallback',)
+    search_fields = ('address', 'formatted_address')
+    readonly_fields = ('created_at', 'updated_at', 'last_hit_at')
@@ -0,0 +1,255 @@
+"""
+Non-blocking counterpart of location/upstream.py for the async views.
+"""
+import asyncio
+import json
+import logging
+import atexit
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from asgiref.sync import sync_to_async
+
+from . import cassette, resilience
+from .cache import address_key, get_cached_geocode, store_geocode
+from .coalesce import coalesce_async
+from .conf import location_setting
+from .providers import ERROR_GEOCODE, geocode_request, parse_geocode_response
+from .upstream import RETRY_STATUSES, retry_delay, spends_rapidapi_quota
+
+logger = logging.getLogger(__name__)
+
+# Raised for transport failures, a fast-failed call (open breaker, rate limit) or
+# a request missing from the replay cassette; the async counterpart of requests.RequestException
+UpstreamError = (aiohttp.ClientError, asyncio.TimeoutError, resilience.UpstreamUnavailable,
+                 cassette.CassetteMiss)
+
+# One event loop thread per process owns the aiohttp session, so connections
+# are kept alive across requests whatever loop the caller runs on (under WSGI,
+# async_to_sync gives every request a fresh loop)
+_loop = None
+_loop_pid = None
+_session = None
+_loop_lock = threading.Lock()
+
+
+class UpstreamResponse:
+    """
+    Fully-read upstream response with the parts of the requests.Response
+    interface the views use (status_code, headers, text, json()).
+    """
+
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = body
+        self.upstream_duration = None
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def _get_loop():
+    global _loop, _loop_pid, _session
+    with _loop_lock:
+        # A forked worker inherits the object but not the thread running it
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _session = None
+            threading.Thread(target=_loop.run_forever, name='upstream-aio', daemon=True).start()
+        return _loop
+
+
+def get_session():
+    """
+    The shared session; only to be used on the upstream loop.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=location_setting('UPSTREAM_POOL_SIZE') * 10,
+                limit_per_host=location_setting('UPSTREAM_POOL_SIZE'),
+            ),
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=location_setting('UPSTREAM_CONNECT_TIMEOUT'),
+                sock_read=location_setting('UPSTREAM_READ_TIMEOUT'),
+            ),
+            headers={'Accept-Encoding': 'gzip, deflate'},
+        )
+    return _session
+
+
+async def _close():
+    global _session
+    session, _session = _session, None
+    if session is not None:
+        await session.close()
+
+
+def close_session():
+    """
+    Close the shared session; the next call opens a new one with the
+    current pool settings. Safe to call from any thread, not from the upstream loop.
+    """
+    if _loop is not None and _loop_pid == os.getpid() and _loop.is_running():
+        asyncio.run_coroutine_threadsafe(_close(), _loop).result()
+
+
+atexit.register(close_session)
+
+
+async def _fetch(method, url, **kwargs):
+    async with get_session().request(method, url, **kwargs) as response:
+        body = await response.read()
+        return UpstreamResponse(response.status, response.headers, body)
+
+
+async def _send(method, url, **kwargs):
+    """
+    Run the call on the upstream loop and wait for it on the caller's;
+    cancelling the caller cancels the call.
+    """
+    future = asyncio.run_coroutine_threadsafe(_fetch(method, url, **kwargs), _get_loop())
+    return await asyncio.wrap_future(future)
+
+
+async def _send_with_retries(method, url, rate_limited, **kwargs):
+    """
+    Send, retrying transport errors, 429 and 5xx up to UPSTREAM_MAX_RETRIES
+    times, each retry through the rate limiter as in upstream.request.
+    Returns the last response or raises the last transport error.
+    """
+    max_retries = location_setting('UPSTREAM_MAX_RETRIES')
+    attempt = 0
+    while True:
+        response = error = None
+        try:
+            response = await _send(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = e
+        if attempt >= max_retries:
+            break
+        await asyncio.sleep(retry_delay(response, attempt))
+        attempt += 1
+        if not await resilience.acquire_retry_async(rate_limited):
+            break
+    if error is not None:
+        raise error
+    return response
+
+
+async def request(method, url, **kwargs):
+    """
+    Async equivalent of upstream.request: same timeouts, breaker and rate
+    limit, retries on transport errors, 429 and 5xx, and `response.upstream_duration`.
+    """
+    cassette_mode = cassette.mode()
+    if cassette_mode:
+        description = cassette.describe(method, url, kwargs.get('params'), kwargs.get('json'), kwargs.get('headers'))
+        if cassette_mode == 'replay':
+            return await _replay(description)
+    host = urlsplit(url).netloc
+    rate_limited = spends_rapidapi_quota(kwargs.get('headers'))
+    await resilience.before_call_async(host, rate_limited)
+    started = time.perf_counter()
+    try:
+        response = await _send_with_retries(method, url, rate_limited, **kwargs)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        resilience.after_call(host, error=e)
+        logger.warning("Upstream %s %s failed after %.1fms", method, url,
+                       (time.perf_counter() - started) * 1000)
+        raise
+    except BaseException:
+        # Cancelled (client gone, coalesced leader cancelled) before an outcome;
+        # don't leave a half-open trial slot taken
+        resilience.get_breaker(host).release_trial()
+        raise
+    resilience.after_call(host, status_code=response.status_code)
+    response.upstream_duration = time.perf_counter() - started
+    logger.debug("Upstream %s %s -> %s in %.1fms", method, url,
+                 response.status_code, response.upstream_duration * 1000)
+    if cassette_mode == 'record' and response.status_code not in RETRY_STATUSES:
+        await sync_to_async(cassette.save)(description, response.status_code, response.headers, response.content)
+    return response
+
+
+async def _replay(description):
+    recording = await sync_to_async(cassette.load)(description)
+    latency = cassette.replay_latency()
+    if latency:
+        await asyncio.sleep(latency)
+    response = UpstreamResponse(
+        recording['status_code'], recording['headers'], recording['body'].encode('utf-8')
+    )
+    response.upstream_duration = latency
+    return response
+
+
+async def get(url, **kwargs):
+    return await request('GET', url, **kwargs)
+
+
+async def post(url, **kwargs):
+    return await request('POST', url, **kwargs)
+
+
+async def fan_out(*aws, limit=None):
+    """
+    Run independent upstream calls concurrently, at most `limit` at a time.
+    Exceptions are returned in place of results rather than raised.
+    """
+    if limit is None:
+        return await asyncio.gather(*aws, return_exceptions=True)
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(bounded(aw) for aw in aws), return_exceptions=True)
+
+
+async def fetch_geocode(address):
+    """
+    Call the upstream geocoder. Returns (result, is_fallback); raises
+    UpstreamUnavailable when the breaker or rate limit fails the call fast.
+    """
+    url, headers, params = geocode_request(address)
+    try:
+        response = await get(url, headers=headers, params=params)
+        return parse_geocode_response(response.json())
+    except resilience.UpstreamUnavailable:
+        # Not cached as a fallback, as in views._fetch_geocode
+        raise
+    except Exception as e:
+        logger.warning("Geocoding exception: %s, Address: %s", e, address)
+        return dict(ERROR_GEOCODE), True
+
+
+async def geocode_address(address):
+    """
+    Async version of views.geocode_address, sharing the same cache.
+    """
+    cached = await sync_to_async(get_cached_geocode)(address)
+    if cached is not None:
+        return cached
+
+    return await coalesce_async(('geocode', address_key(address)), _geocode_and_store, address)
+
+
+async def _geocode_and_store(address):
+    result, is_fallback = await fetch_geocode(address)
+    await sync_to_async(store_geocode)(address, result, fallback=is_fallback)
+    return result
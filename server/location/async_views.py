@@ -0,0 +1,453 @@
+"""
+Async (ASGI) versions of the provider search views, and the batch endpoint.
+
+DRF's function views are synchronous, so these are plain Django async views
+that reuse DRF's configured authenticators for access control. Upstream calls
+go through location/aio.py and never block the worker while in flight.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import aio
+from .cache import aget_cached_nearby, astore_nearby, nearby_cache_key
+from .coalesce import coalesce_async
+from .conf import location_setting
+from .instrumentation import stage, timed_view
+from .local_index import has_local_coverage, search_local_providers
+from .providers import (
+    merge_shard_results, nearby_search_request, places_to_providers, shard_types,
+    atypes_for_category, text_search_request, upstream_error_detail, SEARCH_RADIUS_METERS
+)
+from .ranking import rank_providers
+from .resilience import UpstreamUnavailable
+
+
+def _authenticate(request):
+    """
+    Authenticate with the same classes DRF views use; returns the user or None.
+    """
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=authenticators)
+    try:
+        user = drf_request.user
+    except exceptions.APIException:
+        return None
+    return user if user and user.is_authenticated else None
+
+
+def async_api_view(view):
+    """
+    Wrap an async view with authentication and JSON body parsing.
+    The view is called as view(request, data).
+    """
+    @csrf_exempt  # SessionAuthentication enforces CSRF itself, as in DRF views
+    @require_POST
+    async def wrapper(request):
+        user = await sync_to_async(_authenticate)(request)
+        if user is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        request.user = user
+        try:
+            with stage('parse'):
+                data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+        return await view(request, data)
+
+    wrapper.__name__ = view.__name__
+    wrapper.__doc__ = view.__doc__
+    return wrapper
+
+
+async def _resolve_location(event_location):
+    """
+    Geocode the event location. Returns (geocode_result, error_response).
+    """
+    try:
+        with stage('geocode'):
+            geocode_result = await aio.geocode_address(event_location.get('description', ''))
+        if not geocode_result['lat'] or not geocode_result['lng']:
+            return None, JsonResponse(
+                {'error': 'Failed to get valid coordinates from location data'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return geocode_result, None
+    except UpstreamUnavailable as e:
+        return None, JsonResponse(
+            {'error': f'RapidAPI service unavailable: {str(e)}'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    except Exception as e:
+        return None, JsonResponse(
+            {'error': f'Failed to process location data: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+async def _search_nearby(included_types, latitude, longitude):
+    nearby_url, nearby_headers, nearby_data = nearby_search_request(included_types, latitude, longitude)
+    nearby_response = await aio.post(nearby_url, headers=nearby_headers, json=nearby_data)
+    return nearby_response.json()
+
+
+async def _fetch_nearby(included_types, latitude, longitude):
+    shards = shard_types(included_types, location_setting('NEARBY_SHARD_SIZE'))
+    if len(shards) == 1:
+        nearby_results = await _search_nearby(included_types, latitude, longitude)
+    else:
+        outcomes = await aio.fan_out(
+            *(_search_nearby(shard, latitude, longitude) for shard in shards),
+            limit=location_setting('NEARBY_SHARD_CONCURRENCY')
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, Exception) and not isinstance(outcome, aio.UpstreamError + (json.JSONDecodeError,)):
+                raise outcome
+        nearby_results = merge_shard_results(outcomes)
+    await astore_nearby(included_types, latitude, longitude, SEARCH_RADIUS_METERS, nearby_results)
+    return nearby_results
+
+
+async def _nearby_providers(included_types, latitude, longitude):
+    """
+    Local catalogue first, then the nearby cache, then upstream.
+    Returns (providers, degraded, error_response).
+    """
+    with stage('local_index'):
+        providers = await sync_to_async(search_local_providers)(
+            latitude, longitude, SEARCH_RADIUS_METERS, place_types=included_types
+        )
+    if has_local_coverage(providers):
+        return providers, False, None
+
+    nearby_results = await aget_cached_nearby(included_types, latitude, longitude, SEARCH_RADIUS_METERS)
+    if nearby_results is None:
+        try:
+            with stage('upstream'):
+                nearby_results = await coalesce_async(
+                    ('nearby',) + nearby_cache_key(included_types, latitude, longitude, SEARCH_RADIUS_METERS),
+                    _fetch_nearby, included_types, latitude, longitude
+                )
+        except aio.UpstreamError as e:
+            if providers:
+                # Upstream unavailable or breaker open: serve the partial local results
+                return providers, True, None
+            return None, False, JsonResponse(
+                {'error': f'RapidAPI service unavailable: {str(e)}'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except json.JSONDecodeError:
+            return None, False, JsonResponse(
+                {'error': 'Invalid response from RapidAPI service'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+    if not nearby_results.get('places'):
+        return None, False, JsonResponse(
+            {'error': 'No suitable service providers found near the specified location'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return places_to_providers(nearby_results['places']), False, None
+
+
+async def _text_search_providers(search_query, latitude, longitude):
+    """
+    Local catalogue first, then upstream text search.
+    Returns (providers, degraded, error_response).
+    """
+    with stage('local_index'):
+        providers = await sync_to_async(search_local_providers)(
+            latitude, longitude, SEARCH_RADIUS_METERS, query=search_query
+        )
+    if has_local_coverage(providers):
+        return providers, False, None
+
+    search_url, search_headers, search_data = text_search_request(search_query, latitude, longitude)
+    try:
+        with stage('upstream'):
+            search_response = await aio.post(search_url, headers=search_headers, json=search_data)
+        if search_response.status_code != 200:
+            return None, False, JsonResponse(
+                {'error': upstream_error_detail(search_response.status_code, search_response.json, search_response.text)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        search_results = search_response.json()
+    except aio.UpstreamError as e:
+        if providers:
+            # Upstream unavailable or breaker open: serve the partial local results
+            return providers, True, None
+        return None, False, JsonResponse(
+            {'error': f'RapidAPI service unavailable: {str(e)}'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    except json.JSONDecodeError:
+        return None, False, JsonResponse(
+            {'error': 'Invalid response from RapidAPI service'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    if not search_results.get('places'):
+        return None, False, JsonResponse({
+            'message': 'No providers found for your search query',
+            'service_providers': []
+        })
+    return places_to_providers(search_results['places']), False, None
+
+
+@timed_view
+@async_api_view
+async def get_location_providers(request, data):
+    """
+    Async version of views.get_location_providers. Same request and response format.
+    """
+    try:
+        event_name = data.get('event_name', '')
+        event_category = data.get('event_category', '')
+        event_location = data.get('event_location', '')
+
+        if not event_location:
+            return JsonResponse(
+                {'error': 'Event location is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        included_types = await atypes_for_category(event_category)
+        geocode_result, error = await _resolve_location(event_location)
+        if error:
+            return error
+        latitude, longitude = geocode_result['lat'], geocode_result['lng']
+
+        providers, degraded, error = await _nearby_providers(included_types, latitude, longitude)
+        if error:
+            return error
+        with stage('rank'):
+            top_providers = rank_providers(providers, latitude, longitude, category=event_category)
+
+        response_data = {
+            'event_name': event_name,
+            'event_category': event_category,
+            'event_location': {
+                'address': geocode_result['formatted_address'],
+                'coordinates': {'lat': latitude, 'lng': longitude}
+            },
+            'service_providers': top_providers
+        }
+        if degraded:
+            response_data['degraded'] = True
+        with stage('serialize'):
+            return JsonResponse(response_data)
+
+    except Exception as e:
+        return JsonResponse(
+            {'error': f'Failed to find service providers: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@timed_view
+@async_api_view
+async def search_specific_providers(request, data):
+    """
+    Async version of views.search_specific_providers. Same request and response format.
+    """
+    try:
+        search_query = data.get('search_query', '')
+        event_location = data.get('event_location', '')
+
+        if not search_query:
+            return JsonResponse(
+                {'error': 'Search query is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not event_location:
+            return JsonResponse(
+                {'error': 'Event location is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        geocode_result, error = await _resolve_location(event_location)
+        if error:
+            return error
+        latitude, longitude = geocode_result['lat'], geocode_result['lng']
+
+        providers, degraded, error = await _text_search_providers(search_query, latitude, longitude)
+        if error:
+            return error
+        with stage('rank'):
+            top_providers = rank_providers(providers, latitude, longitude)
+
+        response_data = {
+            'search_query': search_query,
+            'event_location': {
+                'address': geocode_result['formatted_address'],
+                'coordinates': {'lat': latitude, 'lng': longitude}
+            },
+            'service_providers': top_providers
+        }
+        if degraded:
+            response_data['degraded'] = True
+        with stage('serialize'):
+            return JsonResponse(response_data)
+
+    except Exception as e:
+        return JsonResponse(
+            {'error': f'Failed to search providers: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _error_payload(response):
+    return json.loads(response.content)
+
+
+def _item_error(item):
+    """
+    Why a batch item cannot be searched, or None if it is well-formed.
+    """
+    if not isinstance(item, dict):
+        return 'Each item must be an object'
+    event_location = item.get('event_location')
+    if not isinstance(event_location, dict):
+        return 'Event location is required'
+    description = event_location.get('description')
+    if not isinstance(description, str) or not description.strip():
+        return 'Event location description is required'
+    for field in ('search_query', 'event_category'):
+        if not isinstance(item.get(field, ''), str):
+            return f'{field} must be a string'
+    return None
+
+
+async def _search_key(item, latitude, longitude):
+    # Items with the same key share one local/upstream search
+    if item.get('search_query'):
+        return ('text', item['search_query'].strip().lower(), round(latitude, 4), round(longitude, 4))
+    included_types = await atypes_for_category(item.get('event_category', ''))
+    return ('nearby',) + nearby_cache_key(included_types, latitude, longitude, SEARCH_RADIUS_METERS)
+
+
+async def _run_search(item, latitude, longitude):
+    if item.get('search_query'):
+        return await _text_search_providers(item['search_query'], latitude, longitude)
+    included_types = await atypes_for_category(item.get('event_category', ''))
+    return await _nearby_providers(included_types, latitude, longitude)
+
+
+@timed_view
+@async_api_view
+async def batch_location_providers(request, data):
+    """
+    Provider recommendations for several events/categories in one request.
+
+    Request body: {"items": [...]} where each item has an event_location and
+    either an event_category (like /providers/) or a search_query (like
+    /search-providers/), plus an optional client "id" echoed back. Shared
+    geocodes and searches run once; the rest run concurrently. Results come
+    back in item order, each with its own status and either providers or an error.
+    """
+    try:
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return JsonResponse(
+                {'error': 'items must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_items = location_setting('BATCH_MAX_ITEMS')
+        if len(items) > max_items:
+            return JsonResponse(
+                {'error': f'At most {max_items} items per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = location_setting('BATCH_CONCURRENCY')
+
+        results = [None] * len(items)
+        addresses = {}
+        for index, item in enumerate(items):
+            error = _item_error(item)
+            if error:
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'error': error}
+                continue
+            addresses.setdefault(item['event_location']['description'].strip(), []).append(index)
+
+        # One geocode per distinct address
+        resolved = await aio.fan_out(*(_resolve_location({'description': a}) for a in addresses), limit=limit)
+        locations = {}
+        for (address, indexes), outcome in zip(addresses.items(), resolved):
+            if isinstance(outcome, Exception):
+                outcome = (None, JsonResponse({'error': f'Failed to process location data: {outcome}'},
+                                              status=status.HTTP_400_BAD_REQUEST))
+            geocode_result, error = outcome
+            for index in indexes:
+                if error:
+                    results[index] = {'status': error.status_code, **_error_payload(error)}
+                else:
+                    locations[index] = geocode_result
+
+        # One search per distinct (query or type list, location)
+        searches = {}
+        for index, geocode_result in locations.items():
+            key = await _search_key(items[index], geocode_result['lat'], geocode_result['lng'])
+            searches.setdefault(key, []).append(index)
+        outcomes = await aio.fan_out(*(
+            _run_search(items[indexes[0]], locations[indexes[0]]['lat'], locations[indexes[0]]['lng'])
+            for indexes in searches.values()
+        ), limit=limit)
+
+        for indexes, outcome in zip(searches.values(), outcomes):
+            for index in indexes:
+                item, geocode_result = items[index], locations[index]
+                if isinstance(outcome, Exception):
+                    results[index] = {
+                        'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        'error': f'Failed to find service providers: {str(outcome)}'
+                    }
+                    continue
+                providers, degraded, error = outcome
+                if error:
+                    results[index] = {'status': error.status_code, **_error_payload(error)}
+                    continue
+                latitude, longitude = geocode_result['lat'], geocode_result['lng']
+                with stage('rank'):
+                    # Items sharing a search rank their own copies of the providers
+                    top_providers = rank_providers(
+                        [dict(provider) for provider in providers], latitude, longitude,
+                        category=None if item.get('search_query') else item.get('event_category', '')
+                    )
+                result = {
+                    'status': status.HTTP_200_OK,
+                    'event_location': {
+                        'address': geocode_result['formatted_address'],
+                        'coordinates': {'lat': latitude, 'lng': longitude}
+                    },
+                    'service_providers': top_providers
+                }
+                if item.get('search_query'):
+                    result['search_query'] = item['search_query']
+                else:
+                    result['event_name'] = item.get('event_name', '')
+                    result['event_category'] = item.get('event_category', '')
+                if degraded:
+                    result['degraded'] = True
+                results[index] = result
+
+        for item, result in zip(items, results):
+            if isinstance(item, dict) and 'id' in item:
+                result['id'] = item['id']
+
+        with stage('serialize'):
+            return JsonResponse({'results': results})
+
+    except Exception as e:
+        return JsonResponse(
+            {'error': f'Failed to find service providers: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -0,0 +1,377 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+from .conf import location_setting
+from .geo import geohash_encode
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with a per-entry TTL (in seconds).
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires = item
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+# Geocode cache ------------------------------------------------------------
+
+_geocode_lru = LRUCache(maxsize=location_setting('GEOCODE_LRU_SIZE'))
+# Fallback results live in their own tier so they never evict or shadow real results
+_geocode_fallback_lru = LRUCache(maxsize=256)
+
+
+def normalize_address(address):
+    """
+    Reduce an address to a canonical form: lowercase, single spaces, no
+    punctuation noise around commas.
+    """
+    address = (address or '').lower().strip()
+    address = re.sub(r'\s*,\s*', ', ', address)
+    address = re.sub(r'[^\w,\s#-]', '', address)
+    return re.sub(r'\s+', ' ', address)
+
+
+def address_key(address):
+    return hashlib.sha256(normalize_address(address).encode('utf-8')).hexdigest()
+
+
+def get_cached_geocode(address):
+    """
+    Look up a geocode result, first in-process and then in the database.
+    Returns None on a miss.
+    """
+    from .models import GeocodeCacheEntry
+
+    key = address_key(address)
+    result = _geocode_lru.get(key)
+    if result is not None:
+        return result
+    result = _geocode_fallback_lru.get(key)
+    if result is not None:
+        return result
+
+    now = timezone.now()
+    entry = GeocodeCacheEntry.objects.filter(address_key=key, expires_at__gt=now).first()
+    if entry is None:
+        return None
+
+    GeocodeCacheEntry.objects.filter(pk=entry.pk).update(
+        hit_count=F('hit_count') + 1,
+        last_hit_at=now
+    )
+    result = entry.as_result()
+    remaining = (entry.expires_at - now).total_seconds()
+    lru = _geocode_fallback_lru if entry.is_fallback else _geocode_lru
+    lru.set(key, result, ttl=remaining)
+    return result
+
+
+def store_geocode(address, result, fallback=False):
+    """
+    Save a geocode result in both cache tiers. Fallback results get the
+    short GEOCODE_FALLBACK_TTL so a transient upstream error expires quickly.
+    """
+    from .models import GeocodeCacheEntry
+
+    key = address_key(address)
+    ttl = location_setting('GEOCODE_FALLBACK_TTL' if fallback else 'GEOCODE_CACHE_TTL')
+    GeocodeCacheEntry.objects.update_or_create(
+        address_key=key,
+        defaults={
+            'address': normalize_address(address)[:255],
+            'lat': result['lat'],
+            'lng': result['lng'],
+            'formatted_address': result['formatted_address'][:255],
+            'is_fallback': fallback,
+            'expires_at': timezone.now() + ttl,
+        }
+    )
+    if fallback:
+        _geocode_fallback_lru.set(key, result, ttl=ttl.total_seconds())
+    else:
+        _geocode_fallback_lru.delete(key)
+        _geocode_lru.set(key, result, ttl=ttl.total_seconds())
+
+
+def geocode_cache_stats():
+    return {'results': _geocode_lru.stats(), 'fallbacks': _geocode_fallback_lru.stats()}
+
+
+def clear_geocode_cache():
+    """
+    Drop the in-process tiers (the database tier is left untouched).
+    """
+    _geocode_lru.clear()
+    _geocode_fallback_lru.clear()
+
+
+# Nearby-search result cache -----------------------------------------------
+
+_nearby_lru = LRUCache(
+    maxsize=location_setting('NEARBY_CACHE_SIZE'),
+    ttl=location_setting('NEARBY_CACHE_TTL').total_seconds()
+)
+
+
+def nearby_cache_key(included_types, lat, lng, radius):
+    """
+    Searches whose centres share a geohash cell, with the same types and
+    radius, share a cache entry.
+    """
+    cell = geohash_encode(lat, lng, location_setting('NEARBY_GEOHASH_PRECISION'))
+    return (cell, tuple(sorted(included_types)), radius)
+
+
+def _nearby_shared_key(key):
+    return 'location:nearby:' + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def _from_shared(key, entry):
+    # Shared entries carry their expiry, so the local copy does not outlive them
+    if entry is None:
+        return None
+    results, expires_at = entry
+    remaining = expires_at - time.time()
+    if remaining <= 0:
+        return None
+    _nearby_lru.set(key, results, ttl=remaining)
+    return results
+
+
+def get_cached_nearby(included_types, lat, lng, radius):
+    """
+    Return the raw searchNearby payload for this cell, or None. Callers rank
+    the places against their own exact coordinates. With NEARBY_CACHE_ALIAS
+    set, a local miss falls through to that shared cache.
+    """
+    key = nearby_cache_key(included_types, lat, lng, radius)
+    results = _nearby_lru.get(key)
+    alias = location_setting('NEARBY_CACHE_ALIAS')
+    if results is None and alias:
+        results = _from_shared(key, caches[alias].get(_nearby_shared_key(key)))
+    return results
+
+
+async def aget_cached_nearby(included_types, lat, lng, radius):
+    key = nearby_cache_key(included_types, lat, lng, radius)
+    results = _nearby_lru.get(key)
+    alias = location_setting('NEARBY_CACHE_ALIAS')
+    if results is None and alias:
+        results = _from_shared(key, await caches[alias].aget(_nearby_shared_key(key)))
+    return results
+
+
+def _nearby_entry(included_types, lat, lng, radius, results):
+    """
+    (key, ttl, shared entry) to store, or None for answers not worth caching.
+    """
+    # Only cache useful answers; errors and empty results are retried next time
+    if not results.get('places'):
+        return None
+    key = nearby_cache_key(included_types, lat, lng, radius)
+    ttl = location_setting('NEARBY_CACHE_TTL').total_seconds()
+    _nearby_lru.set(key, results, ttl=ttl)
+    return key, ttl, (results, time.time() + ttl)
+
+
+def store_nearby(included_types, lat, lng, radius, results):
+    entry = _nearby_entry(included_types, lat, lng, radius, results)
+    alias = location_setting('NEARBY_CACHE_ALIAS')
+    if entry and alias:
+        key, ttl, shared = entry
+        caches[alias].set(_nearby_shared_key(key), shared, timeout=ttl)
+
+
+async def astore_nearby(included_types, lat, lng, radius, results):
+    entry = _nearby_entry(included_types, lat, lng, radius, results)
+    alias = location_setting('NEARBY_CACHE_ALIAS')
+    if entry and alias:
+        key, ttl, shared = entry
+        await caches[alias].aset(_nearby_shared_key(key), shared, timeout=ttl)
+
+
+def nearby_cache_stats():
+    return _nearby_lru.stats()
+
+
+def clear_nearby_cache():
+    """
+    Drop the in-process tier (a shared NEARBY_CACHE_ALIAS cache is left untouched).
+    """
+    _nearby_lru.clear()
+
+
+# Autocomplete prefix index ------------------------------------------------
+
+class PrefixIndex:
+    """
+    Cache of autocomplete predictions keyed on (location bucket, query prefix).
+
+    An exact hit answers directly. Otherwise the longest cached shorter
+    prefix is filtered down to the predictions matching the full query; that
+    answer is used if the shorter prefix's list was complete (fewer results
+    than the upstream page size) or still yields `min_derived` predictions.
+    Entries are evicted least-recently-used once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_bytes, ttl, page_size=5, min_derived=3):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.page_size = page_size
+        self.min_derived = min_derived
+        self.hits = 0
+        self.derived_hits = 0
+        self.misses = 0
+        self.size_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query):
+        return re.sub(r'\s+', ' ', (query or '').lower()).strip()
+
+    @staticmethod
+    def matches(prediction, query):
+        """
+        True if every word of the query starts some word of the description.
+        """
+        words = re.findall(r'\w+', prediction.get('description', '').lower())
+        return all(
+            any(word.startswith(term) for word in words)
+            for term in re.findall(r'\w+', query)
+        )
+
+    def _get_live(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] <= now:
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return item
+
+    def _remove(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.size_bytes -= item[2]
+
+    def get(self, bucket, query):
+        query = self.normalize(query)
+        now = time.monotonic()
+        with self._lock:
+            item = self._get_live((bucket, query), now)
+            if item is not None:
+                self.hits += 1
+                return item[0]
+            for end in range(len(query) - 1, 0, -1):
+                item = self._get_live((bucket, query[:end]), now)
+                if item is None:
+                    continue
+                predictions = [p for p in item[0] if self.matches(p, query)]
+                complete = len(item[0]) < self.page_size
+                if predictions and (complete or len(predictions) >= self.min_derived):
+                    self.derived_hits += 1
+                    return predictions
+                break
+            self.misses += 1
+            return None
+
+    def set(self, bucket, query, predictions):
+        key = (bucket, self.normalize(query))
+        size = len(json.dumps(predictions)) + len(key[1])
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (predictions, time.monotonic() + self.ttl, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes and self._data:
+                self._remove(next(iter(self._data)))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size_bytes = 0
+            self.hits = self.derived_hits = self.misses = 0
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'bytes': self.size_bytes,
+            'hits': self.hits,
+            'derived_hits': self.derived_hits,
+            'misses': self.misses,
+        }
+
+
+autocomplete_index = PrefixIndex(
+    max_bytes=location_setting('AUTOCOMPLETE_CACHE_MAX_BYTES'),
+    ttl=location_setting('AUTOCOMPLETE_CACHE_TTL').total_seconds(),
+    min_derived=location_setting('AUTOCOMPLETE_MIN_DERIVED_RESULTS'),
+)
+
+
+def autocomplete_bucket(lat, lng):
+    """
+    Round the caller's position so nearby callers share cached predictions.
+    """
+    if not lat or not lng:
+        return None
+    decimals = location_setting('AUTOCOMPLETE_BUCKET_DECIMALS')
+    try:
+        return (round(float(lat), decimals), round(float(lng), decimals))
+    except ValueError:
+        return None
@@ -0,0 +1,133 @@
+"""
+Record/replay of upstream traffic, for benchmarks and CI without network or quota.
+
+Set LOCATION_SERVICE['UPSTREAM_CASSETTE_MODE']:
+
+    'record'  calls go upstream as usual and each response is saved under
+              UPSTREAM_CASSETTE_DIR, one JSON file per request fingerprint;
+    'replay'  calls never leave the process: the saved response is served
+              after UPSTREAM_REPLAY_LATENCY seconds (a number, or a
+              (min, max) pair for a uniform random delay). A request with no
+              recording raises CassetteMiss, which the views treat like any
+              other transport failure.
+
+The fingerprint covers the method, the logical host (the X-RapidAPI-Host
+header when present, so recordings made against UPSTREAM_BASE_URL replay
+against the real hosts and vice versa), path, query parameters, JSON body
+and field mask; the API key is never part of it or of the recording.
+upstream.request and aio.request go through here, so both view flavours
+share one cassette.
+"""
+import hashlib
+import json
+import os
+import random
+import tempfile
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .conf import location_setting
+
+# Request headers that change the upstream response
+FINGERPRINT_HEADERS = ('x-rapidapi-host', 'x-goog-fieldmask')
+
+# Response headers worth keeping in a recording
+RECORDED_HEADERS = ('content-type', 'retry-after')
+
+
+class CassetteMiss(requests.ConnectionError):
+    """
+    Replay mode found no recording for a request.
+    """
+
+
+def mode():
+    return location_setting('UPSTREAM_CASSETTE_MODE')
+
+
+def _header(headers, name):
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def describe(method, url, params=None, json_body=None, headers=None):
+    """
+    The parts of a request that identify its response, as a JSON-able dict.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query += [(str(key), str(value)) for key, value in (params or {}).items()]
+    return {
+        'method': method.upper(),
+        'host': _header(headers, 'x-rapidapi-host') or parts.netloc,
+        'path': parts.path,
+        'query': sorted(query),
+        'json': json_body,
+        'field_mask': _header(headers, 'x-goog-fieldmask'),
+    }
+
+
+def fingerprint(description):
+    canonical = json.dumps(description, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _path(key):
+    return os.path.join(location_setting('UPSTREAM_CASSETTE_DIR'), f'{key}.json')
+
+
+def save(description, status_code, headers, body):
+    """
+    Write one recording; the file is replaced atomically so concurrent
+    recorders and replayers never see a partial file.
+    """
+    directory = location_setting('UPSTREAM_CASSETTE_DIR')
+    os.makedirs(directory, exist_ok=True)
+    recording = {
+        'request': description,
+        'status_code': status_code,
+        'headers': {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+        'body': body.decode('utf-8', errors='replace'),
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(recording, f, indent=1)
+    os.replace(tmp_path, _path(fingerprint(description)))
+
+
+def load(description):
+    """
+    Return the recording for a request, or raise CassetteMiss.
+    """
+    key = fingerprint(description)
+    try:
+        with open(_path(key), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise CassetteMiss(
+            f"No recording for {description['method']} {description['host']}{description['path']} ({key[:12]})"
+        ) from None
+
+
+def replay_latency():
+    latency = location_setting('UPSTREAM_REPLAY_LATENCY') or 0
+    if isinstance(latency, (tuple, list)):
+        return random.uniform(*latency)
+    return latency
+
+
+def to_response(recording, url):
+    """
+    Build a requests.Response from a recording, for upstream.request.
+    """
+    response = requests.Response()
+    response.status_code = recording['status_code']
+    response.headers = CaseInsensitiveDict(recording['headers'])
+    response._content = recording['body'].encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = url
+    return response
@@ -0,0 +1,84 @@
+"""
+Event category -> Places API type mapping, stored on events.Category.place_types.
+
+The whole mapping is read into an immutable snapshot on first use, together
+with a reverse index from place type to categories. The snapshot is dropped
+when a Category is saved or deleted (location/signals.py), and reloaded after
+CATEGORY_TYPES_TTL so other workers pick up admin edits as well.
+"""
+import threading
+import time
+from types import MappingProxyType
+
+from asgiref.sync import sync_to_async
+
+from events.models import Category
+
+from .conf import location_setting
+
+# Used for categories with no place types of their own
+DEFAULT_PLACE_TYPES = ('store', 'event_venue', 'restaurant', 'catering_service')
+
+
+class CategoryTypes:
+    __slots__ = ('by_category', 'by_type', 'loaded_at')
+
+    def __init__(self, by_category, by_type, loaded_at):
+        self.by_category = by_category
+        self.by_type = by_type
+        self.loaded_at = loaded_at
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _load():
+    by_category = {}
+    by_type = {}
+    for name, place_types in Category.objects.values_list('name', 'place_types'):
+        if not place_types:
+            continue
+        by_category[name] = tuple(place_types)
+        for place_type in place_types:
+            by_type.setdefault(place_type, set()).add(name)
+    return CategoryTypes(
+        MappingProxyType(by_category),
+        MappingProxyType({place_type: frozenset(names) for place_type, names in by_type.items()}),
+        time.monotonic(),
+    )
+
+
+def _fresh_snapshot():
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - snapshot.loaded_at < location_setting('CATEGORY_TYPES_TTL').total_seconds():
+        return snapshot
+    return None
+
+
+def get_category_types():
+    global _snapshot
+    snapshot = _fresh_snapshot()
+    if snapshot is None:
+        with _lock:
+            snapshot = _fresh_snapshot()
+            if snapshot is None:
+                snapshot = _snapshot = _load()
+    return snapshot
+
+
+async def aget_category_types():
+    # Only touches the database (in a thread) when the snapshot needs loading
+    snapshot = _fresh_snapshot()
+    if snapshot is None:
+        snapshot = await sync_to_async(get_category_types)()
+    return snapshot
+
+
+def invalidate_category_types():
+    global _snapshot
+    _snapshot = None
+
+
+def categories_for_type(place_type):
+    return get_category_types().by_type.get(place_type, frozenset())
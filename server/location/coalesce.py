@@ -0,0 +1,176 @@
+"""
+Single-flight coalescing of identical upstream calls.
+
+Concurrent callers asking for the same key share one in-flight call. Within
+a process this uses a lock and an event per key. When
+LOCATION_SERVICE['COALESCE_CACHE_ALIAS'] names a cache shared between
+workers (database, redis, memcached), the first worker to take a lock in that
+cache makes the call and publishes the result; the others wait for it.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+
+from django.core.cache import caches
+
+from .conf import location_setting
+
+_MISSING = object()
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self):
+        return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight, for the async views.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        # Futures belong to one event loop, so keep a table per loop
+        self._calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        future = calls.get(key)
+        while future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # This follower was cancelled, not the leader
+            # The leader was cancelled; the next caller in takes over the call
+            future = calls.get(key)
+
+        future = calls[key] = loop.create_future()
+        self.calls += 1
+        try:
+            result = await fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so a leader-only failure is not logged twice
+            raise
+        finally:
+            del calls[key]
+
+    def stats(self):
+        return {'calls': self.calls, 'coalesced': self.coalesced}
+
+
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+
+
+def _shared_key(key):
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def _shared_call(alias, key, fn, args, kwargs):
+    """
+    Coalesce across workers through a shared cache: the worker that adds the
+    lock key makes the call; the rest poll for its published result and fall
+    back to calling upstream themselves if it never appears.
+    """
+    shared = caches[alias]
+    digest = _shared_key(key)
+    lock_key = f'location:coalesce:lock:{digest}'
+    result_key = f'location:coalesce:result:{digest}'
+    wait_timeout = location_setting('COALESCE_WAIT_TIMEOUT')
+
+    # Another worker may have published while this one was queued behind the in-process lock
+    result = shared.get(result_key, _MISSING)
+    if result is not _MISSING:
+        return result
+    if shared.add(lock_key, 1, timeout=wait_timeout):
+        try:
+            result = fn(*args, **kwargs)
+            shared.set(result_key, result, timeout=location_setting('COALESCE_RESULT_TTL'))
+            return result
+        finally:
+            shared.delete(lock_key)
+
+    deadline = time.monotonic() + wait_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        result = shared.get(result_key, _MISSING)
+        if result is not _MISSING:
+            return result
+        if shared.get(lock_key) is None:
+            # The leader finished without publishing (it failed); try ourselves
+            break
+    return fn(*args, **kwargs)
+
+
+def coalesce(key, fn, *args, **kwargs):
+    """
+    Call fn(*args, **kwargs), sharing the call with any concurrent caller
+    using the same key.
+    """
+    alias = location_setting('COALESCE_CACHE_ALIAS')
+    if alias:
+        return _flights.do(key, _shared_call, alias, key, fn, args, kwargs)
+    return _flights.do(key, fn, *args, **kwargs)
+
+
+async def coalesce_async(key, fn, *args, **kwargs):
+    """
+    Async version of coalesce(); shares calls within the event loop.
+    """
+    return await _async_flights.do(key, fn, *args, **kwargs)
+
+
+def coalesce_stats():
+    return {'sync': _flights.stats(), 'async': _async_flights.stats()}
@@ -0,0 +1,91 @@
+from datetime import timedelta
+from django.conf import settings
+
+
+DEFAULTS = {
+    # Geocode cache: in-process LRU in front of the GeocodeCacheEntry table
+    'GEOCODE_CACHE_TTL': timedelta(days=30),
+    'GEOCODE_FALLBACK_TTL': timedelta(minutes=5),  # Keep upstream failures short-lived
+    'GEOCODE_LRU_SIZE': 2048,
+    # Shared upstream HTTP client (location/upstream.py)
+    'UPSTREAM_CONNECT_TIMEOUT': 3.05,
+    'UPSTREAM_READ_TIMEOUT': 10,
+    'UPSTREAM_MAX_RETRIES': 2,  # Retries on connection errors, 429 and 5xx
+    'UPSTREAM_BACKOFF_FACTOR': 0.3,
+    'UPSTREAM_RETRY_AFTER_MAX': 5,  # Cap, in seconds, on an upstream Retry-After
+    'UPSTREAM_POOL_SIZE': 20,  # Keep-alive connections per host
+    'UPSTREAM_BASE_URL': None,  # Route all upstream calls to a stub
+    # Record upstream responses to disk, or replay them with no network (location/cassette.py)
+    'UPSTREAM_CASSETTE_MODE': None,  # None, 'record' or 'replay'
+    'UPSTREAM_CASSETTE_DIR': 'upstream_cassettes',
+    'UPSTREAM_REPLAY_LATENCY': 0,  # Seconds, or a (min, max) tuple
+    # searchNearby result cache, bucketed by geohash cell of the search centre
+    'NEARBY_CACHE_TTL': timedelta(minutes=10),
+    'NEARBY_CACHE_SIZE': 1024,
+    'NEARBY_GEOHASH_PRECISION': 6,  # ~1.2km x 0.6km cells
+    # A cache alias shared by all workers (e.g. a DatabaseCache) behind the
+    # per-process LRU; needed for PREFETCH_BACKEND 'jobs' to reach web workers
+    'NEARBY_CACHE_ALIAS': None,
+    # search_locations prefix index
+    'AUTOCOMPLETE_CACHE_TTL': timedelta(hours=6),
+    'AUTOCOMPLETE_CACHE_MAX_BYTES': 4 * 1024 * 1024,
+    'AUTOCOMPLETE_BUCKET_DECIMALS': 1,  # Round caller lat/lng to ~11km
+    'AUTOCOMPLETE_MIN_DERIVED_RESULTS': 3,  # Answer from a shorter prefix only if this many still match
+    # Single-flight coalescing of identical upstream calls. Set to a cache alias
+    # shared by all workers (e.g. a DatabaseCache) to coalesce across processes.
+    'COALESCE_CACHE_ALIAS': None,
+    'COALESCE_WAIT_TIMEOUT': 15,  # Seconds a follower waits for the leader's result
+    'COALESCE_RESULT_TTL': 5,  # Seconds the leader's result stays published
+    # Provider ranking weights per event category, merged over
+    # {'rating': 0.5, 'reviews': 0.3, 'proximity': 0.2}; 'default' applies to all.
+    # e.g. {'Food & Drink': {'rating': 0.6, 'reviews': 0.3, 'proximity': 0.1}}
+    'RANKING_WEIGHTS': {},
+    # Search our own Provider catalogue first; go upstream only below this many matches
+    'LOCAL_INDEX_ENABLED': True,
+    'LOCAL_INDEX_MIN_RESULTS': 10,
+    # Outbound token bucket for the RapidAPI key and per-host circuit breakers.
+    # Point RATE_LIMIT_CACHE_ALIAS at a cache shared by all workers to make both global.
+    'RATE_LIMIT_PER_SECOND': 10,
+    'RATE_LIMIT_BURST': 20,
+    'RATE_LIMIT_MAX_WAIT': 2.0,  # Seconds a call may wait for a token before failing fast
+    'RATE_LIMIT_CACHE_ALIAS': None,
+    'BREAKER_FAILURE_THRESHOLD': 5,  # Consecutive failures before the breaker opens
+    'BREAKER_RESET_TIMEOUT': 30,  # Seconds before a half-open trial call
+    # Per-stage Server-Timing headers on the location views, and the fraction of
+    # upstream payloads logged at DEBUG level
+    'SERVER_TIMING_ENABLED': True,
+    'LOG_PAYLOAD_SAMPLE_RATE': 0.01,
+    # Batch provider search: items per request, and upstream calls in flight per batch
+    'BATCH_MAX_ITEMS': 20,
+    'BATCH_CONCURRENCY': 8,
+    # Nearby searches over more than NEARBY_SHARD_SIZE place types are split into
+    # shards searched concurrently and merged by place id; None disables splitting
+    'NEARBY_SHARD_SIZE': 6,
+    'NEARBY_SHARD_CONCURRENCY': 4,
+    # Offline IP range table for get_initial_location, built with
+    # `manage.py build_ip_table`; without one, ipinfo.io is called per IP prefix
+    'IP_GEO_TABLE_PATH': None,
+    'IP_GEO_TRUSTED_PROXIES': 0,  # Reverse proxies appending to X-Forwarded-For
+    'IP_GEO_CACHE_SIZE': 4096,
+    'IP_GEO_CACHE_TTL': timedelta(days=1),
+    # How long a worker keeps its snapshot of Category.place_types; edits made
+    # through this worker are picked up immediately via signals
+    'CATEGORY_TYPES_TTL': timedelta(minutes=5),
+    # Background warm-up of provider results after an event is created
+    'PREFETCH_ENABLED': True,
+    # 'thread' warms the caches in the web process; 'jobs' hands the work to
+    # `manage.py runworker` and needs NEARBY_CACHE_ALIAS, else 'thread' is used
+    'PREFETCH_BACKEND': 'thread',
+    'PREFETCH_WORKERS': 2,
+    'PREFETCH_MAX_PENDING': 32,  # Queued or running prefetches; more are dropped
+}
+
+
+def location_setting(name):
+    """
+    Read a value from settings.LOCATION_SERVICE, falling back to DEFAULTS.
+    """
+    overrides = getattr(settings, 'LOCATION_SERVICE', {})
+    if name in overrides:
+        return overrides[name]
+    return DEFAULTS[name]
@@ -0,0 +1,71 @@
+"""
+Small geospatial helpers (no PostGIS).
+"""
+import math
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(lat, lng, precision=6):
+    """
+    Encode a coordinate as a geohash. Precision 6 cells are about 1.2km x 0.6km.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits = bits << 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """
+    (lat_degrees, lng_degrees) covered by one cell at this precision.
+    """
+    bits = 5 * precision
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def geohash_cells_covering(lat, lng, radius_km, precision):
+    """
+    Geohash cells at `precision` that together cover the bounding box of a
+    circle of radius_km around (lat, lng).
+    """
+    lat_delta = radius_km / 111.32
+    lng_delta = radius_km / max(111.32 * math.cos(math.radians(lat)), 1e-6)
+    lat_step, lng_step = geohash_cell_size(precision)
+
+    min_lat, max_lat = max(lat - lat_delta, -90.0), min(lat + lat_delta, 90.0)
+    min_lng, max_lng = max(lng - lng_delta, -180.0), min(lng + lng_delta, 180.0)
+
+    cells = set()
+    cell_lat = min_lat
+    while True:
+        cell_lng = min_lng
+        while True:
+            cells.add(geohash_encode(cell_lat, cell_lng, precision))
+            if cell_lng >= max_lng:
+                break
+            cell_lng = min(cell_lng + lng_step, max_lng)
+        if cell_lat >= max_lat:
+            break
+        cell_lat = min(cell_lat + lat_step, max_lat)
+    return cells
@@ -0,0 +1,102 @@
+"""
+Per-stage request timing and sampled payload logging for the location views.
+
+Views decorated with @timed_view get a StageTimer for the duration of the
+request; code anywhere below them marks a stage with `with stage('geocode'):`.
+Stage durations are sent back in a Server-Timing header and recorded into the
+location_stage_duration_ms histograms served by /api/location/metrics/.
+"""
+import asyncio
+import contextvars
+import functools
+import random
+import time
+from contextlib import contextmanager
+
+from . import metrics
+from .conf import location_setting
+
+_current_timer = contextvars.ContextVar('location_stage_timer', default=None)
+
+
+class StageTimer:
+    def __init__(self):
+        self.durations = {}  # Stage name -> milliseconds, in first-seen order
+
+    def add(self, name, duration_ms):
+        self.durations[name] = self.durations.get(name, 0) + duration_ms
+
+    def server_timing(self):
+        return ', '.join(f'{name};dur={duration:.1f}' for name, duration in self.durations.items())
+
+
+@contextmanager
+def stage(name):
+    """
+    Time the enclosed block as stage `name` of the current request, if any.
+    """
+    timer = _current_timer.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timer is not None:
+            timer.add(name, (time.perf_counter() - started) * 1000)
+
+
+def _finish(view_name, timer, response, started):
+    # DRF responses are rendered lazily; render here so serialization is timed too
+    if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+        render_started = time.perf_counter()
+        response.render()
+        timer.add('serialize', (time.perf_counter() - render_started) * 1000)
+    timer.add('total', (time.perf_counter() - started) * 1000)
+
+    for name, duration in timer.durations.items():
+        metrics.observe('location_stage_duration_ms', duration, view=view_name, stage=name)
+    if location_setting('SERVER_TIMING_ENABLED'):
+        response['Server-Timing'] = timer.server_timing()
+    return response
+
+
+def timed_view(view):
+    """
+    Time a location view (sync or async). Apply it above @api_view.
+    """
+    target = getattr(view, 'cls', view)  # DRF's api_view keeps the function's name on .cls
+    view_name = f"{target.__module__.rsplit('.', 1)[-1]}.{target.__name__}"
+
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            timer = StageTimer()
+            token = _current_timer.set(timer)
+            started = time.perf_counter()
+            try:
+                response = await view(request, *args, **kwargs)
+            finally:
+                _current_timer.reset(token)
+            return _finish(view_name, timer, response, started)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timer = StageTimer()
+        token = _current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _current_timer.reset(token)
+        return _finish(view_name, timer, response, started)
+    return wrapper
+
+
+def log_sampled(logger, level, msg, *args):
+    """
+    Log large payloads only when `level` is enabled, and then only for a
+    LOG_PAYLOAD_SAMPLE_RATE fraction of calls. Arguments are not formatted
+    unless the record is emitted.
+    """
+    if logger.isEnabledFor(level) and random.random() < location_setting('LOG_PAYLOAD_SAMPLE_RATE'):
+        logger.log(level, msg, *args)
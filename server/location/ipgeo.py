@@ -0,0 +1,200 @@
+"""
+Offline IP geolocation for get_initial_location.
+
+The IP ranges live in a binary file built by `manage.py build_ip_table` and
+memory-mapped read-only, so every worker shares the same pages:
+
+    header   magic (8 bytes), record count (uint32), locations length (uint32)
+    records  sorted by start: start (16 bytes), end (16 bytes), location index (uint32)
+    tail     JSON list of [city, region, country, lat, lng]
+
+Addresses are compared as 16-byte big-endian keys (IPv4 as IPv4-mapped IPv6),
+so a lookup is a bisect over the record starts. Results are cached per /24
+(IPv4) or /48 (IPv6) prefix. Rebuilding the table in place is picked up by
+running workers within TABLE_CHECK_INTERVAL seconds, no restart needed.
+"""
+import ipaddress
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_right
+
+from .cache import LRUCache
+from .conf import location_setting
+
+MAGIC = b'PLIPGEO1'
+_HEADER = struct.Struct('>8sII')
+_RECORD = struct.Struct('>16s16sI')
+_IPV4_MAPPED = b'\x00' * 10 + b'\xff\xff'
+
+
+def ip_key(address):
+    ip = ipaddress.ip_address(address)
+    if ip.version == 4:
+        return _IPV4_MAPPED + ip.packed
+    return ip.packed
+
+
+class _Starts:
+    """
+    Sequence view of the record start keys, for bisect.
+    """
+
+    def __init__(self, table):
+        self._table = table
+
+    def __len__(self):
+        return self._table.count
+
+    def __getitem__(self, index):
+        offset = self._table.offset(index)
+        return self._table.map[offset:offset + 16]
+
+
+class IPRangeTable:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, locations_length = _HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an IP range table')
+        locations_at = self.offset(self.count)
+        self.locations = json.loads(self.map[locations_at:locations_at + locations_length])
+        self._starts = _Starts(self)
+
+    def offset(self, index):
+        return _HEADER.size + index * _RECORD.size
+
+    def lookup(self, address):
+        """
+        Return {'lat', 'lng', 'city', 'region', 'country'} for the range
+        holding `address`, or None.
+        """
+        key = ip_key(address)
+        index = bisect_right(self._starts, key) - 1
+        if index < 0:
+            return None
+        _, end, location_index = _RECORD.unpack_from(self.map, self.offset(index))
+        if key > end:
+            return None
+        city, region, country, lat, lng = self.locations[location_index]
+        return {'lat': lat, 'lng': lng, 'city': city, 'region': region, 'country': country}
+
+
+def build_table(rows, path):
+    """
+    Write a range table from (start_ip, end_ip, city, region, country, lat, lng)
+    rows. The file is replaced atomically: running workers keep reading their
+    old map until get_table() notices the new file.
+    """
+    locations = {}
+    records = []
+    for start, end, city, region, country, lat, lng in rows:
+        location = (city, region, country, round(float(lat), 4), round(float(lng), 4))
+        index = locations.setdefault(location, len(locations))
+        records.append((ip_key(start), ip_key(end), index))
+    records.sort()
+
+    blob = json.dumps(list(locations), separators=(',', ':')).encode('utf-8')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(records), len(blob)))
+        for record in records:
+            f.write(_RECORD.pack(*record))
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+# Seconds between checks of the table file for a rebuild
+TABLE_CHECK_INTERVAL = 5
+
+_table = None
+_table_path = None
+_table_stamp = None
+_table_checked = 0
+_table_lock = threading.Lock()
+
+
+def get_table():
+    """
+    The table at LOCATION_SERVICE['IP_GEO_TABLE_PATH'], or None if unset.
+    Reopened when the file is replaced (build_ip_table).
+    """
+    global _table, _table_path, _table_stamp, _table_checked
+    path = location_setting('IP_GEO_TABLE_PATH')
+    if not path:
+        return None
+    if _table_path == path and time.monotonic() - _table_checked < TABLE_CHECK_INTERVAL:
+        return _table
+    with _table_lock:
+        stat = os.stat(path)
+        stamp = (path, stat.st_ino, stat.st_mtime_ns)
+        if stamp != _table_stamp:
+            # Lookups still holding the old table finish on its map; it closes once unreferenced
+            _table = IPRangeTable(path)
+            _table_stamp = stamp
+            _prefix_cache.clear()
+        _table_path = path
+        _table_checked = time.monotonic()
+    return _table
+
+
+# Per-prefix result cache ----------------------------------------------------
+
+_prefix_cache = LRUCache(
+    maxsize=location_setting('IP_GEO_CACHE_SIZE'),
+    ttl=location_setting('IP_GEO_CACHE_TTL').total_seconds(),
+)
+
+
+def prefix_key(address):
+    ip = ipaddress.ip_address(address)
+    prefix = 24 if ip.version == 4 else 48
+    return str(ipaddress.ip_network(f'{ip}/{prefix}', strict=False))
+
+
+def client_ip(request):
+    """
+    The client's address. X-Forwarded-For can be set by anyone, so only the
+    hops added by our own IP_GEO_TRUSTED_PROXIES reverse proxies (counted
+    from the right, REMOTE_ADDR included) are skipped; with none, REMOTE_ADDR.
+    """
+    hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    hops.append(request.META.get('REMOTE_ADDR', ''))
+    hop = hops[max(len(hops) - 1 - location_setting('IP_GEO_TRUSTED_PROXIES'), 0)]
+    try:
+        return str(ipaddress.ip_address(hop))
+    except ValueError:
+        return None
+
+
+def is_public(address):
+    return ipaddress.ip_address(address).is_global
+
+
+def locate_ip(address):
+    """
+    Location for `address` from the prefix cache or the range table, else None.
+    """
+    table = get_table()  # First, so a rebuilt table clears the cache
+    key = prefix_key(address)
+    location = _prefix_cache.get(key)
+    if location is not None:
+        return location
+    location = table.lookup(address) if table is not None else None
+    if location is not None:
+        _prefix_cache.set(key, location)
+    return location
+
+
+def remember_ip_location(address, location):
+    # Used for locations resolved upstream when no table is configured
+    _prefix_cache.set(prefix_key(address), location)
+
+
+def ip_geo_cache_stats():
+    return _prefix_cache.stats()
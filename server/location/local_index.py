@@ -0,0 +1,100 @@
+"""
+First-tier provider search over our own Provider catalogue.
+
+Providers are bucketed by Provider.geo_cell (a geohash cell). A search loads
+the rows in the cells covering the search circle with one indexed IN query,
+then filters by exact distance and by category types or query text. The
+views only go to the upstream when this returns fewer than
+LOCAL_INDEX_MIN_RESULTS providers.
+"""
+import numpy as np
+
+from events.models import GEO_CELL_PRECISION, Provider
+
+from .conf import location_setting
+from .geo import geohash_cells_covering
+from .providers import NO_PHONE
+from .ranking import haversine_km
+
+_FIELDS = (
+    'id', 'external_id', 'name', 'address', 'phone', 'website', 'rating', 'review_count',
+    'description', 'tags', 'latitude', 'longitude',
+)
+
+
+def type_to_tag(place_type):
+    # Tags are stored the way places_to_providers builds them
+    return place_type.replace('_', ' ').title()
+
+
+def provider_to_result(provider):
+    """
+    Shape a Provider row like places_to_providers output.
+    """
+    return {
+        'place_id': provider['external_id'],
+        'name': provider['name'],
+        'rating': provider['rating'],
+        'address': provider['address'] or 'Address not available',
+        'phone_number': provider['phone'] or NO_PHONE,
+        'website': provider['website'] or 'No website available',
+        'types': [tag.lower().replace(' ', '_') for tag in provider['tags']],
+        'user_rating_count': provider['review_count'],
+        'coordinates': {'lat': provider['latitude'], 'lng': provider['longitude']},
+        'description': provider['description'] or 'No description available',
+        'tags': provider['tags'],
+    }
+
+
+def _matches(provider, wanted_tags, query):
+    if wanted_tags and not wanted_tags.intersection(provider['tags'] or []):
+        return False
+    if query:
+        haystack = ' '.join([provider['name']] + list(provider['tags'] or [])).lower()
+        return all(term in haystack for term in query.lower().split())
+    return True
+
+
+def search_local_providers(latitude, longitude, radius_meters, place_types=None, query=None):
+    """
+    Providers within radius_meters of (latitude, longitude) that have one of
+    `place_types` and/or match every word of `query`. Rated providers only,
+    deduplicated on (name, address).
+    """
+    if not location_setting('LOCAL_INDEX_ENABLED'):
+        return []
+
+    radius_km = radius_meters / 1000
+    cells = geohash_cells_covering(latitude, longitude, radius_km, GEO_CELL_PRECISION)
+    rows = list(
+        Provider.objects
+        .filter(geo_cell__in=cells, rating__gt=0)
+        .values(*_FIELDS)
+    )
+    if not rows:
+        return []
+
+    wanted_tags = {type_to_tag(t) for t in place_types} if place_types else None
+    rows = [row for row in rows if _matches(row, wanted_tags, query)]
+    if not rows:
+        return []
+
+    distances = haversine_km(
+        latitude, longitude,
+        np.array([row['latitude'] for row in rows], dtype=float),
+        np.array([row['longitude'] for row in rows], dtype=float),
+    )
+
+    results = []
+    seen = set()
+    for row, distance in zip(rows, distances.tolist()):
+        key = (row['name'], row['address'])
+        if distance > radius_km or key in seen:
+            continue
+        seen.add(key)
+        results.append(provider_to_result(row))
+    return results
+
+
+def has_local_coverage(providers):
+    return len(providers) >= location_setting('LOCAL_INDEX_MIN_RESULTS')
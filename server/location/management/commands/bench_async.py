@@ -0,0 +1,79 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from location import aio, upstream
+from location.providers import atypes_for_category, nearby_search_request, places_to_providers, types_for_category
+from location.ranking import rank_providers
+from location.stub_upstream import StubUpstream
+from location.views import _fetch_geocode
+
+
+def sync_pipeline(i):
+    result, _ = _fetch_geocode(f'{i} Bench Street')
+    url, headers, body = nearby_search_request(types_for_category('Music'), result['lat'], result['lng'])
+    places = upstream.post(url, headers=headers, json=body).json()['places']
+    return rank_providers(places_to_providers(places), result['lat'], result['lng'])
+
+
+async def async_pipeline(i):
+    result, _ = await aio.fetch_geocode(f'{i} Bench Street')
+    url, headers, body = nearby_search_request(await atypes_for_category('Music'), result['lat'], result['lng'])
+    places = (await aio.post(url, headers=headers, json=body)).json()['places']
+    return rank_providers(places_to_providers(places), result['lat'], result['lng'])
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare sync (thread pool) and async (single event loop) throughput of the "
+        "provider search pipeline against a local stub upstream. Caches are bypassed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--workers', type=int, default=8,
+                            help="Threads for the sync run (one per sync worker thread)")
+        parser.add_argument('--concurrency', type=int, default=200,
+                            help="In-flight searches for the async run")
+        parser.add_argument('--delay', type=float, default=0.05,
+                            help="Stub upstream latency per call, in seconds")
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        with StubUpstream(delay=options['delay']) as stub:
+            config = dict(getattr(settings, 'LOCATION_SERVICE', {}))
+            config.update({
+                'UPSTREAM_BASE_URL': stub.url,
+                'UPSTREAM_POOL_SIZE': max(options['workers'], options['concurrency']),
+            })
+            with override_settings(LOCATION_SERVICE=config):
+                sync_elapsed = self._run_sync(total, options['workers'])
+                # Reopen the shared session so it picks up the benchmark pool size
+                aio.close_session()
+                try:
+                    async_elapsed = asyncio.run(self._run_async(total, options['concurrency']))
+                finally:
+                    aio.close_session()
+
+        self.stdout.write(f"{total} searches, upstream delay {options['delay'] * 1000:.0f}ms per call")
+        self.stdout.write(f"  sync  ({options['workers']} threads):  {sync_elapsed:7.2f}s  {total / sync_elapsed:8.1f} req/s")
+        self.stdout.write(f"  async ({options['concurrency']} in flight): {async_elapsed:7.2f}s  {total / async_elapsed:8.1f} req/s")
+        self.stdout.write(self.style.SUCCESS(f"  speedup: {sync_elapsed / async_elapsed:.1f}x"))
+
+    def _run_sync(self, total, workers):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(sync_pipeline, range(total)))
+        return time.perf_counter() - started
+
+    async def _run_async(self, total, concurrency):
+        started = time.perf_counter()
+        results = await aio.fan_out(*(async_pipeline(i) for i in range(total)), limit=concurrency)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            self.stderr.write(f"{len(errors)} async searches failed, first: {errors[0]!r}")
+        return time.perf_counter() - started
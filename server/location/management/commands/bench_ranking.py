@@ -0,0 +1,84 @@
+import copy
+import math
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from location.ranking import rank_providers
+
+
+def legacy_rank(providers, latitude, longitude, limit=10):
+    """
+    The per-provider loop the views used before location/ranking.py, kept as
+    the benchmark baseline (with its double radians conversion fixed, so the
+    two rankings can be compared).
+    """
+    for provider in providers:
+        if provider['coordinates']['lat'] and provider['coordinates']['lng']:
+            def haversine(lon1, lat1, lon2, lat2):
+                lon1, lat1, lon2, lat2 = map(math.radians, [lon1, lat1, lon2, lat2])
+                dlon = lon2 - lon1
+                dlat = lat2 - lat1
+                a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+                return 2 * math.asin(math.sqrt(a)) * 6371
+            provider['distance'] = round(haversine(
+                longitude, latitude, provider['coordinates']['lng'], provider['coordinates']['lat']
+            ), 2)
+        else:
+            provider['distance'] = None
+    for provider in providers:
+        if not provider.get('rating') or not provider.get('distance'):
+            provider['rank_score'] = 0
+            continue
+        normalized_review_count = min(provider.get('user_rating_count', 0) / 100, 1.0)
+        normalized_distance = 1.0 - min(provider.get('distance', 15) / 15, 1.0)
+        provider['rank_score'] = (
+            (provider.get('rating', 0) / 5) * 0.5 +
+            normalized_review_count * 0.3 +
+            normalized_distance * 0.2
+        )
+    providers.sort(key=lambda x: x.get('rank_score', 0), reverse=True)
+    return providers[:limit]
+
+
+def make_candidates(n, latitude, longitude, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'name': f'Provider {i}',
+        'rating': round(rng.uniform(1, 5), 1),
+        'user_rating_count': rng.randint(0, 1000),
+        'coordinates': {
+            'lat': latitude + rng.uniform(-0.2, 0.2),
+            'lng': longitude + rng.uniform(-0.2, 0.2),
+        },
+    } for i in range(n)]
+
+
+class Command(BaseCommand):
+    help = "Microbenchmark rank_providers (vectorized from VECTORIZE_MIN_CANDIDATES up) against the legacy per-place loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[15, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        latitude, longitude = 40.7128, -74.0060
+        for n in options['sizes']:
+            candidates = make_candidates(n, latitude, longitude)
+            legacy = legacy_rank(copy.deepcopy(candidates), latitude, longitude)
+            ranked = rank_providers(copy.deepcopy(candidates), latitude, longitude)
+            if [p['name'] for p in legacy] != [p['name'] for p in ranked]:
+                self.stderr.write(f"n={n}: rankings differ")
+
+            legacy_time = min(timeit.repeat(
+                lambda: legacy_rank(copy.copy(candidates), latitude, longitude),
+                number=1, repeat=options['repeat']))
+            ranked_time = min(timeit.repeat(
+                lambda: rank_providers(copy.copy(candidates), latitude, longitude),
+                number=1, repeat=options['repeat']))
+            self.stdout.write(
+                f"n={n:>6}: legacy {legacy_time * 1000:8.3f}ms  "
+                f"rank_providers {ranked_time * 1000:8.3f}ms  "
+                f"({legacy_time / ranked_time:.1f}x)"
+            )
@@ -0,0 +1,35 @@
+import csv
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from location.ipgeo import build_table
+
+
+def read_rows(path):
+    """
+    Rows of a DB-IP "IP to City Lite" CSV (optionally gzipped):
+    start_ip, end_ip, continent, country, region, city, latitude, longitude
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 8:
+                continue
+            start, end, _, country, region, city, lat, lng = row[:8]
+            yield start, end, city, region, country, lat, lng
+
+
+class Command(BaseCommand):
+    help = "Build the memory-mapped IP range table used by get_initial_location from a DB-IP city CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="DB-IP 'IP to City Lite' CSV, optionally .gz")
+        parser.add_argument('output', help="Table file; point LOCATION_SERVICE['IP_GEO_TABLE_PATH'] at it")
+
+    def handle(self, *args, **options):
+        try:
+            count = build_table(read_rows(options['source']), options['output'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Failed to build IP table: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} ranges to {options['output']}"))
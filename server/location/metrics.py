@@ -0,0 +1,104 @@
+"""
+Minimal in-process metrics registry for the location app.
+
+Metric names carry their labels Prometheus-style, e.g.
+'upstream_calls_total{host="google-map-places.p.rapidapi.com",status="200"}'.
+"""
+import threading
+
+# Upper bounds (milliseconds) of the histogram buckets
+DEFAULT_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+
+
+def metric_name(name, **labels):
+    if not labels:
+        return name
+    rendered = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f'{name}{{{rendered}}}'
+
+
+def increment(name, value=1, **labels):
+    key = metric_name(name, **labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    key = metric_name(name, **labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    key = metric_name(name, **labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': buckets, 'counts': [0] * len(buckets), 'count': 0, 'sum': 0.0}
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                histogram['counts'][i] += 1
+                break
+        histogram['count'] += 1
+        histogram['sum'] += value
+
+
+def _quantile(histogram, q):
+    """
+    Upper bound of the bucket holding the q-th quantile. The +Inf bucket
+    reports the largest finite bound (a lower bound, like Prometheus'
+    histogram_quantile) so snapshots stay JSON-encodable.
+    """
+    rank = q * histogram['count']
+    seen = 0
+    for bound, count in zip(histogram['buckets'], histogram['counts']):
+        seen += count
+        if seen >= rank:
+            break
+    if bound == float('inf'):
+        finite = [b for b in histogram['buckets'] if b != float('inf')]
+        return finite[-1] if finite else None
+    return bound
+
+
+def _summarize(histogram):
+    cumulative = 0
+    buckets = {}
+    for bound, count in zip(histogram['buckets'], histogram['counts']):
+        cumulative += count
+        buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+    return {
+        'count': histogram['count'],
+        'sum': round(histogram['sum'], 3),
+        'buckets': buckets,
+        'p50': _quantile(histogram, 0.5),
+        'p95': _quantile(histogram, 0.95),
+        'p99': _quantile(histogram, 0.99),
+    }
+
+
+def snapshot(prefix=None):
+    """
+    Current values, optionally only the metrics whose name starts with `prefix`.
+    """
+    def wanted(key):
+        return prefix is None or key.startswith(prefix)
+
+    with _lock:
+        return {
+            'counters': {key: value for key, value in _counters.items() if wanted(key)},
+            'gauges': {key: value for key, value in _gauges.items() if wanted(key)},
+            'histograms': {key: _summarize(value) for key, value in _histograms.items() if wanted(key)},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
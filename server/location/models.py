@@ -1,3 +1,28 @@
 from django.db import models
 
-# Create your models here.
+
+class GeocodeCacheEntry(models.Model):
+    """
+    Persistent tier of the geocode cache, keyed on a hash of the normalized address.
+    """
+    address_key = models.CharField(max_length=64, unique=True)
+    address = models.CharField(max_length=255, blank=True)
+    lat = models.FloatField()
+    lng = models.FloatField()
+    formatted_address = models.CharField(max_length=255)
+    is_fallback = models.BooleanField(default=False)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def as_result(self):
+        return {
+            'lat': self.lat,
+            'lng': self.lng,
+            'formatted_address': self.formatted_address
+        }
+
+    def __str__(self):
+        return f"{self.address} -> {self.formatted_address}"
@@ -0,0 +1,122 @@
+"""
+Background warm-up of the provider search caches for newly created events.
+
+The organizer's next screen after creating an event is the provider
+recommendations for it, so EventCreateView queues the geocode and nearby
+search here. Work runs on a small thread pool (PREFETCH_WORKERS), or on the
+job queue when PREFETCH_BACKEND is 'jobs'; a worker's results only reach the
+web processes through the geocode database tier and a shared nearby cache
+(NEARBY_CACHE_ALIAS), so without one 'jobs' runs on the pool. In-process, at most
+PREFETCH_MAX_PENDING jobs are queued or running, and a job for the same
+address and category is not queued twice. A recommendations request that
+arrives while its prefetch is still running joins it through coalesce().
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+from . import metrics
+from .cache import address_key, get_cached_nearby, nearby_cache_key
+from .coalesce import coalesce
+from .conf import location_setting
+from .local_index import has_local_coverage, search_local_providers
+from .providers import SEARCH_RADIUS_METERS, types_for_category
+from .views import _fetch_nearby, geocode_address
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+_warned = False
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=location_setting('PREFETCH_WORKERS'),
+            thread_name_prefix='provider-prefetch',
+        )
+    return _executor
+
+
+def warm_provider_cache(address, category):
+    """
+    Run the geocode and nearby search get_location_providers would run,
+    leaving their results in the caches.
+    """
+    geocode_result = geocode_address(address)
+    latitude, longitude = geocode_result['lat'], geocode_result['lng']
+    included_types = types_for_category(category)
+    providers = search_local_providers(latitude, longitude, SEARCH_RADIUS_METERS, place_types=included_types)
+    if has_local_coverage(providers):
+        return
+    if get_cached_nearby(included_types, latitude, longitude, SEARCH_RADIUS_METERS) is None:
+        coalesce(
+            ('nearby',) + nearby_cache_key(included_types, latitude, longitude, SEARCH_RADIUS_METERS),
+            _fetch_nearby, included_types, latitude, longitude
+        )
+
+
+def _run(key, address, category):
+    try:
+        warm_provider_cache(address, category)
+        metrics.increment('prefetch_total', outcome='completed')
+    except Exception:
+        metrics.increment('prefetch_total', outcome='failed')
+        logger.warning("Provider prefetch failed for %r (%s)", address, category, exc_info=True)
+    finally:
+        with _lock:
+            _pending.discard(key)
+        close_old_connections()
+
+
+def _jobs_backend_usable():
+    """
+    True if the nearby cache is shared, so the jobs backend can be used.
+    """
+    global _warned
+    if location_setting('NEARBY_CACHE_ALIAS'):
+        return True
+    if not _warned:
+        _warned = True
+        logger.warning("PREFETCH_BACKEND 'jobs' needs NEARBY_CACHE_ALIAS; prefetching in-process instead")
+    return False
+
+
+def prefetch_providers(address, category):
+    """
+    Queue a cache warm-up; returns False if it was a duplicate, the queue
+    was full or prefetching is disabled. With PREFETCH_BACKEND = 'jobs' (and
+    a shared NEARBY_CACHE_ALIAS) the warm-up runs on the job queue
+    (jobs/queue.py) instead of in this process.
+    """
+    if not address or not location_setting('PREFETCH_ENABLED'):
+        return False
+    if location_setting('PREFETCH_BACKEND') == 'jobs' and _jobs_backend_usable():
+        from .tasks import prefetch_providers as prefetch_task  # tasks imports this module
+        prefetch_task.enqueue(args=[address, category], unique=True)
+        metrics.increment('prefetch_total', outcome='enqueued')
+        return True
+    key = (address_key(address), category)
+    with _lock:
+        if key in _pending:
+            metrics.increment('prefetch_total', outcome='deduplicated')
+            return False
+        if len(_pending) >= location_setting('PREFETCH_MAX_PENDING'):
+            metrics.increment('prefetch_total', outcome='dropped')
+            return False
+        _pending.add(key)
+        executor = _get_executor()
+    executor.submit(_run, key, address, category)
+    metrics.increment('prefetch_total', outcome='queued')
+    return True
+
+
+def prefetch_event_providers(event):
+    location = event.location or {}
+    address = location.get('description', '') if isinstance(location, dict) else str(location)
+    return prefetch_providers(address, event.category.name)
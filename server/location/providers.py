@@ -0,0 +1,240 @@
+"""
+Request builders and result processing shared by the sync and async
+provider search views.
+"""
+from . import upstream
+from .categories import DEFAULT_PLACE_TYPES, aget_category_types, get_category_types
+
+
+SEARCH_RADIUS_METERS = 15000  # 15km radius
+MAX_RESULT_COUNT = 15  # Get more results to select top providers based on ranking
+
+# Shown in place of a missing phone number; never stored on a Provider
+NO_PHONE = 'No phone number available'
+
+# Places API (New) fields requested per call site, instead of "*" (which also
+# returns photos, opening hours, address components and so on). Keep these in
+# line with what places_to_providers reads; location/tests.py checks it.
+PROVIDER_PLACE_FIELDS = (
+    'id', 'displayName', 'formattedAddress', 'location', 'rating', 'userRatingCount',
+    'types', 'internationalPhoneNumber', 'nationalPhoneNumber', 'websiteUri', 'reviews',
+)
+FIELD_MASK_PROFILES = {
+    'nearby_search': PROVIDER_PLACE_FIELDS,
+    'text_search': PROVIDER_PLACE_FIELDS,
+}
+
+DEFAULT_GEOCODE = {
+    'lat': 40.7128,
+    'lng': -74.0060,
+    'formatted_address': 'New York, NY, USA (default)'
+}
+ERROR_GEOCODE = {
+    'lat': 40.7128,
+    'lng': -74.0060,
+    'formatted_address': 'New York, NY, USA (error fallback)'
+}
+
+
+def types_for_category(category):
+    """
+    Place types for an event category (Category.place_types), as a tuple.
+    """
+    return get_category_types().by_category.get(category, DEFAULT_PLACE_TYPES)
+
+
+async def atypes_for_category(category):
+    return (await aget_category_types()).by_category.get(category, DEFAULT_PLACE_TYPES)
+
+
+def shard_types(included_types, shard_size):
+    """
+    Split a type list into near-equal contiguous shards of at most shard_size
+    types. A single maxResultCount-limited search over a wide list tends to be
+    dominated by one type; searching the shards separately widens coverage.
+    """
+    if not shard_size or len(included_types) <= shard_size:
+        return [included_types]
+    count = -(-len(included_types) // shard_size)
+    base, extra = divmod(len(included_types), count)
+    shards, start = [], 0
+    for i in range(count):
+        end = start + base + (1 if i < extra else 0)
+        shards.append(included_types[start:end])
+        start = end
+    return shards
+
+
+# Upstream request builders ------------------------------------------------
+
+def geocode_request(address):
+    """
+    Return (url, headers, params) for the upstream geocode call.
+    """
+    url = upstream.url_for(upstream.PLACES_HOST, '/maps/api/geocode/json')
+    headers = upstream.rapidapi_headers(upstream.PLACES_HOST)
+    params = {
+        "address": address,
+        "language": "en",
+        "region": "en",
+        "location_type": "APPROXIMATE"
+    }
+    return url, headers, params
+
+
+def parse_geocode_response(data):
+    """
+    Turn a geocode payload into (result, is_fallback).
+    """
+    if data.get('status') != 'OK' or not data.get('results'):
+        # Default to New York City
+        return dict(DEFAULT_GEOCODE), True
+    location = data['results'][0]['geometry']['location']
+    return {
+        'lat': location['lat'],
+        'lng': location['lng'],
+        'formatted_address': data['results'][0]['formatted_address']
+    }, False
+
+
+def field_mask(profile):
+    return ','.join(f'places.{field}' for field in FIELD_MASK_PROFILES[profile])
+
+
+def _places_headers(profile):
+    return upstream.rapidapi_headers(
+        upstream.PLACES_NEW_HOST,
+        **{"Content-Type": "application/json", "X-Goog-FieldMask": field_mask(profile)}
+    )
+
+
+def nearby_search_request(included_types, latitude, longitude):
+    """
+    Return (url, headers, body) for a places:searchNearby call.
+    """
+    url = upstream.url_for(upstream.PLACES_NEW_HOST, '/v1/places:searchNearby')
+    body = {
+        "languageCode": "",
+        "regionCode": "",
+        "includedTypes": included_types,
+        "excludedTypes": [],
+        "includedPrimaryTypes": [],
+        "excludedPrimaryTypes": [],
+        "maxResultCount": MAX_RESULT_COUNT,
+        "locationRestriction": {
+            "circle": {
+                "center": {
+                    "latitude": latitude,
+                    "longitude": longitude
+                },
+                "radius": SEARCH_RADIUS_METERS
+            }
+        },
+        "rankPreference": 0
+    }
+    return url, _places_headers('nearby_search'), body
+
+
+def text_search_request(search_query, latitude, longitude):
+    """
+    Return (url, headers, body) for a places:searchText call.
+    """
+    url = upstream.url_for(upstream.PLACES_NEW_HOST, '/v1/places:searchText')
+    body = {
+        "textQuery": search_query,
+        "languageCode": "en",
+        "regionCode": "",
+        "rankPreference": 0,
+        "maxResultCount": MAX_RESULT_COUNT,
+        "locationBias": {
+            "circle": {
+                "center": {
+                    "latitude": latitude,
+                    "longitude": longitude
+                },
+                "radius": SEARCH_RADIUS_METERS
+            }
+        }
+    }
+    return url, _places_headers('text_search'), body
+
+
+def upstream_error_detail(status_code, parse_json, text):
+    """
+    Build the error message for a non-200 places response.
+    """
+    error_detail = ""
+    try:
+        error_content = parse_json()
+        if 'message' in error_content:
+            error_detail = f" Details: {error_content['message']}"
+        elif 'error' in error_content:
+            error_detail = f" Details: {error_content['error']}"
+    except Exception:
+        # If we can't parse the JSON, include the raw content
+        error_detail = f" Raw response: {text[:200]}"
+    return f'Search API error (status {status_code}){error_detail}'
+
+
+# Result processing --------------------------------------------------------
+
+def merge_shard_results(outcomes):
+    """
+    Merge searchNearby payloads from type shards, dropping duplicate places
+    (by place id). Failed shards (exceptions) are skipped; if every shard
+    failed, the first error is raised.
+    """
+    payloads = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+    if not payloads:
+        raise outcomes[0]
+
+    places = []
+    seen = set()
+    for payload in payloads:
+        for place in payload.get('places', []):
+            key = place.get('id') or (place.get('displayName', {}).get('text'), place.get('formattedAddress'))
+            if key in seen:
+                continue
+            seen.add(key)
+            places.append(place)
+    return {'places': places} if places else payloads[0]
+
+
+def places_to_providers(places):
+    """
+    Convert raw Places API results into provider dicts. Distance and
+    rank_score are filled in by ranking.rank_providers.
+    """
+    providers = []
+    for place in places:
+        # Skip places without ratings for better recommendations
+        if 'rating' not in place:
+            continue
+
+        provider = {
+            'place_id': place.get('id', ''),
+            'name': place.get('displayName', {}).get('text', 'Unknown Provider'),
+            'rating': place.get('rating', 0),
+            'address': place.get('formattedAddress', 'Address not available'),
+            'phone_number': place.get('internationalPhoneNumber') or place.get('nationalPhoneNumber') or NO_PHONE,
+            'website': place.get('websiteUri', 'No website available'),
+            'types': place.get('types', []),
+            'user_rating_count': place.get('userRatingCount', 0),
+            'coordinates': {
+                'lat': place.get('location', {}).get('latitude'),
+                'lng': place.get('location', {}).get('longitude')
+            }
+        }
+
+        # Extract any reviews if available
+        if 'reviews' in place and place['reviews']:
+            review = place['reviews'][0]
+            provider['description'] = review.get('text', {}).get('text', 'No description available')
+        else:
+            provider['description'] = 'No description available'
+
+        # Extract tags/keywords from the place types
+        provider['tags'] = [t.replace('_', ' ').title() for t in place.get('types', [])]
+
+        providers.append(provider)
+    return providers
@@ -0,0 +1,153 @@
+"""
+Vectorized provider ranking shared by every provider search path.
+
+Scores combine rating, review count and proximity:
+
+    score = w_rating * rating / 5
+          + w_reviews * min(review_count / REVIEW_COUNT_CAP, 1)
+          + w_proximity * (1 - min(distance / MAX_DISTANCE_KM, 1))
+
+Weights can be set per event category in LOCATION_SERVICE['RANKING_WEIGHTS'].
+Candidates without a rating or a distance score 0.
+
+NumPy's per-call overhead loses to a plain loop on short lists (a single
+upstream page is 15 places), so those take a pure-Python path with the
+same results; see `manage.py bench_ranking`.
+"""
+import math
+
+import numpy as np
+
+from .conf import location_setting
+
+EARTH_RADIUS_KM = 6371
+MAX_DISTANCE_KM = 15
+REVIEW_COUNT_CAP = 100
+TOP_PROVIDERS = 10
+
+# Fewer candidates than this are ranked without NumPy (crossover measured at ~30)
+VECTORIZE_MIN_CANDIDATES = 32
+
+DEFAULT_WEIGHTS = {'rating': 0.5, 'reviews': 0.3, 'proximity': 0.2}
+
+
+def weights_for_category(category=None):
+    configured = location_setting('RANKING_WEIGHTS')
+    weights = dict(DEFAULT_WEIGHTS)
+    weights.update(configured.get('default', {}))
+    if category:
+        weights.update(configured.get(category, {}))
+    return weights
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """
+    Great-circle distance in km from (lat, lng) to each of the points in the
+    arrays lats/lngs. Missing coordinates (NaN) give NaN.
+    """
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs) - np.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def score(ratings, review_counts, distances, weights=DEFAULT_WEIGHTS):
+    """
+    Combined score for arrays of candidates (see module docstring).
+    """
+    normalized_reviews = np.minimum(review_counts / REVIEW_COUNT_CAP, 1.0)
+    normalized_distance = 1.0 - np.minimum(distances / MAX_DISTANCE_KM, 1.0)
+    scores = (
+        ratings / 5 * weights['rating'] +
+        normalized_reviews * weights['reviews'] +
+        normalized_distance * weights['proximity']
+    )
+    unrankable = (ratings == 0) | np.isnan(distances) | (distances == 0)
+    return np.where(unrankable, 0.0, scores)
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first. Ties keep input order.
+    """
+    n = len(scores)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def _haversine_km_one(lat, lng, lat2, lng2):
+    lat1 = math.radians(lat)
+    lat2 = math.radians(lat2)
+    dlat = lat2 - lat1
+    dlng = math.radians(lng2) - math.radians(lng)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _score_one(rating, review_count, distance, weights):
+    if not rating or distance is None or distance == 0:
+        return 0.0
+    return (
+        rating / 5 * weights['rating'] +
+        min(review_count / REVIEW_COUNT_CAP, 1.0) * weights['reviews'] +
+        (1.0 - min(distance / MAX_DISTANCE_KM, 1.0)) * weights['proximity']
+    )
+
+
+def _rank_small(providers, latitude, longitude, weights, limit):
+    """
+    rank_providers for short lists, one provider at a time.
+    """
+    scores = []
+    for provider in providers:
+        lat = provider['coordinates'].get('lat')
+        lng = provider['coordinates'].get('lng')
+        distance = round(_haversine_km_one(latitude, longitude, lat, lng), 2) if lat and lng else None
+        provider['distance'] = distance
+        provider['rank_score'] = _score_one(
+            float(provider.get('rating') or 0), float(provider.get('user_rating_count') or 0), distance, weights,
+        )
+        scores.append(provider['rank_score'])
+    # sorted() is stable, so ties keep input order like top_k
+    order = sorted(range(len(providers)), key=lambda i: -scores[i])[:limit]
+    return [providers[i] for i in order]
+
+
+def _coordinate(provider, key):
+    value = provider['coordinates'].get(key)
+    return value if value else np.nan
+
+
+def rank_providers(providers, latitude, longitude, category=None, limit=TOP_PROVIDERS):
+    """
+    Fill in 'distance' and 'rank_score' for the best `limit` providers
+    (measured from latitude/longitude) and return them, best first.
+    """
+    if not providers:
+        return []
+    weights = weights_for_category(category)
+    if len(providers) < VECTORIZE_MIN_CANDIDATES:
+        return _rank_small(providers, latitude, longitude, weights, limit)
+
+    lats = np.fromiter((_coordinate(p, 'lat') for p in providers), dtype=float, count=len(providers))
+    lngs = np.fromiter((_coordinate(p, 'lng') for p in providers), dtype=float, count=len(providers))
+    ratings = np.fromiter((p.get('rating') or 0 for p in providers), dtype=float, count=len(providers))
+    review_counts = np.fromiter((p.get('user_rating_count') or 0 for p in providers), dtype=float, count=len(providers))
+
+    distances = np.round(haversine_km(latitude, longitude, lats, lngs), 2)
+    scores = score(ratings, review_counts, distances, weights)
+
+    ranked = []
+    for i in top_k(scores, limit).tolist():
+        provider = providers[i]
+        distance = distances[i]
+        provider['distance'] = None if np.isnan(distance) else distance.item()
+        provider['rank_score'] = scores[i].item()
+        ranked.append(provider)
+    return ranked
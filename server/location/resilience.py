@@ -0,0 +1,285 @@
+"""
+Outbound rate limiting and circuit breaking for upstream calls.
+
+- A token bucket caps calls made with our RapidAPI key, one token per
+  attempt, retries included. With
+  LOCATION_SERVICE['RATE_LIMIT_CACHE_ALIAS'] pointing at a cache shared by
+  all workers the bucket is global; otherwise each process has its own.
+- A circuit breaker per upstream host opens after BREAKER_FAILURE_THRESHOLD
+  consecutive failures (connection errors, 429, 5xx). While open, calls fail
+  immediately with UpstreamUnavailable instead of waiting on the upstream.
+  After BREAKER_RESET_TIMEOUT one trial call is let through (half-open); a
+  trial that reports no outcome within another BREAKER_RESET_TIMEOUT is
+  treated as lost and the next call becomes the trial.
+"""
+import asyncio
+import threading
+import time
+
+import requests
+from django.core.cache import caches
+
+from . import metrics
+from .conf import location_setting
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """
+    Raised before any network I/O when the breaker is open or the rate limit
+    is exhausted. Subclasses RequestException so existing 503 handling applies.
+    """
+
+
+# Rate limiting ------------------------------------------------------------
+
+class TokenBucket:
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, tokens, updated, now):
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def _take_local(self):
+        """
+        Take a token; returns 0 on success or the seconds until one is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = self._refill(self._tokens, self._updated, now)
+            self._updated = now
+            metrics.set_gauge('ratelimit_tokens', round(self._tokens, 2), bucket=self.name)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def _take_shared(self, alias):
+        shared = caches[alias]
+        state_key = f'location:ratelimit:{self.name}'
+        lock_key = f'{state_key}:lock'
+        # Short critical section guarded by an add()-based lock in the shared cache
+        deadline = time.monotonic() + 1
+        while not shared.add(lock_key, 1, timeout=5):
+            if time.monotonic() > deadline:
+                return 0.05
+            time.sleep(0.005)
+        try:
+            now = time.time()
+            tokens, updated = shared.get(state_key, (float(self.burst), now))
+            tokens = self._refill(tokens, updated, now)
+            metrics.set_gauge('ratelimit_tokens', round(tokens, 2), bucket=self.name)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            shared.set(state_key, (tokens, now), timeout=3600)
+            return wait
+        finally:
+            shared.delete(lock_key)
+
+    def _take(self):
+        alias = location_setting('RATE_LIMIT_CACHE_ALIAS')
+        return self._take_shared(alias) if alias else self._take_local()
+
+    def acquire(self, max_wait):
+        """
+        Block until a token is available, for at most max_wait seconds.
+        Returns False if the limit is still exhausted after that.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                metrics.increment('ratelimit_rejected_total', bucket=self.name)
+                return False
+            metrics.increment('ratelimit_waits_total', bucket=self.name)
+            time.sleep(wait)
+
+    async def acquire_async(self, max_wait):
+        """
+        acquire() for the event loop: waits with asyncio.sleep.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                metrics.increment('ratelimit_rejected_total', bucket=self.name)
+                return False
+            metrics.increment('ratelimit_waits_total', bucket=self.name)
+            await asyncio.sleep(wait)
+
+
+# Circuit breaking ---------------------------------------------------------
+
+class CircuitBreaker:
+    def __init__(self, name):
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._trial_in_flight = False
+        self._trial_started = 0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.set_gauge('breaker_state', _STATE_GAUGE[state], host=self.name)
+
+    def _shared_open_until(self):
+        alias = location_setting('RATE_LIMIT_CACHE_ALIAS')
+        if not alias:
+            return 0
+        return caches[alias].get(f'location:breaker:{self.name}', 0)
+
+    def allow(self):
+        reset_timeout = location_setting('BREAKER_RESET_TIMEOUT')
+        with self._lock:
+            now = time.time()
+            if self.state == CLOSED and self._shared_open_until() > now:
+                # Another worker opened the breaker for this host
+                self.opened_at = now
+                self._set_state(OPEN)
+            if self.state == OPEN:
+                if now - self.opened_at < reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight and now - self._trial_started < reset_timeout:
+                    return False
+                self._trial_in_flight = True
+                self._trial_started = now
+            return True
+
+    def release_trial(self):
+        """
+        Give back a half-open trial slot whose call ended without an
+        outcome (rate limited, cancelled or failed before sending).
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            threshold = location_setting('BREAKER_FAILURE_THRESHOLD')
+            if self.state == HALF_OPEN or self.failures >= threshold:
+                self.opened_at = time.time()
+                if self.state != OPEN:
+                    metrics.increment('breaker_opened_total', host=self.name)
+                self._set_state(OPEN)
+                alias = location_setting('RATE_LIMIT_CACHE_ALIAS')
+                if alias:
+                    caches[alias].set(
+                        f'location:breaker:{self.name}',
+                        self.opened_at + location_setting('BREAKER_RESET_TIMEOUT'),
+                        timeout=location_setting('BREAKER_RESET_TIMEOUT')
+                    )
+
+    def stats(self):
+        return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+_buckets = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def get_bucket(name):
+    with _registry_lock:
+        if name not in _buckets:
+            _buckets[name] = TokenBucket(
+                name,
+                rate=location_setting('RATE_LIMIT_PER_SECOND'),
+                burst=location_setting('RATE_LIMIT_BURST'),
+            )
+        return _buckets[name]
+
+
+def get_breaker(host):
+    with _registry_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def _check_breaker(host):
+    breaker = get_breaker(host)
+    if not breaker.allow():
+        metrics.increment('upstream_rejected_total', host=host, reason='breaker_open')
+        raise UpstreamUnavailable(f'Upstream {host} is temporarily unavailable (circuit open)')
+    return breaker
+
+
+def _rate_limit_exceeded(host, breaker):
+    breaker.release_trial()
+    metrics.increment('upstream_rejected_total', host=host, reason='rate_limited')
+    return UpstreamUnavailable('Upstream rate limit exceeded, try again shortly')
+
+
+def before_call(host, rate_limited):
+    """
+    Check the breaker (and the rate limit for calls using our RapidAPI key)
+    before an upstream call. Raises UpstreamUnavailable to fail fast.
+    """
+    breaker = _check_breaker(host)
+    if rate_limited and not get_bucket('rapidapi').acquire(location_setting('RATE_LIMIT_MAX_WAIT')):
+        raise _rate_limit_exceeded(host, breaker)
+
+
+async def before_call_async(host, rate_limited):
+    breaker = _check_breaker(host)
+    if rate_limited and not await get_bucket('rapidapi').acquire_async(location_setting('RATE_LIMIT_MAX_WAIT')):
+        raise _rate_limit_exceeded(host, breaker)
+
+
+def acquire_retry(rate_limited):
+    """
+    Take a rate-limit token for a retry of a call that already passed
+    before_call. False means the limit is exhausted and the caller should
+    stop retrying and keep the outcome it has.
+    """
+    return not rate_limited or get_bucket('rapidapi').acquire(location_setting('RATE_LIMIT_MAX_WAIT'))
+
+
+async def acquire_retry_async(rate_limited):
+    return not rate_limited or await get_bucket('rapidapi').acquire_async(location_setting('RATE_LIMIT_MAX_WAIT'))
+
+
+def after_call(host, status_code=None, error=None):
+    """
+    Record the outcome of an upstream call.
+    """
+    metrics.increment('upstream_calls_total', host=host, status=status_code or 'error')
+    breaker = get_breaker(host)
+    if error is not None or status_code == 429 or (status_code or 0) >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def resilience_stats():
+    return {
+        'breakers': {host: breaker.stats() for host, breaker in _breakers.items()},
+    }
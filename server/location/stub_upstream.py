@@ -0,0 +1,177 @@
+"""
+A local stand-in for the RapidAPI/ipinfo upstreams, for benchmarks and load tests.
+
+Point the location app at it with LOCATION_SERVICE['UPSTREAM_BASE_URL'].
+"""
+import hashlib
+import json
+import multiprocessing
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def _seed(text):
+    return int(hashlib.md5(text.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def fake_places(seed_text, lat=40.7128, lng=-74.0060, count=15):
+    seed = _seed(seed_text)
+    places = []
+    for i in range(count):
+        n = (seed + i * 7919) % 10000
+        places.append({
+            'id': f'stub-{seed}-{i}',
+            'displayName': {'text': f'Stub Provider {n}'},
+            'formattedAddress': f'{n} Stub Street',
+            'rating': 3 + (n % 20) / 10,
+            'userRatingCount': n % 500,
+            'internationalPhoneNumber': f'+1 555-{n:04d}',
+            'websiteUri': f'https://provider-{n}.example.com',
+            'types': ['event_venue', 'restaurant'][: 1 + n % 2],
+            'location': {
+                'latitude': lat + ((n % 200) - 100) / 1000,
+                'longitude': lng + ((n % 300) - 150) / 1000,
+            },
+            # Bulky fields the real API returns for a "*" field mask
+            'reviews': [
+                {'rating': 5 - r % 3, 'text': {'text': f'Review {r} of provider {n}. ' * 8}}
+                for r in range(5)
+            ],
+            'photos': [
+                {'name': f'places/stub-{seed}-{i}/photos/{p}', 'widthPx': 4032, 'heightPx': 3024}
+                for p in range(10)
+            ],
+            'regularOpeningHours': {
+                'weekdayDescriptions': [f'Day {d}: 9:00 AM - 10:00 PM' for d in range(7)],
+            },
+            'addressComponents': [
+                {'longText': part, 'shortText': part, 'types': ['route']}
+                for part in (f'{n}', 'Stub Street', 'Stub City', 'Stub County', 'US')
+            ],
+        })
+    return places
+
+
+def apply_field_mask(places, mask):
+    """
+    Trim places to the requested "places.<field>" paths, like the real API.
+    """
+    if not mask or mask.strip() == '*':
+        return places
+    fields = {path.strip().split('.')[1] for path in mask.split(',') if path.strip().startswith('places.')}
+    return [{key: value for key, value in place.items() if key in fields} for place in places]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path.endswith('/geocode/json'):
+            seed = _seed(query.get('address', ''))
+            self._send_json({'status': 'OK', 'results': [{
+                'formatted_address': query.get('address', '') or 'Stub City',
+                'geometry': {'location': {
+                    'lat': 40 + (seed % 1000) / 1000,
+                    'lng': -74 + (seed % 1000) / 1000,
+                }},
+            }]})
+        elif url.path.endswith('/queryautocomplete/json'):
+            text = query.get('input', '')
+            self._send_json({'status': 'OK', 'predictions': [
+                {'place_id': f'{text}-{i}', 'description': f'{text} Place {i}',
+                 'structured_formatting': {'main_text': f'{text} Place {i}'}}
+                for i in range(5)
+            ]})
+        elif url.path.endswith('/json'):  # ipinfo.io, with or without an IP
+            self._send_json({'loc': '40.7128,-74.0060', 'city': 'New York', 'region': 'NY', 'country': 'US'})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        time.sleep(self.server.delay)
+        body = self._read_json()
+        circle = (body.get('locationRestriction') or body.get('locationBias') or {}).get('circle', {})
+        center = circle.get('center', {})
+        seed_text = body.get('textQuery') or ','.join(body.get('includedTypes', []))
+        places = fake_places(
+            seed_text,
+            center.get('latitude', 40.7128),
+            center.get('longitude', -74.0060),
+            body.get('maxResultCount', 15),
+        )
+        self._send_json({'places': apply_field_mask(places, self.headers.get('X-Goog-FieldMask'))})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def _serve(host, port, delay, ready):
+    server = StubServer((host, port), StubHandler)
+    server.delay = delay
+    ready.put(server.server_address[:2])
+    server.serve_forever()
+
+
+class StubUpstream:
+    """
+    Run the stub server in a child process, so it does not compete with the
+    code under test for the GIL:
+
+        with StubUpstream(delay=0.05) as stub:
+            ... LOCATION_SERVICE['UPSTREAM_BASE_URL'] = stub.url ...
+    """
+
+    def __init__(self, delay=0.0, host='127.0.0.1', port=0):
+        self.delay = delay
+        self.host = host
+        self.port = port
+        self.process = None
+        self.address = None
+
+    @property
+    def url(self):
+        host, port = self.address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        ready = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_serve, args=(self.host, self.port, self.delay, ready), daemon=True
+        )
+        self.process.start()
+        self.address = ready.get(timeout=10)
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
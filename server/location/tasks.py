@@ -0,0 +1,11 @@
+"""
+Background jobs of the location app, run by `manage.py runworker`.
+"""
+from jobs.queue import task
+
+from .prefetch import warm_provider_cache
+
+
+@task(max_attempts=2)
+def prefetch_providers(address, category):
+    warm_provider_cache(address, category)
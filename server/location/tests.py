@@ -1,3 +1,1031 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import aiohttp
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from benchmarks.seed import PLACE_TYPES, seed
+from events.models import Category, Provider
+
+from . import aio, async_views, cassette, ipgeo, metrics, prefetch, ranking, resilience, tasks, upstream
+from .aio import UpstreamResponse
+from .cache import (
+    PrefixIndex, aget_cached_nearby, astore_nearby, autocomplete_index, clear_geocode_cache, clear_nearby_cache,
+    get_cached_nearby, nearby_cache_key, store_nearby,
+)
+from .categories import categories_for_type, get_category_types, invalidate_category_types
+from .coalesce import AsyncSingleFlight, _shared_call, _shared_key, coalesce
+from .local_index import has_local_coverage, search_local_providers
+from .models import GeocodeCacheEntry
+from .providers import (
+    ERROR_GEOCODE, FIELD_MASK_PROFILES, field_mask, geocode_request, merge_shard_results, nearby_search_request,
+    places_to_providers, shard_types, text_search_request,
+)
+from .stub_upstream import StubUpstream, fake_places
+from .upstream import retry_delay, spends_rapidapi_quota
+from .views import geocode_address
+
+
+class RecordingPlace(dict):
+    """
+    A place dict that records which top-level fields are read.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read = set()
+
+    def __getitem__(self, key):
+        self.read.add(key)
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.read.add(key)
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        self.read.add(key)
+        return super().get(key, default)
+
+
+class FieldMaskProfileTests(SimpleTestCase):
+    def _fields_read(self):
+        places = [RecordingPlace(place) for place in fake_places('field-mask')]
+        places.append(RecordingPlace({'rating': 4.0}))  # Sparse place: exercises the fallbacks
+        places_to_providers(places)
+        return set().union(*(place.read for place in places))
+
+    def test_profiles_cover_every_field_read(self):
+        fields_read = self._fields_read()
+        for profile, fields in FIELD_MASK_PROFILES.items():
+            with self.subTest(profile=profile):
+                missing = fields_read - set(fields)
+                self.assertFalse(missing, f"places_to_providers reads {sorted(missing)} "
+                                          f"but the '{profile}' field mask does not request them")
+
+    def test_profiles_request_only_fields_read(self):
+        fields_read = self._fields_read()
+        for profile, fields in FIELD_MASK_PROFILES.items():
+            with self.subTest(profile=profile):
+                self.assertFalse(set(fields) - fields_read)
+
+    def test_requests_use_their_profile(self):
+        _, nearby_headers, _ = nearby_search_request(['restaurant'], 40.7, -74.0)
+        _, text_headers, _ = text_search_request('dj', 40.7, -74.0)
+        self.assertEqual(nearby_headers['X-Goog-FieldMask'], field_mask('nearby_search'))
+        self.assertEqual(text_headers['X-Goog-FieldMask'], field_mask('text_search'))
+        self.assertNotIn('*', nearby_headers['X-Goog-FieldMask'])
+
+
+class ShardTests(SimpleTestCase):
+    types = ['event_venue', 'restaurant', 'bar', 'cafe', 'florist', 'bakery', 'store']
+
+    def test_shard_types(self):
+        self.assertEqual(shard_types(self.types, 0), [self.types])
+        self.assertEqual(shard_types(self.types, 7), [self.types])
+        # Near-equal contiguous shards rather than 3 + 3 + 1
+        self.assertEqual(shard_types(self.types, 3), [self.types[:3], self.types[3:5], self.types[5:]])
+        self.assertEqual(shard_types(self.types, 4), [self.types[:4], self.types[4:]])
+
+    def test_merge_drops_duplicate_places(self):
+        first = {'places': [{'id': 'a'}, {'id': 'b'}]}
+        second = {'places': [{'id': 'b'}, {'id': 'c'}]}
+        self.assertEqual(merge_shard_results([first, second]), {'places': [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}]})
+
+    def test_merge_skips_failed_shards(self):
+        merged = merge_shard_results([requests.ConnectionError('down'), {'places': [{'id': 'a'}]}])
+        self.assertEqual(merged, {'places': [{'id': 'a'}]})
+
+    def test_merge_raises_when_every_shard_failed(self):
+        first, second = requests.ConnectionError('down'), requests.Timeout('slow')
+        with self.assertRaises(requests.ConnectionError):
+            merge_shard_results([first, second])
+
+
+class StubUpstreamTestCase(TestCase):
+    """
+    Logged-in client, empty location caches and upstream calls routed to a StubUpstream.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='batcher', email='batcher@example.com', password='pw'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        clear_geocode_cache()
+        clear_nearby_cache()
+        self.addCleanup(clear_geocode_cache)
+        self.addCleanup(clear_nearby_cache)
+        self.stub = StubUpstream()
+        self.stub.start()
+        self.addCleanup(self.stub.stop)
+        overrides = override_settings(LOCATION_SERVICE={**settings.LOCATION_SERVICE, 'UPSTREAM_BASE_URL': self.stub.url})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+
+class AsyncViewsTests(StubUpstreamTestCase):
+    def _post(self, url, body):
+        response = self.client.post(url, body, content_type='application/json')
+        return response.status_code, response.json()
+
+    def test_async_views_answer_like_the_sync_ones(self):
+        location = {'description': 'Rue de Rivoli 99, Paris'}
+        for path, body in (
+            ('providers/', {'event_name': 'Gig', 'event_category': 'Music', 'event_location': location}),
+            ('search-providers/', {'search_query': 'dj', 'event_location': location}),
+        ):
+            with self.subTest(path):
+                clear_geocode_cache()
+                clear_nearby_cache()
+                async_status, async_payload = self._post(f'/api/location/async/{path}', body)
+                self.assertEqual(async_status, 200)
+                self.assertEqual(len(async_payload['service_providers']), 10)
+                self.assertTrue(all(p['place_id'].startswith('stub-') for p in async_payload['service_providers']))
+                self.assertEqual(self._post(f'/api/location/{path}', body), (async_status, async_payload))
+
+    def test_async_views_validate_like_the_sync_ones(self):
+        self.assertEqual(self._post('/api/location/async/providers/', {'event_category': 'Music'}),
+                         (400, {'error': 'Event location is required'}))
+        self.assertEqual(self._post('/api/location/async/search-providers/', {'event_location': {}}),
+                         (400, {'error': 'Search query is required'}))
+        self.client.logout()
+        self.assertEqual(self.client.post('/api/location/async/providers/', {}).status_code, 401)
+
+
+class BatchProvidersTests(StubUpstreamTestCase):
+
+    def test_malformed_items_fail_alone(self):
+        items = [
+            {'id': 'ok', 'event_category': 'Music', 'event_location': {'description': 'Paris'}},
+            {'id': 'string', 'event_category': 'Music', 'event_location': 'Paris'},
+            {'id': 'blank', 'event_category': 'Music', 'event_location': {'description': '  '}},
+            {'id': 'query', 'search_query': ['dj'], 'event_location': {'description': 'Paris'}},
+            'not an object',
+        ]
+        response = self.client.post('/api/location/providers/batch/', {'items': items},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [200, 400, 400, 400, 400])
+        self.assertTrue(results[0]['service_providers'])
+        self.assertEqual([result.get('id') for result in results], ['ok', 'string', 'blank', 'query', None])
+
+
+    def test_shared_geocodes_and_searches_run_once(self):
+        paris, lyon = {'description': 'Paris'}, {'description': 'Lyon'}
+        items = [
+            {'id': 1, 'event_category': 'Music', 'event_location': paris},
+            {'id': 2, 'event_category': 'Music', 'event_location': {'description': '  Paris '}},
+            {'id': 3, 'event_category': 'Music', 'event_location': lyon},
+            {'id': 4, 'search_query': 'DJ', 'event_location': paris},
+            {'id': 5, 'search_query': 'dj ', 'event_location': paris},
+        ]
+        with mock.patch.object(aio, 'geocode_address', wraps=aio.geocode_address) as geocode, \
+                mock.patch.object(async_views, '_run_search', wraps=async_views._run_search) as search:
+            response = self.client.post('/api/location/providers/batch/', {'items': items},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([(result['id'], result['status']) for result in results], [(i, 200) for i in range(1, 6)])
+        self.assertEqual(sorted(call.args[0] for call in geocode.await_args_list), ['Lyon', 'Paris'])
+        self.assertEqual(search.await_count, 3)  # Paris and Lyon nearby, 'dj' in Paris
+        self.assertEqual(results[0]['service_providers'], results[1]['service_providers'])
+        self.assertEqual(results[3]['service_providers'], results[4]['service_providers'])
+
+@override_settings(LOCATION_SERVICE={'UPSTREAM_RETRY_AFTER_MAX': 3, 'UPSTREAM_BACKOFF_FACTOR': 0.5})
+class RetryAfterCapTests(SimpleTestCase):
+    def test_long_retry_after_is_capped(self):
+        response = UpstreamResponse(429, {'Retry-After': '3600'}, b'')
+        self.assertEqual(retry_delay(response, 0), 3)
+
+    def test_short_retry_after_is_kept(self):
+        response = requests.Response()
+        response.headers['retry-after'] = '1'
+        self.assertEqual(retry_delay(response, 0), 1)
+
+    def test_backoff_without_retry_after(self):
+        self.assertEqual([retry_delay(None, attempt) for attempt in range(3)], [0.5, 1, 2])
+
+
+@override_settings(LOCATION_SERVICE={'UPSTREAM_MAX_RETRIES': 2, 'UPSTREAM_BACKOFF_FACTOR': 0})
+class RetryRateLimitTests(SimpleTestCase):
+    url = 'https://quota-host/maps'
+    headers = {'X-RapidAPI-Key': 'secret'}
+
+    def setUp(self):
+        self.bucket = mock.Mock()
+        self.bucket.acquire.return_value = True
+        self.bucket.acquire_async = mock.AsyncMock(return_value=True)
+        for patcher in (
+            mock.patch.object(resilience, 'get_bucket', return_value=self.bucket),
+            mock.patch.dict(resilience._breakers),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _sync(self, *statuses):
+        session = mock.Mock()
+        session.request.side_effect = [mock.Mock(status_code=code, headers={}) for code in statuses]
+        with mock.patch.object(upstream, 'get_session', return_value=session):
+            response = upstream.get(self.url, headers=self.headers)
+        return response.status_code, session.request.call_count
+
+    def test_every_sync_attempt_takes_a_token(self):
+        self.assertEqual(self._sync(429, 503, 200), (200, 3))
+        self.assertEqual(self.bucket.acquire.call_count, 3)
+
+    def test_sync_retries_stop_when_the_limit_is_exhausted(self):
+        self.bucket.acquire.side_effect = [True, True, False]
+        self.assertEqual(self._sync(429, 429, 200), (429, 2))
+
+    def test_every_async_attempt_takes_a_token(self):
+        send = mock.AsyncMock(side_effect=[
+            aiohttp.ClientConnectionError(), UpstreamResponse(429, {}, b''), UpstreamResponse(200, {}, b'{}'),
+        ])
+        with mock.patch.object(aio, '_send', send):
+            response = asyncio.run(aio.get(self.url, headers=self.headers))
+        self.assertEqual((response.status_code, send.call_count), (200, 3))
+        self.assertEqual(self.bucket.acquire_async.call_count, 3)
+
+
+class AsyncSingleFlightTests(SimpleTestCase):
+    def test_followers_survive_a_cancelled_leader(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            return value
+
+        async def scenario():
+            leader = asyncio.create_task(flight.do('key', fetch, 'leader'))
+            await asyncio.sleep(0)
+            followers = [asyncio.create_task(flight.do('key', fetch, 'follower')) for _ in range(3)]
+            await asyncio.sleep(0)
+            leader.cancel()
+            results = await asyncio.wait_for(asyncio.gather(*followers), timeout=2)
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return results
+
+        results = asyncio.run(scenario())
+        # One follower took over the call and shared it with the other two
+        self.assertEqual(results, ['follower'] * 3)
+        self.assertEqual(calls, ['leader', 'follower'])
+
+    def test_leader_failure_reaches_followers(self):
+        flight = AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError('upstream down')
+
+        async def scenario():
+            return await asyncio.gather(*(flight.do('key', fail) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.calls, 1)
+
+
+class SharedCallTests(SimpleTestCase):
+    def tearDown(self):
+        caches['default'].clear()
+
+    def test_published_result_is_used_without_calling(self):
+        key = ('geocode', 'paris')
+        caches['default'].set(f'location:coalesce:result:{_shared_key(key)}', 'published')
+
+        def fetch():
+            raise AssertionError('upstream should not be called')
+
+        self.assertEqual(_shared_call('default', key, fetch, (), {}), 'published')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_observation_above_last_bucket_renders(self):
+        metrics.observe('upstream_latency_ms', 20000, host='slow')
+        metrics.observe('upstream_latency_ms', 3, host='slow')
+        summary = metrics.snapshot()['histograms']['upstream_latency_ms{host="slow"}']
+        self.assertEqual(summary['buckets']['+Inf'], 2)
+        self.assertEqual(summary['p50'], 5)
+        self.assertEqual(summary['p99'], 10000)
+
+        admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass1234',
+        )
+        self.client.force_login(admin)
+        response = self.client.get('/api/location/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['histograms']['upstream_latency_ms{host="slow"}']['p99'], 10000)
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='timed', email='timed@example.com', password='pw')
+
+    def setUp(self):
+        clear_geocode_cache()
+        clear_nearby_cache()
+        metrics.reset()
+        self.addCleanup(clear_geocode_cache)
+        self.addCleanup(clear_nearby_cache)
+        self.addCleanup(metrics.reset)
+        self.client.force_login(self.user)
+
+    def _providers(self):
+        nearby = {'places': fake_places('timed', *PARIS)}
+        with mock.patch.object(upstream, 'get', return_value=fake_response(GEOCODE_OK)), \
+                mock.patch.object(upstream, 'post', return_value=fake_response(nearby)):
+            response = self.client.post('/api/location/providers/', {
+                'event_category': 'Music', 'event_location': {'description': 'Paris'},
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_stages_are_reported(self):
+        header = self._providers()['Server-Timing']
+        stages = [entry.split(';')[0] for entry in header.split(', ')]
+        self.assertEqual(stages, ['parse', 'geocode', 'local_index', 'upstream', 'rank', 'serialize', 'total'])
+        self.assertRegex(header, r'^parse;dur=\d+\.\d(, \w+;dur=\d+\.\d)*$')
+        histograms = metrics.snapshot()['histograms']
+        self.assertTrue(any('location_stage_duration_ms' in name and 'upstream' in name for name in histograms))
+
+    @override_settings(LOCATION_SERVICE={'SERVER_TIMING_ENABLED': False})
+    def test_header_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self._providers())
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(resilience.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_wait_for_refill(self):
+        bucket = resilience.TokenBucket('test', rate=10, burst=3)
+        self.assertEqual([bucket._take_local() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket._take_local(), 0.1)
+        self.now += 0.1
+        self.assertEqual(bucket._take_local(), 0)
+
+    def test_refill_is_capped_at_burst(self):
+        bucket = resilience.TokenBucket('test', rate=10, burst=2)
+        self.now += 60
+        self.assertEqual([bucket._take_local() for _ in range(2)], [0, 0])
+        self.assertGreater(bucket._take_local(), 0)
+
+    def test_acquire_rejects_beyond_max_wait(self):
+        bucket = resilience.TokenBucket('test', rate=1, burst=1)
+        self.assertTrue(bucket.acquire(max_wait=0))
+        self.assertFalse(bucket.acquire(max_wait=0.5))
+
+
+@override_settings(LOCATION_SERVICE={'BREAKER_FAILURE_THRESHOLD': 3, 'BREAKER_RESET_TIMEOUT': 30})
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(resilience.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = resilience.CircuitBreaker('test-host')
+
+    def _open(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self._open()
+        self.assertEqual(self.breaker.state, resilience.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_lets_one_trial_through(self):
+        self._open()
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, resilience.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, resilience.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        self._open()
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, resilience.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_lost_trial_is_replaced_after_deadline(self):
+        self._open()
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.now += 1
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+    def test_cancelled_trial_call_frees_the_slot(self):
+        async def hang(*args, **kwargs):
+            await asyncio.Event().wait()
+
+        async def scenario():
+            call = asyncio.create_task(aio.get('http://trial-host/maps'))
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.breaker.state, resilience.HALF_OPEN)
+            call.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await call
+
+        self._open()
+        self.now += 30
+        with mock.patch.dict(resilience._breakers, {'trial-host': self.breaker}), \
+                mock.patch.object(aio, '_send', hang):
+            asyncio.run(scenario())
+        self.assertTrue(self.breaker.allow())
+
+    def test_interrupted_sync_trial_call_frees_the_slot(self):
+        session = mock.Mock()
+        session.request.side_effect = KeyboardInterrupt
+        self._open()
+        self.now += 30
+        with mock.patch.dict(resilience._breakers, {'trial-host': self.breaker}), \
+                mock.patch.object(upstream, 'get_session', return_value=session), \
+                self.assertRaises(KeyboardInterrupt):
+            upstream.get('http://trial-host/maps')
+        self.assertTrue(self.breaker.allow())
+
+
+class RateLimitScopeTests(SimpleTestCase):
+    headers = {'X-RapidAPI-Key': 'secret', 'X-RapidAPI-Host': 'places'}
+
+    def test_rapidapi_calls_are_rate_limited(self):
+        self.assertTrue(spends_rapidapi_quota(self.headers))
+        self.assertFalse(spends_rapidapi_quota({'Accept': 'application/json'}))
+
+    @override_settings(LOCATION_SERVICE={'UPSTREAM_BASE_URL': 'http://127.0.0.1:9'})
+    def test_stub_calls_are_not_rate_limited(self):
+        self.assertFalse(spends_rapidapi_quota(self.headers))
+
+
+class SearchLocationsCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='searcher', email='searcher@example.com', password='pw'
+        )
+
+    def setUp(self):
+        autocomplete_index.clear()
+        self.addCleanup(autocomplete_index.clear)
+        self.client.force_login(self.user)
+
+    def _search(self, payload):
+        response = mock.Mock()
+        response.json.return_value = payload
+        with mock.patch.object(upstream, 'get', return_value=response) as get:
+            result = self.client.get('/api/location/search-locations/', {'query': 'Par'})
+        self.assertEqual(result.status_code, 200)
+        return get.call_count
+
+    def test_ok_answers_are_cached(self):
+        payload = {'status': 'OK', 'predictions': [{'place_id': 'p1', 'description': 'Paris, France'}]}
+        self.assertEqual(self._search(payload), 1)
+        self.assertEqual(self._search(payload), 0)
+
+    def test_error_statuses_are_not_cached(self):
+        payload = {'status': 'OVER_QUERY_LIMIT', 'predictions': []}
+        self.assertEqual(self._search(payload), 1)
+        self.assertEqual(self._search(payload), 1)
+
+
+def fake_response(payload):
+    response = mock.Mock()
+    response.json.return_value = payload
+    return response
+
+
+GEOCODE_OK = {'status': 'OK', 'results': [{
+    'formatted_address': 'Paris, France', 'geometry': {'location': {'lat': 48.8566, 'lng': 2.3522}},
+}]}
+PARIS = (48.8566, 2.3522)
+
+
+class GeocodeCacheTests(TestCase):
+    def setUp(self):
+        clear_geocode_cache()
+        self.addCleanup(clear_geocode_cache)
+
+    def _geocode(self, address, payload=GEOCODE_OK, **patch_options):
+        patch_options.setdefault('return_value', fake_response(payload))
+        with mock.patch.object(upstream, 'get', **patch_options) as get:
+            result = geocode_address(address)
+        return result, get.call_count
+
+    def test_miss_then_hit(self):
+        result, calls = self._geocode('Paris, France')
+        self.assertEqual((result['lat'], result['lng'], calls), (48.8566, 2.3522, 1))
+        # Normalized addresses share the entry
+        result, calls = self._geocode('  PARIS ,france ')
+        self.assertEqual((result['formatted_address'], calls), ('Paris, France', 0))
+
+    def test_database_tier_survives_process_cache(self):
+        self._geocode('Paris, France')
+        clear_geocode_cache()
+        result, calls = self._geocode('Paris, France')
+        self.assertEqual((result['lat'], calls), (48.8566, 0))
+        self.assertEqual(GeocodeCacheEntry.objects.get().hit_count, 1)
+
+    def test_fallback_expires_quickly_and_is_replaced(self):
+        with self.assertLogs('location.views', 'WARNING'):
+            result, calls = self._geocode('Nowhere', side_effect=requests.ConnectionError('down'))
+        self.assertEqual((result, calls), (ERROR_GEOCODE, 1))
+        entry = GeocodeCacheEntry.objects.get()
+        self.assertTrue(entry.is_fallback)
+        self.assertLess(entry.expires_at, timezone.now() + timedelta(minutes=6))
+
+        # Cached while it lasts; a real answer replaces it
+        self.assertEqual(self._geocode('Nowhere')[1], 0)
+        GeocodeCacheEntry.objects.update(expires_at=timezone.now())
+        clear_geocode_cache()
+        result, calls = self._geocode('Nowhere')
+        self.assertEqual((result['lat'], calls), (48.8566, 1))
+        self.assertFalse(GeocodeCacheEntry.objects.get().is_fallback)
+
+    def test_fail_fast_is_not_cached_as_fallback(self):
+        with self.assertRaises(resilience.UpstreamUnavailable):
+            self._geocode('Paris, France', side_effect=resilience.UpstreamUnavailable('circuit open'))
+        self.assertFalse(GeocodeCacheEntry.objects.exists())
+        result, calls = self._geocode('Paris, France')
+        self.assertEqual((result['lat'], calls), (48.8566, 1))
+
+    def test_views_answer_fail_fast_with_503(self):
+        user = get_user_model().objects.create_user(username='geocoder', email='geocoder@example.com', password='pw')
+        self.client.force_login(user)
+        side_effect = resilience.UpstreamUnavailable('circuit open')
+        with mock.patch.object(upstream, 'get', side_effect=side_effect):
+            response = self.client.post('/api/location/providers/', {
+                'event_category': 'Music', 'event_location': {'description': 'Rue de Rivoli 99, Paris'},
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+
+        with mock.patch.object(aio, 'geocode_address', mock.AsyncMock(side_effect=side_effect)):
+            result, error = asyncio.run(async_views._resolve_location({'description': 'Paris'}))
+        self.assertEqual((result, error.status_code), (None, 503))
+
+
+class NearbyCacheTests(TestCase):
+    nearby = {'places': fake_places('nearby', *PARIS)}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='nearby', email='nearby@example.com', password='pw')
+
+    def setUp(self):
+        clear_nearby_cache()
+        self.addCleanup(clear_nearby_cache)
+        self.client.force_login(self.user)
+
+    def test_key_is_the_geohash_cell(self):
+        key = nearby_cache_key(['restaurant', 'bar'], *PARIS, 15000)
+        # ~60m away, same ~1.2km x 0.6km cell; type order does not matter
+        self.assertEqual(nearby_cache_key(['bar', 'restaurant'], 48.8570, 2.3530, 15000), key)
+        # ~700m east, next cell
+        self.assertNotEqual(nearby_cache_key(['restaurant', 'bar'], PARIS[0], PARIS[1] + 0.01, 15000), key)
+        self.assertNotEqual(nearby_cache_key(['restaurant'], *PARIS, 15000), key)
+        self.assertNotEqual(nearby_cache_key(['restaurant', 'bar'], *PARIS, 5000), key)
+
+    def _providers(self, lat, lng):
+        geocode = {'lat': lat, 'lng': lng, 'formatted_address': 'Paris, France'}
+        with mock.patch('location.views.geocode_address', return_value=geocode):
+            response = self.client.post('/api/location/providers/', {
+                'event_category': 'Music', 'event_location': {'description': 'Paris'},
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return {provider['place_id']: provider for provider in response.json()['service_providers']}
+
+    def test_cached_payload_is_ranked_for_each_caller(self):
+        with mock.patch.object(upstream, 'post', return_value=fake_response(self.nearby)) as post:
+            first = self._providers(*PARIS)
+            second = self._providers(48.8570, 2.3530)
+        self.assertEqual(post.call_count, 1)
+        # Same places, each ranked against the caller's own coordinates
+        self.assertEqual(first.keys(), second.keys())
+        for caller, providers in ((PARIS, first), ((48.8570, 2.3530), second)):
+            for provider in providers.values():
+                place = provider['coordinates']
+                expected = round(ranking._haversine_km_one(*caller, place['lat'], place['lng']), 2)
+                self.assertEqual(provider['distance'], expected)
+        self.assertNotEqual([p['distance'] for p in first.values()], [p['distance'] for p in second.values()])
+
+
+class CoalesceTests(SimpleTestCase):
+    def test_concurrent_identical_calls_share_one(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch(value):
+            calls.append(value)
+            started.set()
+            release.wait(2)
+            return value * 2
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(coalesce(('test', 'same'), fetch, 21)))
+            for _ in range(5)
+        ]
+        threads[0].start()
+        started.wait(2)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(calls, [21])
+        self.assertEqual(results, [42] * 5)
+
+    def test_different_keys_do_not_share(self):
+        self.assertEqual(coalesce(('test', 'a'), lambda: 'a'), 'a')
+        self.assertEqual(coalesce(('test', 'b'), lambda: 'b'), 'b')
+
+    def test_errors_are_not_cached(self):
+        def fail():
+            raise ValueError('upstream down')
+
+        with self.assertRaises(ValueError):
+            coalesce(('test', 'error'), fail)
+        self.assertEqual(coalesce(('test', 'error'), lambda: 'ok'), 'ok')
+
+
+def predictions(*descriptions):
+    return [{'id': str(i), 'description': description} for i, description in enumerate(descriptions)]
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex(max_bytes=10_000, ttl=60, page_size=5, min_derived=2)
+
+    def test_exact_hit_is_normalized(self):
+        self.index.set(None, 'Par', predictions('Paris, France'))
+        self.assertEqual(self.index.get(None, '  par '), predictions('Paris, France'))
+        self.assertIsNone(self.index.get((48.9, 2.4), 'par'))
+
+    def test_complete_shorter_prefix_answers(self):
+        self.index.set(None, 'pa', predictions('Paris, France', 'Palermo, Italy', 'Lapaz'))
+        self.assertEqual(self.index.get(None, 'pari'), predictions('Paris, France'))
+        self.assertEqual(self.index.stats()['derived_hits'], 1)
+
+    def test_truncated_prefix_needs_enough_matches(self):
+        full_page = predictions('Paris, France', 'Palermo, Italy', 'Panama', 'Paris, Texas', 'Pau')
+        self.index.set(None, 'pa', full_page)
+        self.assertEqual([p['description'] for p in self.index.get(None, 'paris')], ['Paris, France', 'Paris, Texas'])
+        self.assertIsNone(self.index.get(None, 'pale'))
+
+    def test_evicts_least_recently_used_by_size(self):
+        index = PrefixIndex(max_bytes=150, ttl=60)  # Room for two entries
+        index.set(None, 'a', predictions('A' * 30))
+        index.set(None, 'b', predictions('B' * 30))
+        index.get(None, 'a')
+        index.set(None, 'c', predictions('C' * 30))
+        self.assertIsNotNone(index.get(None, 'a'))
+        self.assertIsNone(index.get(None, 'b'))
+        self.assertLessEqual(index.stats()['bytes'], 150)
+
+    def test_entries_expire(self):
+        self.index.set(None, 'par', predictions('Paris'))
+        with mock.patch.object(time, 'monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(self.index.get(None, 'par'))
+
+
+
+@override_settings(LOCATION_SERVICE={'LOCAL_INDEX_MIN_RESULTS': 2})
+class LocalIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def provider(external_id, lat, lng, tags=('Event Venue',), rating=4.5, name=None, address=''):
+            return Provider.objects.create(
+                name=name or external_id, api_source=Provider.APISource.RAPIDAPI, external_id=external_id,
+                address=address, rating=rating, tags=list(tags), coordinates={'lat': lat, 'lng': lng},
+            )
+
+        provider('venue', PARIS[0] + 0.01, PARIS[1])
+        provider('restaurant', PARIS[0], PARIS[1] + 0.02, tags=('Restaurant',))
+        provider('unrated', PARIS[0], PARIS[1], rating=0)
+        provider('lyon', 45.7640, 4.8357)
+        provider('edge', PARIS[0] + 0.2, PARIS[1])  # ~22km north
+        provider('copy-1', PARIS[0], PARIS[1] - 0.01, name='Hall', address='1 Rue')
+        provider('copy-2', PARIS[0], PARIS[1] - 0.01, name='Hall', address='1 Rue')
+
+    def _search(self, **kwargs):
+        return search_local_providers(*PARIS, 15000, **kwargs)
+
+    def test_filters_by_radius_rating_and_type(self):
+        self.assertEqual(
+            sorted(result['place_id'] for result in self._search(place_types=['event_venue'])),
+            ['copy-1', 'venue'],
+        )
+        self.assertEqual([result['place_id'] for result in self._search(place_types=['restaurant'])], ['restaurant'])
+
+    def test_query_matches_name_and_tags(self):
+        self.assertEqual([result['name'] for result in self._search(query='hall venue')], ['Hall'])
+
+    def test_results_look_like_upstream_providers(self):
+        result, = self._search(place_types=['restaurant'])
+        self.assertEqual(result['types'], ['restaurant'])
+        self.assertEqual(result['phone_number'], 'No phone number available')
+        self.assertEqual(result['coordinates'], {'lat': PARIS[0], 'lng': PARIS[1] + 0.02})
+
+    def test_coverage_threshold(self):
+        self.assertTrue(has_local_coverage(self._search(place_types=['event_venue'])))
+        self.assertFalse(has_local_coverage(self._search(place_types=['restaurant'])))
+
+    @override_settings(LOCATION_SERVICE={'LOCAL_INDEX_ENABLED': False})
+    def test_disabled(self):
+        self.assertEqual(self._search(), [])
+
+
+class SeededCatalogueTests(TestCase):
+    def test_benchmark_providers_are_found_by_type(self):
+        seed(users=2, events=2, providers=10)
+        found = search_local_providers(*PARIS, 15000, place_types=PLACE_TYPES)
+        self.assertEqual(len(found), 2)  # Providers 0 and 5 are in Paris
+        self.assertTrue(all(tag in {'Event Venue', 'Restaurant', 'Catering Service', 'Store', 'Bar'}
+                            for result in found for tag in result['tags']))
+
+class IPGeoTests(SimpleTestCase):
+    rows = [
+        ('81.0.0.0', '81.255.255.255', 'Paris', 'Ile-de-France', 'FR', 48.8566, 2.3522),
+        ('8.8.8.0', '8.8.8.255', 'Mountain View', 'California', 'US', 37.386, -122.0838),
+        ('2a01:cb00::', '2a01:cbff:ffff:ffff:ffff:ffff:ffff:ffff', 'Lyon', 'Auvergne-Rhone-Alpes', 'FR', 45.764, 4.8357),
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'ip.bin')
+        self.assertEqual(ipgeo.build_table(self.rows, self.path), 3)
+        overrides = override_settings(LOCATION_SERVICE={'IP_GEO_TABLE_PATH': self.path})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_lookup(self):
+        self.assertEqual(ipgeo.locate_ip('81.2.3.4')['city'], 'Paris')
+        self.assertEqual(ipgeo.locate_ip('8.8.8.8')['country'], 'US')
+        self.assertEqual(ipgeo.locate_ip('2a01:cb01::1')['city'], 'Lyon')
+        self.assertIsNone(ipgeo.locate_ip('9.9.9.9'))
+        self.assertIsNone(ipgeo.locate_ip('80.255.255.255'))
+
+    def test_results_are_cached_per_prefix(self):
+        ipgeo.locate_ip('81.2.3.4')
+        with mock.patch.object(ipgeo.IPRangeTable, 'lookup') as lookup:
+            self.assertEqual(ipgeo.locate_ip('81.2.3.200')['city'], 'Paris')
+        lookup.assert_not_called()
+
+    def test_rebuilt_table_is_reloaded(self):
+        self.assertEqual(ipgeo.locate_ip('81.2.3.4')['city'], 'Paris')
+        ipgeo.build_table([('81.0.0.0', '81.255.255.255', 'Marseille', 'PACA', 'FR', 43.2965, 5.3698)], self.path)
+        with mock.patch.object(ipgeo, 'TABLE_CHECK_INTERVAL', 0):
+            self.assertEqual(ipgeo.locate_ip('81.2.3.4')['city'], 'Marseille')
+            self.assertIsNone(ipgeo.locate_ip('8.8.8.8'))
+
+
+class ClientIPTests(SimpleTestCase):
+    def _client_ip(self, forwarded_for=None, remote_addr='10.0.0.1'):
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded_for} if forwarded_for is not None else {}
+        return ipgeo.client_ip(RequestFactory().get('/', REMOTE_ADDR=remote_addr, **extra))
+
+    def test_forwarded_for_is_ignored_by_default(self):
+        self.assertEqual(self._client_ip('81.2.3.4'), '10.0.0.1')
+
+    @override_settings(LOCATION_SERVICE={'IP_GEO_TRUSTED_PROXIES': 1})
+    def test_one_trusted_proxy(self):
+        self.assertEqual(self._client_ip('81.2.3.4'), '81.2.3.4')
+        # A client-supplied entry sits left of the one our proxy appended
+        self.assertEqual(self._client_ip('6.6.6.6, 81.2.3.4'), '81.2.3.4')
+        self.assertEqual(self._client_ip(), '10.0.0.1')
+        self.assertIsNone(self._client_ip('not-an-ip'))
+
+    @override_settings(LOCATION_SERVICE={'IP_GEO_TRUSTED_PROXIES': 2})
+    def test_two_trusted_proxies(self):
+        self.assertEqual(self._client_ip('6.6.6.6, 81.2.3.4, 10.0.0.2'), '81.2.3.4')
+
+
+class CategoryTypesTests(TestCase):
+    def setUp(self):
+        invalidate_category_types()
+        self.addCleanup(invalidate_category_types)
+
+    def test_snapshot_is_reused(self):
+        Category.objects.create(name='Test Wedding', place_types=['test_venue', 'test_florist'])
+        self.assertEqual(get_category_types().by_category['Test Wedding'], ('test_venue', 'test_florist'))
+        with self.assertNumQueries(0):
+            self.assertEqual(categories_for_type('test_florist'), {'Test Wedding'})
+
+    def test_saving_or_deleting_a_category_invalidates(self):
+        category = Category.objects.create(name='Test Wedding', place_types=['test_venue'])
+        Category.objects.create(name='Test Party', place_types=['test_venue'])
+        self.assertEqual(categories_for_type('test_venue'), {'Test Wedding', 'Test Party'})
+
+        category.place_types = ['test_florist']
+        category.save()
+        self.assertEqual(categories_for_type('test_venue'), {'Test Party'})
+        self.assertEqual(categories_for_type('test_florist'), {'Test Wedding'})
+
+        category.delete()
+        self.assertEqual(categories_for_type('test_florist'), frozenset())
+
+    def test_snapshot_reloads_after_ttl(self):
+        get_category_types()
+        Category.objects.bulk_create([Category(name='Test Gala', place_types=['test_banquet_hall'])])  # No signal
+        self.assertEqual(categories_for_type('test_banquet_hall'), frozenset())
+        with override_settings(LOCATION_SERVICE={'CATEGORY_TYPES_TTL': timedelta(0)}):
+            self.assertEqual(categories_for_type('test_banquet_hall'), {'Test Gala'})
+
+
+@override_settings(LOCATION_SERVICE={'PREFETCH_ENABLED': True, 'PREFETCH_BACKEND': 'thread', 'PREFETCH_MAX_PENDING': 2})
+class PrefetchTests(SimpleTestCase):
+    def setUp(self):
+        self.executor = mock.Mock()
+        patcher = mock.patch.object(prefetch, '_get_executor', return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(prefetch._pending.clear)
+
+    def test_same_address_and_category_is_queued_once(self):
+        self.assertTrue(prefetch.prefetch_providers('Paris, France', 'Wedding'))
+        self.assertFalse(prefetch.prefetch_providers(' paris,  FRANCE', 'Wedding'))
+        self.assertTrue(prefetch.prefetch_providers('Paris, France', 'Party'))
+        self.assertEqual(self.executor.submit.call_count, 2)
+
+    def test_finished_job_can_be_queued_again(self):
+        prefetch.prefetch_providers('Paris, France', 'Wedding')
+        _, key, address, category = self.executor.submit.call_args.args
+        with mock.patch.object(prefetch, 'warm_provider_cache'):
+            prefetch._run(key, address, category)
+        self.assertTrue(prefetch.prefetch_providers('Paris, France', 'Wedding'))
+
+    def test_full_queue_drops(self):
+        prefetch.prefetch_providers('Paris', 'Wedding')
+        prefetch.prefetch_providers('Lyon', 'Wedding')
+        self.assertFalse(prefetch.prefetch_providers('Nice', 'Wedding'))
+
+    def test_disabled_or_without_address(self):
+        self.assertFalse(prefetch.prefetch_providers('', 'Wedding'))
+        with override_settings(LOCATION_SERVICE={'PREFETCH_ENABLED': False}):
+            self.assertFalse(prefetch.prefetch_providers('Paris', 'Wedding'))
+        self.executor.submit.assert_not_called()
+
+    @mock.patch.object(prefetch, '_warned', False)
+    def test_jobs_backend_needs_a_shared_nearby_cache(self):
+        with mock.patch.object(tasks.prefetch_providers, 'enqueue') as enqueue:
+            with override_settings(LOCATION_SERVICE={'PREFETCH_ENABLED': True, 'PREFETCH_BACKEND': 'jobs'}), \
+                    self.assertLogs('location.prefetch', 'WARNING'):
+                self.assertTrue(prefetch.prefetch_providers('Paris', 'Wedding'))
+            enqueue.assert_not_called()
+            self.assertEqual(self.executor.submit.call_count, 1)
+
+            with override_settings(LOCATION_SERVICE={
+                'PREFETCH_ENABLED': True, 'PREFETCH_BACKEND': 'jobs', 'NEARBY_CACHE_ALIAS': 'default',
+            }):
+                self.assertTrue(prefetch.prefetch_providers('Lyon', 'Wedding'))
+            enqueue.assert_called_once_with(args=['Lyon', 'Wedding'], unique=True)
+            self.assertEqual(self.executor.submit.call_count, 1)
+
+
+@override_settings(LOCATION_SERVICE={'NEARBY_CACHE_ALIAS': 'default'})
+class SharedNearbyCacheTests(SimpleTestCase):
+    payload = {'places': [{'id': 'shared'}]}
+
+    def setUp(self):
+        clear_nearby_cache()
+        self.addCleanup(clear_nearby_cache)
+        self.addCleanup(caches['default'].clear)
+
+    def test_results_stored_by_another_process_are_served(self):
+        store_nearby(['restaurant'], *PARIS, 15000, self.payload)
+        clear_nearby_cache()  # As seen from another process
+        self.assertEqual(get_cached_nearby(['restaurant'], *PARIS, 15000), self.payload)
+        self.assertEqual(asyncio.run(aget_cached_nearby(['restaurant'], *PARIS, 15000)), self.payload)
+
+    def test_async_store_and_shared_expiry(self):
+        asyncio.run(astore_nearby(['florist'], *PARIS, 15000, self.payload))
+        clear_nearby_cache()
+        with mock.patch.object(time, 'time', return_value=time.time() + 601):
+            self.assertIsNone(get_cached_nearby(['florist'], *PARIS, 15000))
+
+    def test_empty_results_are_not_shared(self):
+        store_nearby(['bakery'], *PARIS, 15000, {'places': []})
+        clear_nearby_cache()
+        self.assertIsNone(get_cached_nearby(['bakery'], *PARIS, 15000))
+
+
+class CassetteTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.stub = StubUpstream()
+        self.stub.start()
+        self.addCleanup(self.stub.stop)
+
+    def _settings(self, mode, **extra):
+        return override_settings(LOCATION_SERVICE={
+            'UPSTREAM_CASSETTE_MODE': mode, 'UPSTREAM_CASSETTE_DIR': self.directory, **extra,
+        })
+
+    def _geocode(self, address):
+        url, headers, params = geocode_request(address)
+        return upstream.get(url, headers=headers, params=params)
+
+    def test_record_then_replay_without_network(self):
+        with self._settings('record', UPSTREAM_BASE_URL=self.stub.url), override_settings(RAPIDAPI_KEY='secret-key'):
+            recorded = self._geocode('Paris')
+        recording, = os.listdir(self.directory)
+        with open(os.path.join(self.directory, recording), encoding='utf-8') as f:
+            self.assertNotIn('secret-key', f.read())
+
+        self.stub.stop()
+        # Recorded against the stub, replayed against the real host
+        with self._settings('replay'), mock.patch.object(upstream, 'get_session') as get_session:
+            replayed = self._geocode('Paris')
+        get_session.assert_not_called()
+        self.assertEqual((replayed.status_code, replayed.json()), (200, recorded.json()))
+
+    def test_async_replays_the_same_recording(self):
+        with self._settings('record', UPSTREAM_BASE_URL=self.stub.url):
+            recorded = self._geocode('Lyon')
+        url, headers, params = geocode_request('Lyon')
+        with self._settings('replay'):
+            replayed = asyncio.run(aio.get(url, headers=headers, params=params))
+        self.assertEqual(replayed.json(), recorded.json())
+
+    def test_replay_miss_raises(self):
+        with self._settings('replay'), self.assertRaises(cassette.CassetteMiss):
+            self._geocode('Unrecorded')
+
+
+class RankingTests(SimpleTestCase):
+    def _candidates(self, n):
+        candidates = []
+        for i in range(n):
+            candidates.append({
+                'name': f'Provider {i}',
+                'rating': [4.5, 0, 3.8, 4.5][i % 4],
+                'user_rating_count': (i * 37) % 250,
+                'coordinates': {'lat': PARIS[0] + (i % 7) / 100, 'lng': PARIS[1] - (i % 5) / 100},
+            })
+        candidates.append({'name': 'No coordinates', 'rating': 5, 'user_rating_count': 99, 'coordinates': {}})
+        candidates.append({'name': 'At the centre', 'rating': 5, 'coordinates': {'lat': PARIS[0], 'lng': PARIS[1]}})
+        return candidates
+
+    def _rank(self, candidates, threshold):
+        with mock.patch.object(ranking, 'VECTORIZE_MIN_CANDIDATES', threshold):
+            ranked = ranking.rank_providers(candidates, *PARIS, limit=len(candidates))
+        return [(p['name'], p['distance'], round(p['rank_score'], 9)) for p in ranked]
+
+    def test_small_and_vectorized_paths_agree(self):
+        for n in (3, 20, 40):
+            with self.subTest(n=n):
+                self.assertEqual(self._rank(self._candidates(n), 0), self._rank(self._candidates(n), 1000))
+
+    def test_unrankable_providers_score_zero(self):
+        ranked = {p[0]: p for p in self._rank(self._candidates(2), 1000)}
+        self.assertEqual(ranked['No coordinates'][1:], (None, 0.0))
+        self.assertEqual(ranked['At the centre'][1:], (0.0, 0.0))
+        self.assertEqual(ranked['Provider 1'][2], 0.0)
+
+    def test_limit_keeps_best_first(self):
+        ranked = ranking.rank_providers(self._candidates(12), *PARIS, limit=3)
+        self.assertEqual(len(ranked), 3)
+        scores = [p['rank_score'] for p in ranked]
+        self.assertEqual(scores, sorted(scores, reverse=True))
@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from . import cassette, resilience
+from .conf import location_setting
+
+logger = logging.getLogger(__name__)
+
+PLACES_HOST = 'google-map-places.p.rapidapi.com'
+PLACES_NEW_HOST = 'google-map-places-new-v2.p.rapidapi.com'
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _build_session():
+    # No adapter retries: request() retries each attempt through the rate limiter
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=location_setting('UPSTREAM_POOL_SIZE'),
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    return session
+
+
+def get_session(host):
+    """
+    Return the keep-alive session for a host, creating it on first use.
+    Each host gets its own connection pool.
+    """
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = _build_session()
+    return session
+
+
+def url_for(host, path):
+    """
+    Build the URL for an upstream endpoint. When UPSTREAM_BASE_URL is set
+    (e.g. a local stub for benchmarks), every host is routed there instead.
+    """
+    base_url = location_setting('UPSTREAM_BASE_URL')
+    if base_url:
+        return f"{base_url.rstrip('/')}{path}"
+    return f"https://{host}{path}"
+
+
+def rapidapi_headers(host, **extra):
+    headers = {
+        'X-RapidAPI-Host': host,
+        'X-RapidAPI-Key': settings.RAPIDAPI_KEY,
+    }
+    headers.update(extra)
+    return headers
+
+
+def spends_rapidapi_quota(headers):
+    """
+    Whether a call counts against our RapidAPI quota, and so goes through
+    the rate limiter: it carries the key and is not routed to UPSTREAM_BASE_URL.
+    """
+    if location_setting('UPSTREAM_BASE_URL'):
+        return False
+    return any(key.lower() == 'x-rapidapi-key' for key in (headers or {}))
+
+
+def retry_delay(response, attempt):
+    """
+    Seconds to wait before retry `attempt`: the upstream's Retry-After, capped
+    at UPSTREAM_RETRY_AFTER_MAX so it cannot hold a worker, else exponential backoff.
+    """
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), location_setting('UPSTREAM_RETRY_AFTER_MAX'))
+    return location_setting('UPSTREAM_BACKOFF_FACTOR') * (2 ** attempt)
+
+
+def _send_with_retries(host, method, url, rate_limited, **kwargs):
+    """
+    Send, retrying transport errors, 429 and 5xx up to UPSTREAM_MAX_RETRIES
+    times. Every retry takes its own rate-limit token, and retrying stops
+    early if none is available. Returns the last response or raises the
+    last transport error.
+    """
+    max_retries = location_setting('UPSTREAM_MAX_RETRIES')
+    attempt = 0
+    while True:
+        response = error = None
+        try:
+            response = get_session(host).request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt >= max_retries:
+            break
+        time.sleep(retry_delay(response, attempt))
+        attempt += 1
+        if not resilience.acquire_retry(rate_limited):
+            break
+    if error is not None:
+        raise error
+    return response
+
+
+def request(method, url, **kwargs):
+    """
+    Send a request through the pooled session for the URL's host.
+    Applies the configured connect/read timeouts unless `timeout` is given,
+    goes through the circuit breaker and rate limiter (location/resilience.py),
+    retries transport errors, 429 and 5xx, and attaches the wall-clock
+    duration (seconds) as `response.upstream_duration`.
+    In cassette mode (location/cassette.py) responses are recorded or replayed.
+    """
+    cassette_mode = cassette.mode()
+    if cassette_mode:
+        description = cassette.describe(method, url, kwargs.get('params'), kwargs.get('json'), kwargs.get('headers'))
+        if cassette_mode == 'replay':
+            return _replay(description, url)
+    kwargs.setdefault('timeout', (
+        location_setting('UPSTREAM_CONNECT_TIMEOUT'),
+        location_setting('UPSTREAM_READ_TIMEOUT'),
+    ))
+    host = urlsplit(url).netloc
+    rate_limited = spends_rapidapi_quota(kwargs.get('headers'))
+    resilience.before_call(host, rate_limited)
+    started = time.perf_counter()
+    try:
+        response = _send_with_retries(host, method, url, rate_limited, **kwargs)
+    except requests.RequestException as e:
+        resilience.after_call(host, error=e)
+        logger.warning("Upstream %s %s failed after %.1fms", method, url,
+                       (time.perf_counter() - started) * 1000)
+        raise
+    except BaseException:
+        # Interrupted before an outcome; don't leave a half-open trial slot taken
+        resilience.get_breaker(host).release_trial()
+        raise
+    resilience.after_call(host, status_code=response.status_code)
+    response.upstream_duration = time.perf_counter() - started
+    logger.debug("Upstream %s %s -> %s in %.1fms", method, url,
+                 response.status_code, response.upstream_duration * 1000)
+    if cassette_mode == 'record' and response.status_code not in RETRY_STATUSES:
+        cassette.save(description, response.status_code, response.headers, response.content)
+    return response
+
+
+def _replay(description, url):
+    recording = cassette.load(description)
+    latency = cassette.replay_latency()
+    if latency:
+        time.sleep(latency)
+    response = cassette.to_response(recording, url)
+    response.upstream_duration = latency
+    logger.debug("Replayed %s %s -> %s", description['method'], url, response.status_code)
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
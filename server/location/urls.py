@@ -1,9 +1,15 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('get-initial-location/', views.get_initial_location, name='get_initial_location'),
     path('search-locations/', views.search_locations, name='search_locations'),
     path('providers/', views.get_location_providers, name='get_location_providers'),
     path('search-providers/', views.search_specific_providers, name='search_specific_providers'),
-] 
\ No newline at end of file
+    # Async so a batch's items run concurrently under both WSGI and ASGI
+    path('providers/batch/', async_views.batch_location_providers, name='batch_location_providers'),
+    path('metrics/', views.location_metrics, name='location_metrics'),
+    # Async variants, for deployments served through backend/asgi.py
+    path('async/providers/', async_views.get_location_providers, name='get_location_providers_async'),
+    path('async/search-providers/', async_views.search_specific_providers, name='search_specific_providers_async'),
+] 
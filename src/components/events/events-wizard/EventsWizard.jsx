@@ -7,6 +7,8 @@ import './EventsWizard.css';
 const EventsWizard = () => {
   const [events, setEvents] = useState([]);
   const [filteredEvents, setFilteredEvents] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const { currentUser } = useAuth();
@@ -25,9 +27,10 @@ const EventsWizard = () => {
     const fetchEvents = async () => {
       try {
         setLoading(true);
-        const data = await eventService.getAllEvents();
-        setEvents(data);
-        setFilteredEvents(data);
+        const { results, next } = await eventService.getAllEvents();
+        setEvents(results);
+        setFilteredEvents(results);
+        setNextPage(next);
       } catch (err) {
         console.error('Failed to fetch events:', err);
         setError('Failed to load events. Please try again later.');
@@ -38,6 +41,21 @@ const EventsWizard = () => {
 
     fetchEvents();
   }, []);
+
+  // Fetch the next page from the server and add it to the loaded events
+  const loadMoreEvents = async () => {
+    try {
+      setLoadingMore(true);
+      const { results, next } = await eventService.getAllEvents(nextPage);
+      setEvents(loaded => [...loaded, ...results]);
+      setNextPage(next);
+    } catch (err) {
+      // Keep the events already shown; the button stays for another try
+      console.error('Failed to fetch more events:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
   
   // Apply search filter and sorting whenever events, searchTerm or sortOption changes
   useEffect(() => {
@@ -74,8 +92,12 @@ const EventsWizard = () => {
     }
     
     setFilteredEvents(result);
-    setCurrentPage(1); // Reset to first page when search or sort changes
   }, [events, searchTerm, sortOption]);
+
+  // Reset to first page when search or sort changes (not when more events load)
+  useEffect(() => {
+    setCurrentPage(1);
+  }, [searchTerm, sortOption]);
   
   // Get current events for pagination
   const indexOfLastEvent = currentPage * eventsPerPage;
@@ -85,6 +107,9 @@ const EventsWizard = () => {
   
   // Change page
   const paginate = (pageNumber) => setCurrentPage(pageNumber);
+
+  // Search and sort run over the loaded pages; only newest-first matches the server's order
+  const coversLoadedOnly = Boolean(nextPage) && (Boolean(searchTerm) || sortOption !== 'date-desc');
   
   // Handle search input
   const handleSearch = (e) => {
@@ -108,6 +133,14 @@ const EventsWizard = () => {
     return new Date(dateString).toLocaleDateString(undefined, options);
   };
 
+  const loadMoreButton = nextPage && (
+    <div className="pagination">
+      <button onClick={loadMoreEvents} disabled={loadingMore} className="pagination-btn">
+        {loadingMore ? 'Loading...' : 'Load more events'}
+      </button>
+    </div>
+  );
+
   if (loading) {
     return (
       <div className="events-container">
@@ -166,6 +199,12 @@ const EventsWizard = () => {
         </div>
       </div>
 
+      {coversLoadedOnly && (
+        <p className="results-scope-note">
+          {searchTerm ? 'Searching' : 'Sorting'} the {events.length} events loaded so far. Load more events to include older ones.
+        </p>
+      )}
+
       {filteredEvents.length === 0 ? (
         <div className="no-events">
           <h3>No events found</h3>
@@ -175,6 +214,7 @@ const EventsWizard = () => {
               Clear Search
             </button>
           )}
+          {loadMoreButton}
         </div>
       ) : (
         <>
@@ -256,8 +296,10 @@ const EventsWizard = () => {
           )}
           
           <div className="results-summary">
-            Showing {indexOfFirstEvent + 1}-{Math.min(indexOfLastEvent, filteredEvents.length)} of {filteredEvents.length} events
+            Showing {indexOfFirstEvent + 1}-{Math.min(indexOfLastEvent, filteredEvents.length)} of {filteredEvents.length} {nextPage ? 'loaded ' : ''}events
           </div>
+
+          {loadMoreButton}
         </>
       )}
     </div>
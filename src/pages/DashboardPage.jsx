@@ -9,6 +9,8 @@ const DashboardPage = () => {
   const navigate = useNavigate();
   const location = useLocation();
   const [userEvents, setUserEvents] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [notification, setNotification] = useState(
@@ -30,8 +32,9 @@ const DashboardPage = () => {
   const fetchUserEvents = async () => {
     try {
       setLoading(true);
-      const data = await eventService.getUserEvents();
-      setUserEvents(data);
+      const { results, next } = await eventService.getUserEvents();
+      setUserEvents(results);
+      setNextPage(next);
     } catch (err) {
       console.error('Failed to fetch events:', err);
       setError('Failed to load your events');
@@ -39,6 +42,20 @@ const DashboardPage = () => {
       setLoading(false);
     }
   };
+
+  const loadMoreEvents = async () => {
+    try {
+      setLoadingMore(true);
+      const { results, next } = await eventService.getUserEvents(nextPage);
+      setUserEvents(events => [...events, ...results]);
+      setNextPage(next);
+    } catch (err) {
+      console.error('Failed to fetch more events:', err);
+      setNotification({ type: 'error', message: 'Failed to load more events' });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
   
   const handleLogout = async () => {
     try {
@@ -180,6 +197,12 @@ const DashboardPage = () => {
               ))}
             </div>
           )}
+
+          {!loading && !error && nextPage && (
+            <button onClick={loadMoreEvents} disabled={loadingMore} className="load-more-button">
+              {loadingMore ? 'Loading...' : 'Load more events'}
+            </button>
+          )}
         </div>
       </main>
 
@@ -7,6 +7,19 @@ const getCsrfToken = async () => {
   return await authService.getCsrfToken();
 };
 
+// Fetch one page of a cursor-paginated list endpoint: { results, next }.
+// Pass `next` back in as the URL to load the following page.
+const fetchPage = async (url, options, errorMessage) => {
+  const response = await fetch(url, options);
+
+  if (!response.ok) {
+    throw new Error(`${errorMessage}: ${response.status}`);
+  }
+
+  const data = await response.json();
+  return { results: data.results, next: data.next };
+};
+
 // Get all event categories
 const getCategories = async () => {
   try {
@@ -61,26 +74,20 @@ const createEvent = async (eventData) => {
   }
 };
 
-// Get users events
-const getUserEvents = async () => {
+// Get a page of the user's events; `pageUrl` is the `next` of the previous page
+const getUserEvents = async (pageUrl = null) => {
   try {
     // Get CSRF token
     const csrfToken = await getCsrfToken();
     
-    const response = await fetch(`${API_URL}/events/my-events/`, {
+    return await fetchPage(pageUrl || `${API_URL}/events/my-events/`, {
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
         'X-Csrftoken': csrfToken,
       },
       credentials: 'include', 
-    });
-
-    if (!response.ok) {
-      throw new Error(`Failed to fetch events: ${response.status}`);
-    }
-
-    return await response.json();
+    }, 'Failed to fetch events');
   } catch (error) {
     console.error('Error fetching user events:', error);
     throw error;
@@ -145,26 +152,20 @@ const searchLocations = async (query, lat, lng) => {
   }
 };
 
-// Get all events
-const getAllEvents = async () => {
+// Get a page of all events; `pageUrl` is the `next` of the previous page
+const getAllEvents = async (pageUrl = null) => {
   try {
     // Get CSRF token
     const csrfToken = await getCsrfToken();
     
-    const response = await fetch(`${API_URL}/events/all/`, {
+    return await fetchPage(pageUrl || `${API_URL}/events/all/`, {
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
         'X-Csrftoken': csrfToken,
       },
       credentials: 'include', 
-    });
-
-    if (!response.ok) {
-      throw new Error(`Failed to fetch all events: ${response.status}`);
-    }
-
-    return await response.json();
+    }, 'Failed to fetch all events');
   } catch (error) {
     console.error('Error fetching all events:', error);
     throw error;